@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures of the solver-free benchmark suite
+
+The size of the synthetic cases can be set from the command line, e.g.
+    pytest benchmarks --nbr-td 12 --nbr-td 365 --nbr-techs 200
+"""
+import os
+import pickle
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from energyscope.step2_print_data import import_data
+from energyscope.step2_output_generator import save_breakdowns, save_year_balance
+from energyscope.synthetic_data import generate_synthetic_case
+
+DATA_DIR = os.path.join(Path(__file__).parents[1], 'Data')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('energyscope benchmarks')
+    group.addoption('--nbr-td', action='append', type=int, default=None,
+                    help='Number of typical days of the synthetic cases (can be repeated, default: 12)')
+    group.addoption('--nbr-techs', type=int, default=None, help='Number of technologies (storage excluded)')
+    group.addoption('--nbr-layers', type=int, default=None, help='Number of layers')
+    group.addoption('--nbr-storage', type=int, default=None, help='Number of storage technologies')
+    group.addoption('--bench-rounds', type=int, default=3, help='Number of rounds of each benchmark')
+
+
+def pytest_generate_tests(metafunc):
+    if 'synthetic_case' in metafunc.fixturenames:
+        nbr_tds = metafunc.config.getoption('--nbr-td') or [12]
+        metafunc.parametrize('synthetic_case', nbr_tds, indirect=True, scope='session',
+                             ids=[f"{nbr_td}TD" for nbr_td in nbr_tds])
+
+
+@pytest.fixture(scope='session')
+def synthetic_case(request):
+    """Synthetic results, parameters and sets"""
+    config = request.config
+    return generate_synthetic_case(request.param, nbr_techs=config.getoption('--nbr-techs'),
+                                   nbr_layers=config.getoption('--nbr-layers'),
+                                   nbr_storage=config.getoption('--nbr-storage'))
+
+
+@pytest.fixture(scope='session')
+def all_data():
+    return import_data(f"{DATA_DIR}/User_data", f"{DATA_DIR}/Developer_data")
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    """Output directory with the same layout as the one created by run_step2_new"""
+    for sub_dir in ['hourly_data', 'sankey']:
+        os.makedirs(tmp_path / 'output' / sub_dir)
+    return f"{tmp_path}/output/"
+
+
+@pytest.fixture
+def case_study_dir(synthetic_case, tmp_path):
+    """Case study directory containing the pickles and the breakdowns of a synthetic run"""
+    results, parameters, sets = synthetic_case
+    os.makedirs(tmp_path / 'output')
+    for name, content in [('results', results), ('parameters', parameters), ('sets', sets)]:
+        with open(tmp_path / 'output' / f"{name}.pickle", 'wb') as handle:
+            pickle.dump(content, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    save_breakdowns(results, parameters, sets, f"{tmp_path}/output/")
+    save_year_balance(results, parameters, sets, f"{tmp_path}/output/")
+    return str(tmp_path)
+
+
+@pytest.fixture
+def year_balance(case_study_dir):
+    return pd.read_csv(f"{case_study_dir}/output/year_balance.csv", index_col=0)
+
+
+@pytest.fixture
+def rounds(request):
+    return request.config.getoption('--bench-rounds')
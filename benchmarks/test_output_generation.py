@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the generation of output files and of the postprocessing functions on synthetic cases
+
+Requires pytest-benchmark. Run with:
+    pytest benchmarks --benchmark-autosave
+and compare with a previous run with --benchmark-compare.
+"""
+import os
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from energyscope import postprocessing
+from energyscope.postprocessing_matrix import YearBalanceStack, compute_fec_stack, compute_gwp_op_stack
+from energyscope import step2_output_generator as og
+from energyscope.sankey_input import generate_sankey_file
+from energyscope.utils import compute_max_production
+
+DATA_DIR = os.path.join(Path(__file__).parents[1], 'Data')
+
+
+@pytest.mark.parametrize('save_function', [og.save_breakdowns, og.save_year_balance, og.save_assets,
+                                           og.save_tech_res_matrices, og.save_losses],
+                         ids=lambda f: f.__name__)
+def test_save(benchmark, synthetic_case, output_dir, rounds, save_function):
+    benchmark.pedantic(save_function, args=(*synthetic_case, output_dir), rounds=rounds, iterations=1)
+
+
+@pytest.mark.parametrize('save_function', [og.save_layers, og.save_energy_stored], ids=lambda f: f.__name__)
+def test_save_hourly(benchmark, synthetic_case, output_dir, rounds, save_function):
+    benchmark.pedantic(save_function, args=(*synthetic_case, f"{output_dir}hourly_data/"),
+                       rounds=rounds, iterations=1)
+
+
+def test_save_results(benchmark, synthetic_case, output_dir, rounds):
+    benchmark.pedantic(og.save_results, args=(*synthetic_case, output_dir), rounds=rounds, iterations=1)
+
+
+def test_generate_sankey_file(benchmark, synthetic_case, output_dir, rounds):
+    benchmark.pedantic(generate_sankey_file, args=(*synthetic_case, f"{output_dir}sankey/"),
+                       rounds=rounds, iterations=1)
+
+
+def test_compute_max_production(benchmark, case_study_dir, rounds):
+    benchmark.pedantic(compute_max_production, args=(case_study_dir,), rounds=rounds, iterations=1)
+
+
+def test_compute_fec(benchmark, year_balance, rounds):
+    benchmark.pedantic(postprocessing.compute_fec, args=(year_balance, f"{DATA_DIR}/User_data"),
+                       rounds=rounds, iterations=1)
+
+
+def test_compute_primary_energy(benchmark, case_study_dir, all_data, rounds):
+    benchmark.pedantic(postprocessing.compute_primary_energy,
+                       args=(case_study_dir, f"{DATA_DIR}/User_data", 'synthetic', all_data),
+                       rounds=rounds, iterations=1)
+
+
+def test_compute_einv_details(benchmark, case_study_dir, all_data, rounds):
+    benchmark.pedantic(postprocessing.compute_einv_details,
+                       args=(case_study_dir, f"{DATA_DIR}/User_data", all_data),
+                       rounds=rounds, iterations=1)
+
+
+@pytest.mark.parametrize('nbr_cases', [1, 100])
+def test_compute_fec_stack(benchmark, year_balance, rounds, nbr_cases):
+    resources = list(pd.read_csv(f"{DATA_DIR}/User_data/aux_resources.csv", index_col=0).index)
+    stack = YearBalanceStack({f"case_{i}": year_balance for i in range(nbr_cases)})
+    benchmark.pedantic(compute_fec_stack, args=(stack, resources), rounds=rounds, iterations=1)
+
+
+@pytest.mark.parametrize('nbr_cases', [1, 100])
+def test_compute_gwp_op_stack(benchmark, year_balance, all_data, rounds, nbr_cases):
+    stack = YearBalanceStack({f"case_{i}": year_balance for i in range(nbr_cases)})
+    benchmark.pedantic(compute_gwp_op_stack, args=(stack, all_data['Resources']['gwp_op']),
+                       rounds=rounds, iterations=1)
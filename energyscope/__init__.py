@@ -65,12 +65,36 @@ except ValueError as e:
 
 from .utils import make_dir
 
-from .step2_main import run_step2, run_step2_new
+from .step2_main import run_step2, run_step2_new, create_step2_translator
 from .step2_print_data import import_data, print_param, newline, print_df, print_set, ampl_syntax, \
     print_estd, print_12td
 from .step2_print_run import print_run
 from .step2_output_generator import extract_results_step2
+from .profiling import tracing, span, profiled
+from .translator import create_translator, register_backend, ReplayAMPL
+from .uncertainty import sample_parameters, run_monte_carlo
+from .mga import get_tech_groups, get_alternatives, run_mga
+from .presolve import prune_data, restore_dropped
+from .segmentation import print_segmented_td, segment_typical_days
+from .td_metrics import read_td_of_days_dir, evaluate_td_selections, get_convergence_report, select_nbr_td
+from .step1_clustering import get_daily_features, kmedoids, run_step1_kmedoids
+from .hourly_dispatch import read_hourly, get_hourly_profiles
+from .io_attribution import compute_io_attribution, save_io_attribution
+from .model_catalog import ModelCatalog, load_catalog
+from .scenarios import write_base_data, write_estd_data, get_data_params, get_changed_sets, get_overlay, \
+    write_scenario_data, prepare_scenario
+from .shared_data import SharedDataset, apply_delta, run_sweep
+from .output_profiles import OUTPUT_PROFILES, get_output_profile
+from .run_dirs import run_dir, publish_run, clean_partial_runs
+from .output_formats import OUTPUT_FORMATS, write_table, read_table
+from .xarray_export import get_dataset, save_dataset, export_case_study, open_case_studies, select_periods
+from .run_catalog import RunCatalog, get_run_inputs
+from .validation import validate_data, check_data
+from .solver_progress import ProgressMonitor, solve_with_progress, register_parser
 
+from energyscope.metadata import MetadataRegistry, get_registry
+from energyscope.postprocessing_matrix import YearBalanceStack, compute_fec_stack, compute_primary_energy_stack, \
+    compute_gwp_op_stack
 from energyscope.postprocessing import get_total_cost, get_total_gwp, get_total_einv,\
     get_asset_value, get_resource_used
 from energyscope.sankey_diagram import draw_sankey
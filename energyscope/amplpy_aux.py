@@ -6,7 +6,8 @@ Contains functions to retrieve results from an AMPL run
 
 @author: Paolo Thiran, Antoine Dubois
 """
-from typing import Dict
+import logging
+from typing import Dict, List
 
 import pandas as pd
 
@@ -32,7 +33,61 @@ def to_pd(amplpy_df: amplpy.DataFrame) -> pd.DataFrame:
     return pd.DataFrame(columns)
 
 
-def get_results(ampl_trans: amplpy.AMPL) -> Dict[str, pd.DataFrame]:
+def _filter_values(df: pd.DataFrame, value_col: str, tol: float) -> pd.DataFrame:
+    return df[df[value_col].abs() > tol].reset_index(drop=True)
+
+
+def get_nonzero_values(ampl_trans: amplpy.AMPL, name: str, entity, value_col: str,
+                       tol: float = 1e-6) -> pd.DataFrame:
+    """
+    Extract the nonzero values of an indexed variable or parameter
+
+    The filtering is done by AMPL (only the nonzero values are transferred) when the indexing of the entity can be
+    rebuilt from its indexing sets. Otherwise (translator without getData, e.g. the replay backend, or, logged as
+    warnings, indexing depending on another index or error of AMPL in the filtering query), all the values are
+    extracted and filtered afterwards.
+
+    Parameters
+    ----------
+    ampl_trans : amplpy.AMPL
+        AMPL translator
+    name: str
+        Name of the entity
+    entity: amplpy.Variable or amplpy.Parameter
+        Entity to extract
+    value_col: str
+        Name of the column of values in the returned DataFrame (e.g. 'F.val' for variables and 'f_max' for parameters)
+    tol: float (default: 1e-6)
+        Values whose absolute value is below tol are considered as zero
+
+    Returns
+    -------
+    df : pandas.DataFrame
+        'long' DataFrame containing the nonzero values only
+    """
+    if not hasattr(ampl_trans, 'getData') or entity.indexarity() == 0:
+        # Translator without getData (e.g. replay backend) or scalar entity
+        return _filter_values(to_pd(entity.getValues()), value_col, tol)
+    indexing_sets = list(entity.getIndexingSets())
+    if len(indexing_sets) != entity.indexarity() or any('[' in s or ':' in s for s in indexing_sets):
+        logging.warning(f"Indexing of {name} cannot be rebuilt from its indexing sets, filtering {name} after "
+                        f"extraction")
+        return _filter_values(to_pd(entity.getValues()), value_col, tol)
+
+    indices = [f"i{k}" for k in range(len(indexing_sets))]
+    indexing = ', '.join(f"{i} in {s}" for i, s in zip(indices, indexing_sets))
+    value = f"{name}[{', '.join(indices)}]"
+    try:
+        df = to_pd(ampl_trans.getData(f"{{{indexing}: abs({value}) > {tol}}} {value}"))
+    except amplpy.AMPLException as e:
+        logging.warning(f"Filtering of {name} by AMPL failed, filtering {name} after extraction ({e})")
+        return _filter_values(to_pd(entity.getValues()), value_col, tol)
+    df.columns = [f"index{k}" for k in range(len(indices))] + [value_col]
+    return df
+
+
+def get_results(ampl_trans: amplpy.AMPL, names: List[str] = None, sparse: List[str] = None,
+                tol: float = 1e-6) -> Dict[str, pd.DataFrame]:
     """
     Extract the values of each variable after running the optimization problem
 
@@ -40,6 +95,12 @@ def get_results(ampl_trans: amplpy.AMPL) -> Dict[str, pd.DataFrame]:
     ----------
     ampl_trans : amplpy.AMPL
         AMPL translator containing the results of the aggregation
+    names: List[str] (default: None)
+        Names of the variables to extract (all the variables if None, names not defined in the model are ignored)
+    sparse: List[str] (default: None)
+        Names of the variables of which only the nonzero values are extracted
+    tol: float (default: 1e-6)
+        Values whose absolute value is below tol are considered as zero for the variables in sparse
 
     Returns
     -------
@@ -49,13 +110,20 @@ def get_results(ampl_trans: amplpy.AMPL) -> Dict[str, pd.DataFrame]:
     """
     # function to get the results of ampl under the form of a dict filled with one df for each variable
     amplpy_sol = ampl_trans.getVariables()
+    if names is not None:
+        amplpy_sol = [(name, entity) for name, entity in amplpy_sol if name in names]
+    sparse = sparse or []
     results = dict()
     for name, var in amplpy_sol:
-        results[name] = to_pd(var.getValues())
+        if name in sparse:
+            results[name] = get_nonzero_values(ampl_trans, name, var, f"{name}.val", tol)
+        else:
+            results[name] = to_pd(var.getValues())
     return results
 
 
-def get_parameters(ampl_trans: amplpy.AMPL) -> Dict[str, pd.DataFrame]:
+def get_parameters(ampl_trans: amplpy.AMPL, names: List[str] = None, sparse: List[str] = None,
+                   tol: float = 1e-6) -> Dict[str, pd.DataFrame]:
     """
     Extract the values of each parameter
 
@@ -63,6 +131,12 @@ def get_parameters(ampl_trans: amplpy.AMPL) -> Dict[str, pd.DataFrame]:
     ----------
     ampl_trans : amplpy.AMPL
         AMPL translator containing the parameters values
+    names: List[str] (default: None)
+        Names of the parameters to extract (all the parameters if None, names not defined in the model are ignored)
+    sparse: List[str] (default: None)
+        Names of the parameters of which only the nonzero values are extracted
+    tol: float (default: 1e-6)
+        Values whose absolute value is below tol are considered as zero for the parameters in sparse
 
     Returns
     -------
@@ -72,12 +146,72 @@ def get_parameters(ampl_trans: amplpy.AMPL) -> Dict[str, pd.DataFrame]:
     """
     # function to get the results of ampl under the form of a dict filled with one df for each variable
     amplpy_sol = ampl_trans.getParameters()
+    if names is not None:
+        amplpy_sol = [(name, entity) for name, entity in amplpy_sol if name in names]
+    sparse = sparse or []
     parameters = dict()
     for name, param in amplpy_sol:
-        parameters[name] = to_pd(param.getValues())
+        if name in sparse:
+            parameters[name] = get_nonzero_values(ampl_trans, name, param, name, tol)
+        else:
+            parameters[name] = to_pd(param.getValues())
     return parameters
 
 
+def get_duals(ampl_trans: amplpy.AMPL, names: List[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Extract the dual values of each constraint after running the optimization problem
+
+    Parameters
+    ----------
+    ampl_trans : amplpy.AMPL
+        AMPL translator containing the solved problem
+    names: List[str] (default: None)
+        Names of the constraints to extract (all the constraints if None, names not defined in the model are ignored)
+
+    Returns
+    -------
+    duals: Dict[str, pd.DataFrame]
+        Dictionary containing the dual values of each constraint as 'long' DataFrames (column '<name>.dual')
+    """
+    constraints = ampl_trans.getConstraints()
+    if names is not None:
+        constraints = [(name, con) for name, con in constraints if name in names]
+    duals = dict()
+    for name, con in constraints:
+        df = to_pd(con.getValues(['dual']))
+        df.columns = list(df.columns[:-1]) + [f"{name}.dual"]
+        duals[name] = df
+    return duals
+
+
+def get_reduced_costs(ampl_trans: amplpy.AMPL, names: List[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Extract the reduced costs of each variable after running the optimization problem
+
+    Parameters
+    ----------
+    ampl_trans : amplpy.AMPL
+        AMPL translator containing the solved problem
+    names: List[str] (default: None)
+        Names of the variables to extract (all the variables if None, names not defined in the model are ignored)
+
+    Returns
+    -------
+    reduced_costs: Dict[str, pd.DataFrame]
+        Dictionary containing the reduced costs of each variable as 'long' DataFrames (column '<name>.rc')
+    """
+    variables = ampl_trans.getVariables()
+    if names is not None:
+        variables = [(name, var) for name, var in variables if name in names]
+    reduced_costs = dict()
+    for name, var in variables:
+        df = to_pd(var.getValues(['rc']))
+        df.columns = list(df.columns[:-1]) + [f"{name}.rc"]
+        reduced_costs[name] = df
+    return reduced_costs
+
+
 def get_subset(my_set: amplpy.set.Set) -> Dict:
     """
     Function to extract the subsets of set containing sets from the AMPL() object
@@ -101,12 +235,14 @@ def get_subset(my_set: amplpy.set.Set) -> Dict:
     return d
 
 
-def get_sets(ampl_trans: amplpy.AMPL) -> Dict:
+def get_sets(ampl_trans: amplpy.AMPL, names: List[str] = None) -> Dict:
     """
-    Function to get sets of the LP optimization problem
+    Function to get sets of the LP optimization problem (only the sets in names if given)
     """
     sets = dict()
     for name, s in ampl_trans.getSets():
+        if names is not None and name not in names:
+            continue
         if len(s.instances()) <= 1:
             sets[name] = s.getValues().toList()
         else:
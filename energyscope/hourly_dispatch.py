@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to save the full-year hourly dispatch of a run in memory-mapped arrays and to read them
+
+The results of STEP 2 are given on the (hour, typical day) grid. save_hourly_dispatch expands them once per run to all
+the periods of the year and saves, in the directory hourly_data of the output directory:
+- dispatch.npy: array ((resources + technologies) x periods) of F_t;
+- layer_balance.npy: array ((layers x terms) x periods) with, for each layer, the production and consumption of the
+  resources and technologies (storage excluded), the storage input and output and the end uses;
+- dispatch_index.json: labels of the periods (with their hour and typical day) and of the columns of each array.
+The arrays are saved in the .npy format (row-major) with one row per column label, so that the profile of a column over
+the year is contiguous in the file. They are opened in memory-mapped mode by the readers: reading some columns (e.g. one
+technology in many cases) only reads their rows, whereas reading some periods of all the columns reads a few values
+from each row.
+"""
+import json
+import os
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from energyscope.amplpy_aux import time_to_pandas
+from energyscope.profiling import profiled
+
+LAYER_BALANCE_TERMS = ['production', 'consumption', 'storage_in', 'storage_out', 'end_uses']
+
+
+def _to_grid(df: pd.DataFrame, grid: pd.MultiIndex, columns: pd.Index, column_idx: str) -> np.ndarray:
+    """
+    Convert a 'long' DataFrame indexed over (..., hour, typical day) into an array (grid x columns), summing the values
+    of the rows with the same column label (given by column_idx)
+    """
+    out = np.zeros((len(grid), len(columns)))
+    h_col, td_col = df.columns[-3], df.columns[-2]
+    rows = grid.get_indexer(pd.MultiIndex.from_arrays([df[h_col], df[td_col]]))
+    cols = columns.get_indexer(df[column_idx])
+    valid = (rows >= 0) & (cols >= 0)
+    np.add.at(out, (rows[valid], cols[valid]), df[df.columns[-1]].values[valid])
+    return out
+
+
+@profiled
+def save_hourly_dispatch(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
+                         sets: Dict, output_dir: str, dtype: str = 'float32', chunk_size: int = 100) -> None:
+    """
+    Save the hourly dispatch and layer balances of all the periods of the year (see module description)
+
+    Parameters
+    ----------
+    results: Dict[str, pd.DataFrame]
+        Dictionary containing for each variable its values as a 'long' DataFrame
+    parameters: Dict[str, pd.DataFrame]
+        Dictionary containing for each parameter its values as a 'long' DataFrame
+    sets: Dict
+        Dictionary containing all the sets and subsets
+    output_dir: str
+        Path to the directory where the files are saved
+    dtype: str (default: 'float32')
+        Type of the values saved
+    chunk_size: int (default: 100)
+        Number of columns written at once
+    """
+    # Sets
+    layers = pd.Index(sorted(sets['LAYERS']))
+    storage_techs = sorted(sets['STORAGE_TECH'])
+    entities = pd.Index(sorted(sets['RESOURCES']) + sorted(set(sets['TECHNOLOGIES'])))
+    times = time_to_pandas(sets)
+    grid = pd.MultiIndex.from_product([sorted(sets['HOURS']), sorted(sets['TYPICAL_DAYS'])])
+    period_grid = grid.get_indexer(list(times.values))
+
+    # Values on the (hour, typical day) grid
+    f_t = _to_grid(results['F_t'], grid, entities, 'index0')
+    layers_in_out = parameters['layers_in_out'].pivot(index='index0', columns='index1', values='layers_in_out')
+    layers_in_out = layers_in_out.reindex(index=entities, columns=layers).fillna(0.)
+    layers_in_out.loc[layers_in_out.index.isin(storage_techs)] = 0.
+    # Production and consumption of each layer (F_t >= 0, so that the sign of each term is the one of layers_in_out)
+    layer_balance = np.stack([f_t @ np.clip(layers_in_out.values, 0., None),
+                              -(f_t @ np.clip(layers_in_out.values, None, 0.)),
+                              _to_grid(results['Storage_in'], grid, layers, 'index1'),
+                              _to_grid(results['Storage_out'], grid, layers, 'index1'),
+                              _to_grid(results['End_uses'], grid, layers, 'index0')], axis=2)
+    layer_balance = layer_balance.reshape(len(grid), -1)
+    balance_columns = [f"{lay}|{term}" for lay in layers for term in LAYER_BALANCE_TERMS]
+
+    # Expansion to the periods of the year, written by chunks of columns in memory-mapped files (columns x periods)
+    os.makedirs(output_dir, exist_ok=True)
+    for name, values in [('dispatch', f_t), ('layer_balance', layer_balance)]:
+        array = np.lib.format.open_memmap(os.path.join(output_dir, f"{name}.npy"), mode='w+', dtype=dtype,
+                                          shape=(values.shape[1], len(period_grid)))
+        for start in range(0, values.shape[1], chunk_size):
+            array[start:start + chunk_size] = values[:, start:start + chunk_size][period_grid].T
+        array.flush()
+        del array
+
+    index = {'periods': [int(t) for t in times.index],
+             'hours': [int(h) for h, _ in times.values], 'typical_days': [int(td) for _, td in times.values],
+             'dispatch': [str(e) for e in entities], 'layer_balance': balance_columns}
+    with open(os.path.join(output_dir, 'dispatch_index.json'), 'w') as file:
+        json.dump(index, file)
+
+
+def read_dispatch_index(output_dir: str) -> Dict:
+    """Return the labels of the arrays saved by save_hourly_dispatch in output_dir"""
+    with open(os.path.join(output_dir, 'dispatch_index.json'), 'r') as file:
+        return json.load(file)
+
+
+def read_hourly(output_dir: str, name: str = 'dispatch', periods: Union[List[int], slice] = None,
+                columns: List[str] = None, index: Dict = None) -> pd.DataFrame:
+    """
+    Read some periods and columns of an array saved by save_hourly_dispatch without loading the whole file (only the
+    rows of the columns read are accessed, see module description)
+
+    Parameters
+    ----------
+    output_dir: str
+        Path to the directory containing the arrays
+    name: str (default: 'dispatch')
+        Name of the array, 'dispatch' or 'layer_balance'
+    periods: Union[List[int], slice] (default: None)
+        Periods to read (labels, from 1 to 8760), as a list or a slice of labels (both ends included). All by default.
+    columns: List[str] (default: None)
+        Columns to read (e.g. technologies for 'dispatch', '<layer>|<term>' for 'layer_balance'). All by default.
+    index: Dict (default: None)
+        Content of dispatch_index.json, read if not given (can be reused for several cases with the same sets)
+
+    Returns
+    -------
+    pd.DataFrame
+        Values with periods as index and the columns read as columns
+    """
+    assert name in ['dispatch', 'layer_balance'], "Error: name must be 'dispatch' or 'layer_balance'."
+    index = read_dispatch_index(output_dir) if index is None else index
+    array = np.load(os.path.join(output_dir, f"{name}.npy"), mmap_mode='r')
+    all_periods = pd.Index(index['periods'])
+    all_columns = pd.Index(index[name])
+
+    if periods is None:
+        rows = slice(None)
+    elif isinstance(periods, slice):
+        rows = all_periods.slice_indexer(periods.start, periods.stop)
+    else:
+        rows = np.sort(all_periods.get_indexer(periods))
+        assert (rows >= 0).all(), f"Error: some periods are not in {output_dir}."
+    cols = slice(None) if columns is None else all_columns.get_indexer(columns)
+    if columns is not None:
+        assert (cols >= 0).all(), f"Error: some columns are not in {name} of {output_dir}."
+
+    # Columns selected first (rows of the array), then the periods in the selected rows
+    return pd.DataFrame(np.asarray(array[cols][:, rows]).T, index=all_periods[rows], columns=all_columns[cols])
+
+
+def get_hourly_profiles(output_dirs: Dict[str, str], column: str, name: str = 'dispatch',
+                        periods: Union[List[int], slice] = None) -> pd.DataFrame:
+    """
+    Gather the hourly profile of one column over several cases
+
+    Parameters
+    ----------
+    output_dirs: Dict[str, str]
+        Directory containing the arrays (e.g. <case_study_dir>/output/hourly_data) of each case
+    column: str
+        Column to read (see read_hourly)
+    name: str (default: 'dispatch')
+        Name of the array, 'dispatch' or 'layer_balance'
+    periods: Union[List[int], slice] (default: None)
+        Periods to read (all by default)
+
+    Returns
+    -------
+    pd.DataFrame
+        Profiles with periods as index and cases as columns
+    """
+    return pd.DataFrame({case: read_hourly(output_dir, name, periods, [column]).iloc[:, 0]
+                         for case, output_dir in output_dirs.items()})
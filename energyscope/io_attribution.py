@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to attribute the resources (and their cost and GWP) to the end uses with an input-output (Leontief)
+model built from year_balance.csv
+
+Each layer is a product. The content (quantity of each resource) of one unit of a layer is the same whatever its use:
+- a resource brings its own quantity to the layers it supplies;
+- a technology passes the content of its inputs to its outputs, in proportion to the energy of the outputs (CO2 layers
+  excluded, as in postprocessing.fec_given_tech);
+- the consumptions which have no output (storage losses, technologies without output) are losses which are spread
+  over the other uses of the layer.
+The content of all the layers is obtained from one sparse linear system:
+    uses[l] e[l] - sum_m B[l, m] e[m] = D[l]
+with B[l, m] = sum_t share[t, l] input[t, m] and D[l] the direct supply of resources to layer l. The content of the end
+uses (and of the exports) is then the content of their layer times their quantity, which accounts for all the
+successive transformations (e.g. imported gas used by a CHP whose heat is distributed by the DHN).
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from energyscope.output_formats import read_table, write_table
+from energyscope.postprocessing_matrix import CO2_LAYERS
+
+
+def _solve(matrix: np.ndarray, rhs: np.ndarray) -> np.ndarray:
+    """Solve matrix x = rhs with a sparse solver if scipy is available"""
+    try:
+        from scipy.sparse import csc_matrix
+        from scipy.sparse.linalg import spsolve
+    except ImportError:
+        return np.linalg.solve(matrix, rhs)
+    solution = spsolve(csc_matrix(matrix), rhs)
+    return solution.reshape(rhs.shape)
+
+
+def compute_io_attribution(year_balance: pd.DataFrame, resources_data: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """
+    Attribute the resources, their cost and their GWP to the end uses and exports (see module description)
+
+    Parameters
+    ----------
+    year_balance: pd.DataFrame
+        Year balance as in year_balance.csv (rows: resources, technologies and 'END_USES_DEMAND', columns: layers)
+    resources_data: pd.DataFrame
+        Data of the resources (e.g. import_data(...)['Resources']) with columns 'c_op' and 'gwp_op'. The rows of the
+        year balance which are in its index are considered as resources.
+
+    Returns
+    -------
+    Dict[str, pd.DataFrame]
+        - 'intensity': content of one unit of each layer (layers x resources);
+        - 'end_uses': resources embodied in the end-use demand of each layer (layers x resources);
+        - 'exports': resources embodied in the exports, i.e. the resources consuming layers (exports x resources);
+        - 'summary': total resource, cost and GWP embodied in each end-use demand and export ('primary': energy
+          resources [GWh], 'co2': CO2 resources, i.e. supplying the CO2 layers [ktCO2], 'cost', 'gwp');
+        - 'producers': resources embodied in the end-use demand of each layer, detailed by producer of the layer
+          (index levels 'layer' and 'producer', resources as columns).
+    """
+    year_balance = year_balance.rename(index=lambda x: x.strip(), columns=lambda x: x.strip())
+    flows = year_balance.drop(index='END_USES_DEMAND')
+    rows, layers = flows.index, flows.columns
+    values = flows.values.astype(float)
+    end_uses = np.clip(year_balance.loc['END_USES_DEMAND'].values.astype(float), 0., None)
+
+    is_res = rows.isin(resources_data.index)
+    resources = rows[is_res]
+    positive = np.where(values > 0, values, 0.)
+    negative = np.where(values < 0, -values, 0.)
+
+    # Technologies with outputs pass the content of their inputs to their (non-CO2) outputs
+    outputs = positive * ~layers.isin(CO2_LAYERS)
+    outputs_sum = outputs.sum(axis=1)
+    is_transformer = ~is_res & (outputs_sum > 0)
+    share = np.zeros_like(values)
+    share[is_transformer] = outputs[is_transformer] / outputs_sum[is_transformer, None]
+    inputs = negative * is_transformer[:, None]
+
+    # Uses of each layer: inputs of the technologies, exports (resources consuming a layer) and end uses
+    uses = inputs.sum(axis=0) + negative[is_res].sum(axis=0) + end_uses
+    direct = positive[is_res].T  # layers x resources
+
+    matrix = np.diag(uses) - share.T @ inputs
+    # Layers which are not used do not carry any content
+    not_used = uses <= 0
+    matrix[not_used] = np.eye(len(layers))[not_used]
+    direct[not_used] = 0.
+    intensity = _solve(matrix, direct)
+
+    intensity_df = pd.DataFrame(intensity, index=layers, columns=resources)
+    end_uses_df = pd.DataFrame(end_uses[:, None] * intensity, index=layers, columns=resources)
+    end_uses_df = end_uses_df[end_uses > 0]
+    exports_df = pd.DataFrame(negative[is_res] @ intensity, index=resources, columns=resources)
+    exports_df = exports_df[negative[is_res].sum(axis=1) > 0]
+
+    c_op = resources_data['c_op'].reindex(resources).astype(float).fillna(0.).values
+    gwp_op = resources_data['gwp_op'].reindex(resources).astype(float).fillna(0.).values
+    summary = pd.concat([end_uses_df, exports_df], keys=['END_USES', 'EXPORTS'], names=['use', 'layer'])
+    # Energy [GWh] and CO2 [ktCO2] resources are summed separately
+    is_co2_layer = layers.isin(CO2_LAYERS)
+    supply = positive[is_res]
+    is_co2_res = (supply[:, is_co2_layer].sum(axis=1) > 0) & (supply[:, ~is_co2_layer].sum(axis=1) == 0)
+    summary = pd.DataFrame({'primary': summary.values[:, ~is_co2_res].sum(axis=1),
+                            'co2': summary.values[:, is_co2_res].sum(axis=1), 'cost': summary.values @ c_op,
+                            'gwp': summary.values @ gwp_op}, index=summary.index)
+
+    # Detail by producer: content brought by each producer to each layer, scaled by the share of the end use
+    content = np.zeros((len(rows), len(layers), len(resources)))
+    content[np.flatnonzero(is_res), :, np.arange(len(resources))] = positive[is_res]
+    content[is_transformer] = share[is_transformer, :, None] * (inputs[is_transformer] @ intensity)[:, None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scale = np.where(uses > 0, end_uses / uses, 0.)
+    content = content * scale[None, :, None]
+    row_idx, layer_idx = np.nonzero(content.sum(axis=2) > 0)
+    producers = pd.DataFrame(content[row_idx, layer_idx], columns=resources,
+                             index=pd.MultiIndex.from_arrays([layers[layer_idx], rows[row_idx]],
+                                                             names=['layer', 'producer'])).sort_index(level=0)
+
+    return {'intensity': intensity_df, 'end_uses': end_uses_df, 'exports': exports_df, 'summary': summary,
+            'producers': producers}
+
+
+def save_io_attribution(case_study_dir: str, resources_data: pd.DataFrame, keys: List[str] = None,
+                        output_format: str = 'csv') -> Dict[str, pd.DataFrame]:
+    """
+    Compute the input-output attribution of a case study and save it in <case_study_dir>/output/io_attribution_*.csv
+    (or in another format, see output_formats.py)
+
+    Parameters
+    ----------
+    case_study_dir: str
+        Path to the case study directory
+    resources_data: pd.DataFrame
+        Data of the resources (see compute_io_attribution)
+    keys: List[str] (default: None)
+        Tables saved (all by default, see compute_io_attribution)
+    output_format: str (default: 'csv')
+        Format of the tables (see output_formats.py)
+    """
+    year_balance = read_table(f"{case_study_dir}/output/year_balance.csv", index_col=0)
+    attribution = compute_io_attribution(year_balance, resources_data)
+    for key in attribution.keys() if keys is None else keys:
+        write_table(attribution[key].round(6), f"{case_study_dir}/output/io_attribution_{key}.csv", output_format)
+    return attribution
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains a registry of the metadata (categories, subcategories, names and colors) of the demands, resources and
+technologies given in the aux_*.csv files of the user data directory
+
+The tables of a data directory are read once and kept in memory, and read again only if their file was modified. The
+lookups take lists (or arrays) of elements and report all the missing elements at once.
+"""
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+ELEMENT_TYPES = ['demand', 'resources', 'technologies']
+# Columns of the aux files which are renamed to have the same fields for all the element types
+FIELD_NAMES = {'Technologies name': 'Name', 'Resources name': 'Name'}
+
+
+class MetadataRegistry:
+    """
+    Metadata of the elements of a user data directory (see get_registry to share one registry per directory)
+
+    Parameters
+    ----------
+    user_data_path: str
+        Path to the directory containing the aux_<element_type>.csv files
+    """
+
+    def __init__(self, user_data_path: str):
+        self.user_data_path = os.path.abspath(user_data_path)
+        self._tables: Dict[str, Tuple[float, pd.DataFrame]] = dict()
+
+    def table(self, element_type: str) -> pd.DataFrame:
+        """Return the metadata of one type of elements, read again only if the file was modified"""
+        assert element_type in ELEMENT_TYPES, f'Error: element_type must be one of {ELEMENT_TYPES}.'
+        fn = os.path.join(self.user_data_path, f"aux_{element_type}.csv")
+        mtime = os.path.getmtime(fn)
+        if element_type not in self._tables or self._tables[element_type][0] != mtime:
+            logging.debug(f"Reading {fn}")
+            table = pd.read_csv(fn, index_col=0).rename(columns=FIELD_NAMES)
+            table.index = table.index.str.strip()
+            self._tables[element_type] = (mtime, table)
+        return self._tables[element_type][1]
+
+    def get_missing(self, elements: List[str], element_type: str, field: str) -> List[str]:
+        """Return the elements which have no value for a field"""
+        table = self.table(element_type)
+        if field not in table.columns:
+            return list(elements)
+        return list(pd.Index(elements)[table[field].reindex(pd.Index(elements)).isna().values])
+
+    def lookup(self, elements: List[str], element_type: str, field: str, errors: str = 'raise') -> pd.Series:
+        """
+        Return the value of a field for several elements
+
+        Parameters
+        ----------
+        elements: List[str]
+            Elements (e.g. resources or technologies)
+        element_type: str
+            'demand', 'resources' or 'technologies'
+        field: str
+            Column of the aux file, e.g. 'Category', 'Subcategory', 'Name' or 'Color'
+        errors: str (default: 'raise')
+            If 'raise', all the elements without value are reported in one error. If 'ignore', their value is NaN.
+
+        Returns
+        -------
+        pd.Series
+            Values indexed by the elements
+        """
+        assert errors in ['raise', 'ignore'], "Error: errors must be 'raise' or 'ignore'."
+        table = self.table(element_type)
+        if errors == 'raise':
+            assert field in table.columns, f'Error: aux_{element_type}.csv has no column {field}.'
+            missing = self.get_missing(elements, element_type, field)
+            assert len(missing) == 0, f'Error: elements {missing} have no associated {field.lower()}.'
+        index = pd.Index(elements, name=table.index.name)
+        if field not in table.columns:
+            return pd.Series(index=index, dtype=object, name=field)
+        return table[field].reindex(index)
+
+    def get_colors(self, elements: List[str], element_type: str, errors: str = 'raise') -> pd.Series:
+        return self.lookup(elements, element_type, 'Color', errors)
+
+    def get_names(self, elements: List[str], element_type: str, errors: str = 'raise') -> pd.Series:
+        return self.lookup(elements, element_type, 'Name', errors)
+
+    def get_categories(self, elements: List[str], element_type: str, errors: str = 'raise') -> pd.Series:
+        return self.lookup(elements, element_type, 'Category', errors)
+
+    def get_subcategories(self, elements: List[str], element_type: str, errors: str = 'raise') -> pd.Series:
+        return self.lookup(elements, element_type, 'Subcategory', errors)
+
+
+# One registry per user data directory
+_REGISTRIES: Dict[str, MetadataRegistry] = dict()
+
+
+def get_registry(user_data_path: str) -> MetadataRegistry:
+    """Return the (shared) metadata registry of a user data directory"""
+    path = os.path.abspath(user_data_path)
+    if path not in _REGISTRIES:
+        _REGISTRIES[path] = MetadataRegistry(path)
+    return _REGISTRIES[path]
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to explore the near-optimal space of ESTD STEP 2 with modelling to generate alternatives (MGA)
+
+After a cost-optimal solve, the capacity of groups of technologies is minimized and maximized under the constraint
+TotalCost <= (1 + epsilon) * optimal cost. The cost optimum is solved once. The alternatives are solved one after the
+other in a persistent AMPL instance (one per worker, starting from the cost-optimal solution), each solve being
+warm-started from the previous solution.
+
+Note that the capacities of the technologies of a group are summed, so that a group should only contain technologies
+whose capacities are expressed in the same unit.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from energyscope.amplpy_aux import get_results, to_pd, simplify_df
+from energyscope.profiling import span
+from energyscope.step2_main import create_step2_translator
+
+# Statements added to the model to solve the alternatives (mga_cost_opt must be set before solving)
+MGA_STATEMENTS = """
+param mga_cost_opt >= 0;
+param mga_epsilon >= 0 default 0;
+set MGA_GROUP within TECHNOLOGIES default {};
+subject to mga_cost_slack:
+	TotalCost <= (1 + mga_epsilon) * mga_cost_opt;
+minimize mga_min_group: sum {j in MGA_GROUP} F [j];
+maximize mga_max_group: sum {j in MGA_GROUP} F [j];
+"""
+
+
+def get_tech_groups(data: Dict[str, pd.DataFrame], level: str = 'Category') -> Dict[str, List[str]]:
+    """
+    Group the technologies according to one of the columns of the 'Technologies' table
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Data as returned by import_data
+    level: str (default: 'Category')
+        Column used to group the technologies ('Category' or 'Subcategory')
+
+    Returns
+    -------
+    Dict[str, List[str]]
+        Dictionary associating the list of its technologies to each group
+    """
+    techs = data['Technologies']
+    return {group: list(group_techs.index) for group, group_techs in techs.groupby(level)}
+
+
+def get_alternatives(tech_groups: Dict[str, List[str]], senses: Tuple[str] = ('min', 'max')) -> List[Dict]:
+    """
+    Build the list of alternatives minimizing and/or maximizing the capacity of each group of technologies
+
+    Returns
+    -------
+    List[Dict]
+        List of alternatives, each one being a dictionary with keys 'name', 'group' (list of technologies) and
+        'sense' ('min' or 'max')
+    """
+    for sense in senses:
+        assert sense in ['min', 'max'], "Error: senses must be 'min' or 'max'."
+    return [{'name': f"{sense}_{group}", 'group': techs, 'sense': sense}
+            for group, techs in tech_groups.items() for sense in senses]
+
+
+def get_capacities(ampl_trans) -> pd.Series:
+    """Return the installed capacity F of each technology"""
+    return simplify_df(to_pd(ampl_trans.getVariable('F').getValues()))['F']
+
+
+def set_solution(ampl_trans, solution: Dict[str, pd.DataFrame]) -> None:
+    """
+    Set the values of the variables (as returned by amplpy_aux.get_results) as starting point of the next solve
+    """
+    for name, df in solution.items():
+        variable = ampl_trans.getVariable(name)
+        if df.shape[1] == 1:
+            variable.setValue(float(df.iloc[0, 0]))
+        else:
+            variable.setValues(df.set_index(list(df.columns[:-1])))
+
+
+def solve_alternatives(ampl_trans, alternatives: List[Dict], cost_opt: float, epsilon: float,
+                       declare: bool = True) -> List[Dict]:
+    """
+    Solve a batch of alternatives in the same AMPL instance
+
+    Parameters
+    ----------
+    ampl_trans:
+        AMPL translator with the STEP 2 model and data
+    alternatives: List[Dict]
+        Alternatives to solve (see get_alternatives)
+    cost_opt: float
+        Cost of the cost-optimal solution
+    epsilon: float
+        Relative cost slack
+    declare: bool (default: True)
+        Whether the MGA statements must be added to the model (False if they were already added)
+
+    Returns
+    -------
+    List[Dict]
+        For each alternative, a dictionary with keys 'name', 'sense', 'objective', 'TotalCost', 'solve_result' and
+        'F' (capacities as a pd.Series)
+    """
+    if declare:
+        ampl_trans.eval(MGA_STATEMENTS)
+    ampl_trans.eval(f"let mga_cost_opt := {cost_opt}; let mga_epsilon := {epsilon};")
+
+    rows = []
+    for alternative in alternatives:
+        group = ', '.join(f'"{tech}"' for tech in alternative['group'])
+        ampl_trans.eval(f"let MGA_GROUP := {{{group}}}; objective mga_{alternative['sense']}_group;")
+        with span(f"mga {alternative['name']}"):
+            ampl_trans.solve()
+        capacities = get_capacities(ampl_trans)
+        rows.append({'name': alternative['name'], 'sense': alternative['sense'],
+                     'objective': float(capacities.reindex(alternative['group']).sum()),
+                     'TotalCost': ampl_trans.getVariable('TotalCost').value(),
+                     'solve_result': ampl_trans.getValue('solve_result'), 'F': capacities})
+        logging.info(f"Alternative {alternative['name']}: objective {rows[-1]['objective']:.4g}, "
+                     f"cost {rows[-1]['TotalCost']:.6g} ({rows[-1]['solve_result']})")
+    return rows
+
+
+def _run_worker(alternatives: List[Dict], cost_opt: float, solution: Dict[str, pd.DataFrame], epsilon: float,
+                ampl_path: str, solver_options: Dict, model_fns: List[str], data_fns: List[str], backend: str,
+                backend_options: Dict) -> List[Dict]:
+    ampl_trans = create_step2_translator(ampl_path, solver_options, model_fns, data_fns, backend, backend_options)
+    set_solution(ampl_trans, solution)
+    rows = solve_alternatives(ampl_trans, alternatives, cost_opt, epsilon)
+    ampl_trans.close()
+    return rows
+
+
+def run_mga(output_dir: str, ampl_path: str, solver_options: Dict, model_fns: List[str], data_fns: List[str],
+            alternatives: List[Dict], epsilon: float = 0.1, nbr_workers: int = 1,
+            backend: str = 'amplpy', backend_options: Dict = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Explore the near-optimal space of ESTD STEP 2
+
+    The cost-optimal problem is solved first. With a single worker, the alternatives are then solved in the same AMPL
+    instance. Otherwise, the alternatives are split between the workers, each of them solving its share in its own
+    persistent instance started from the cost-optimal solution (the cost optimum is not solved again).
+
+    Parameters
+    ----------
+    output_dir: str
+        Directory where the capacities (mga_capacities.csv) and the summary of the alternatives (mga_summary.csv)
+        are saved
+    ampl_path: str
+        Path to AMPL
+    solver_options: Dict
+        Solver name and solver options
+    model_fns: List[str]
+        Paths to the model files
+    data_fns: List[str]
+        Paths to the data files
+    alternatives: List[Dict]
+        Alternatives to solve (see get_alternatives)
+    epsilon: float (default: 0.1)
+        Relative cost slack
+    nbr_workers: int (default: 1)
+        Number of worker processes
+    backend: str (default: 'amplpy')
+        Translator backend (see translator.py)
+    backend_options: Dict (default: None)
+        Options of the translator backend
+
+    Returns
+    -------
+    Tuple[pd.DataFrame, pd.DataFrame]
+        Capacities (one row per alternative, one column per technology) and summary (objective, cost and solve result
+        of each alternative), the cost-optimal solution being the first row of both tables
+    """
+    assert epsilon >= 0, 'Error: epsilon must be positive.'
+    os.makedirs(output_dir, exist_ok=True)
+
+    logging.info('Solving the cost-optimal problem')
+    ampl_trans = create_step2_translator(ampl_path, solver_options, model_fns, data_fns, backend, backend_options)
+    with span('mga cost optimum'):
+        ampl_trans.solve()
+    cost_opt = ampl_trans.getVariable('TotalCost').value()
+    rows = [{'name': 'cost_optimal', 'sense': '', 'objective': cost_opt, 'TotalCost': cost_opt,
+             'solve_result': ampl_trans.getValue('solve_result'), 'F': get_capacities(ampl_trans)}]
+
+    logging.info(f"Solving {len(alternatives)} alternatives with a cost slack of {epsilon:.1%}")
+    if nbr_workers == 1:
+        rows += solve_alternatives(ampl_trans, alternatives, cost_opt, epsilon)
+        ampl_trans.close()
+    else:
+        solution = get_results(ampl_trans)
+        ampl_trans.close()
+        batches = [alternatives[i::nbr_workers] for i in range(nbr_workers) if len(alternatives[i::nbr_workers])]
+        with ProcessPoolExecutor(max_workers=len(batches)) as executor:
+            futures = [executor.submit(_run_worker, batch, cost_opt, solution, epsilon, ampl_path, solver_options,
+                                       model_fns, data_fns, backend, backend_options) for batch in batches]
+            for future in as_completed(futures):
+                rows += future.result()
+        # Restore the order of the alternatives
+        order = {alternative['name']: i for i, alternative in enumerate(alternatives)}
+        rows = rows[:1] + sorted(rows[1:], key=lambda r: order[r['name']])
+
+    capacities = pd.DataFrame([row['F'] for row in rows], index=[row['name'] for row in rows])
+    capacities.index.name = 'alternative'
+    summary = pd.DataFrame([{k: v for k, v in row.items() if k != 'F'} for row in rows]).set_index('name')
+    summary.index.name = 'alternative'
+    capacities.to_csv(f"{output_dir}/mga_capacities.csv")
+    summary.to_csv(f"{output_dir}/mga_summary.csv")
+    return capacities, summary
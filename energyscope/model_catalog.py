@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains the catalog of the elements of the model (sets and links between them) built once from the data returned by
+import_data
+
+The catalog stores the labels of each type of elements (resources, technologies, layers, end-use types, ...) and
+encodes the subsets as integer codes or boolean masks over these labels, along with the layers_in_out and storage
+efficiency matrices as arrays. It is the only place where the sets are derived from the data: print_estd prints the
+sets of the catalog, the output generators use them instead of the subsets extracted from AMPL, presolve and the
+synthetic fixtures build on them, and the catalog is saved with each case (<case_study_dir>/output/catalog.npz) so that
+the outputs can be analysed without deriving the sets again.
+"""
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Sets which cannot be derived from the data
+RES_IMPORT_CONSTANT = ['GAS', 'GAS_RE', 'H2_RE', 'H2']
+STORAGE_DAILY = ['TS_DEC_HP_ELEC', 'TS_DEC_THHP_GAS', 'TS_DEC_COGEN_GAS', 'TS_DEC_COGEN_OIL',
+                 'TS_DEC_ADVCOGEN_GAS', 'TS_DEC_ADVCOGEN_H2', 'TS_DEC_BOILER_GAS', 'TS_DEC_BOILER_WOOD',
+                 'TS_DEC_BOILER_OIL', 'TS_DEC_DIRECT_ELEC', 'TS_DHN_DAILY', 'BATT_LI', 'TS_HIGH_TEMP']
+TS_OF_DEC_TECH = {'DEC_HP_ELEC': 'TS_DEC_HP_ELEC', 'DEC_DIRECT_ELEC': 'TS_DEC_DIRECT_ELEC',
+                  'DEC_THHP_GAS': 'TS_DEC_THHP_GAS', 'DEC_COGEN_GAS': 'TS_DEC_COGEN_GAS',
+                  'DEC_ADVCOGEN_GAS': 'TS_DEC_ADVCOGEN_GAS', 'DEC_COGEN_OIL': 'TS_DEC_COGEN_OIL',
+                  'DEC_ADVCOGEN_H2': 'TS_DEC_ADVCOGEN_H2', 'DEC_BOILER_GAS': 'TS_DEC_BOILER_GAS',
+                  'DEC_BOILER_WOOD': 'TS_DEC_BOILER_WOOD', 'DEC_BOILER_OIL': 'TS_DEC_BOILER_OIL'}
+EVS_BATT_OF_V2G = {'CAR_PHEV': 'PHEV_BATT', 'CAR_BEV': 'BEV_BATT'}
+# Layers defining the end-use type of the storage technologies (first layer with a positive input efficiency)
+STORAGE_EUT_LAYERS = ['HEAT_LOW_T_DHN', 'HEAT_LOW_T_DECEN', 'ELECTRICITY', 'HEAT_HIGH_T']
+HEAT_LAYERS = ['HEAT_HIGH_T', 'HEAT_LOW_T_DHN', 'HEAT_LOW_T_DECEN']
+
+# Attributes saved by ModelCatalog.save
+LABELS = ['sectors', 'end_uses_input', 'end_uses_categories', 'end_uses_types', 'resources', 'technologies', 'layers',
+          'entities', 'storage_tech']
+ARRAYS = ['category_of_eut', 'eut_of_entity', 'storage_eut', 'ts_of_dec_tech', 'ev_batt_of_v2g',
+          'is_biofuel', 'is_re', 'is_re_be', 'is_export', 'is_import_constant',
+          'is_infrastructure', 'is_storage_daily', 'is_cogen', 'is_boiler',
+          'layers_in_out', 'storage_eff_in', 'storage_eff_out']
+
+
+class ModelCatalog:
+    """
+    Sets of the model, encoded over the labels of each type of elements (see from_data to build it)
+
+    Attributes
+    ----------
+    sectors, end_uses_input, end_uses_categories, end_uses_types, resources, technologies, layers: pd.Index
+        Labels of the elements
+    entities: pd.Index
+        Resources and technologies of layers_in_out (i.e. without the storage technologies), in the order of the data
+    storage_tech: pd.Index
+        Storage technologies
+    category_of_eut: np.ndarray
+        Code of the category of each end-use type
+    eut_of_entity: np.ndarray
+        Boolean matrix (entities x end-use types), True if the technology produces the end-use type
+    storage_eut: np.ndarray
+        Code of the end-use type of each storage technology (-1 if none, e.g. for the EV batteries)
+    ts_of_dec_tech, ev_batt_of_v2g: np.ndarray
+        Code of the storage technology linked to each technology (-1 if none)
+    is_biofuel, is_re, is_re_be, is_export, is_import_constant: np.ndarray
+        Masks over the resources
+    is_infrastructure, is_storage_daily, is_cogen, is_boiler: np.ndarray
+        Masks over the technologies
+    layers_in_out: np.ndarray
+        Conversion matrix (entities x layers)
+    storage_eff_in, storage_eff_out: np.ndarray
+        Efficiency matrices (storage technologies x layers)
+    """
+
+    def __init__(self, **attributes):
+        for name in LABELS:
+            setattr(self, name, pd.Index(attributes[name]))
+        for name in ARRAYS:
+            setattr(self, name, np.asarray(attributes[name]))
+
+    @classmethod
+    def from_data(cls, data: Dict[str, pd.DataFrame]) -> 'ModelCatalog':
+        """
+        Build the catalog from the data
+
+        Parameters
+        ----------
+        data: Dict[str, pd.DataFrame]
+            Data as returned by import_data
+        """
+        resources = data['Resources']
+        end_uses_categories = data['End_uses_categories']
+        layers_in_out = data['Layers_in_out']
+        storage_eff_in = data['Storage_eff_in']
+        storage_eff_out = data['Storage_eff_out']
+
+        sectors = data['Demand'].columns.drop(['Category', 'Subcategory', 'Units'])
+        categories = pd.Index(end_uses_categories['END_USES_CATEGORIES'].unique())
+        euts = pd.Index(end_uses_categories['END_USES_TYPES_OF_CATEGORY'])
+        technologies = data['Technologies'].index
+        storage_tech = storage_eff_in.index
+        entities = layers_in_out.index
+        layers = layers_in_out.columns
+
+        # Technologies of each end-use type: technologies with an output of 1 on the layer of the end-use type
+        is_tech = ~entities.isin(resources.index)
+        eut_of_entity = (layers_in_out.reindex(columns=euts).values == 1) & is_tech[:, None]
+
+        # End-use type of the storage technologies, except the EV batteries
+        eff_in = storage_eff_in[STORAGE_EUT_LAYERS].values > 0
+        storage_eut = np.where(eff_in.any(axis=1), euts.get_indexer(STORAGE_EUT_LAYERS)[eff_in.argmax(axis=1)], -1)
+        storage_eut[storage_tech.isin(list(EVS_BATT_OF_V2G.values()))] = -1
+
+        # Cogeneration and boilers among the technologies of the end-use types
+        of_eut = technologies.isin(entities[eut_of_entity.any(axis=1)])
+        tech_lio = layers_in_out.reindex(index=technologies).fillna(0.)
+        is_heat = (tech_lio[HEAT_LAYERS] == 1).any(axis=1).values & of_eut
+        is_cogen = is_heat & (tech_lio['ELECTRICITY'] > 0).values
+
+        return cls(sectors=sectors, end_uses_input=data['Demand'].index, end_uses_categories=categories,
+                   end_uses_types=euts, resources=resources.index, technologies=technologies, layers=layers,
+                   entities=entities, storage_tech=storage_tech,
+                   category_of_eut=categories.get_indexer(end_uses_categories['END_USES_CATEGORIES']),
+                   eut_of_entity=eut_of_entity, storage_eut=storage_eut,
+                   ts_of_dec_tech=storage_tech.get_indexer(technologies.map(TS_OF_DEC_TECH)),
+                   ev_batt_of_v2g=storage_tech.get_indexer(technologies.map(EVS_BATT_OF_V2G)),
+                   is_biofuel=(resources['Subcategory'] == 'Biofuel').values,
+                   is_re=(resources['Category'] == 'Renewable').values,
+                   is_re_be=((resources['Category'] == 'Renewable')
+                             & resources['Subcategory'].isin(['Non-biomass', 'Biomass'])).values,
+                   is_export=(resources['Category'] == 'Export').values,
+                   is_import_constant=resources.index.isin(RES_IMPORT_CONSTANT),
+                   is_infrastructure=~technologies.isin(storage_tech) & ~of_eut,
+                   is_storage_daily=technologies.isin(STORAGE_DAILY), is_cogen=is_cogen, is_boiler=is_heat & ~is_cogen,
+                   layers_in_out=layers_in_out.values.astype(float),
+                   storage_eff_in=storage_eff_in.reindex(columns=layers).fillna(0.).values.astype(float),
+                   storage_eff_out=storage_eff_out.reindex(columns=layers).fillna(0.).values.astype(float))
+
+    def get_technologies_of_eut(self) -> Dict[str, List[str]]:
+        """Return the technologies of each end-use type (in the order of layers_in_out)"""
+        return {eut: list(self.entities[self.eut_of_entity[:, i]]) for i, eut in enumerate(self.end_uses_types)}
+
+    def get_sets(self) -> Dict:
+        """
+        Return the sets of the model as lists of labels (indexed sets as dictionaries), as printed in ESTD_data.dat
+        (TECHNOLOGIES_OF_END_USES_CATEGORY is derived in the model and not printed) and in the same format as
+        amplpy_aux.get_sets
+        """
+        techs_of_eut = self.get_technologies_of_eut()
+        all_tech_of_eut = [tech for techs in techs_of_eut.values() for tech in techs]
+        tech_codes = self.technologies.get_indexer(all_tech_of_eut)
+        resources = self.resources
+        return {
+            'SECTORS': list(self.sectors),
+            'END_USES_INPUT': list(self.end_uses_input),
+            'END_USES_CATEGORIES': list(self.end_uses_categories),
+            'RESOURCES': list(resources),
+            'RES_IMPORT_CONSTANT': list(resources[self.is_import_constant]),
+            'BIOFUELS': list(resources[self.is_biofuel]),
+            'RE_RESOURCES': list(resources[self.is_re]),
+            'RE_BE_RESOURCES': list(resources[self.is_re_be]),
+            'EXPORT': list(resources[self.is_export]),
+            'END_USES_TYPES_OF_CATEGORY': {cat: list(self.end_uses_types[self.category_of_eut == i])
+                                           for i, cat in enumerate(self.end_uses_categories)},
+            'END_USES_TYPES': list(self.end_uses_types),
+            'TECHNOLOGIES': list(self.technologies),
+            'TECHNOLOGIES_OF_END_USES_TYPE': techs_of_eut,
+            'TECHNOLOGIES_OF_END_USES_CATEGORY': {cat: [tech for eut in self.end_uses_types[self.category_of_eut == i]
+                                                        for tech in techs_of_eut[eut]]
+                                                  for i, cat in enumerate(self.end_uses_categories)},
+            'STORAGE_TECH': list(self.storage_tech),
+            'INFRASTRUCTURE': list(self.technologies[self.is_infrastructure]),
+            'EVs_BATT': list(self.storage_tech[self.ev_batt_of_v2g[self.ev_batt_of_v2g >= 0]]),
+            'V2G': list(self.technologies[self.ev_batt_of_v2g >= 0]),
+            'STORAGE_DAILY': list(self.technologies[self.is_storage_daily]),
+            'STORAGE_OF_END_USES_TYPES': {self.end_uses_types[i]: list(self.storage_tech[self.storage_eut == i])
+                                          for i in self.end_uses_types.get_indexer(STORAGE_EUT_LAYERS)},
+            'TS_OF_DEC_TECH': {tech: [self.storage_tech[code]]
+                               for tech, code in zip(self.technologies, self.ts_of_dec_tech) if code >= 0},
+            'EVs_BATT_OF_V2G': {tech: [self.storage_tech[code]]
+                                for tech, code in zip(self.technologies, self.ev_batt_of_v2g) if code >= 0},
+            'COGEN': list(self.technologies[tech_codes[self.is_cogen[tech_codes]]]),
+            'BOILERS': list(self.technologies[tech_codes[self.is_boiler[tech_codes]]]),
+            'LAYERS': list(self.layers)
+        }
+
+    def get_layers_in_out(self) -> pd.DataFrame:
+        """Return the conversion matrix as a DataFrame (entities x layers)"""
+        return pd.DataFrame(self.layers_in_out, index=self.entities, columns=self.layers)
+
+    def save(self, fn: str) -> None:
+        """Save the catalog in a .npz file"""
+        np.savez_compressed(fn, **{name: np.asarray(getattr(self, name), dtype=str) for name in LABELS},
+                            **{name: getattr(self, name) for name in ARRAYS})
+
+    @classmethod
+    def load(cls, fn: str) -> 'ModelCatalog':
+        """Load a catalog saved by save"""
+        with np.load(fn, allow_pickle=False) as arrays:
+            return cls(**{name: arrays[name] for name in LABELS + ARRAYS})
+
+
+def get_named_elements() -> List[str]:
+    """Return the technologies and resources named in the sets which cannot be derived from the data"""
+    return sorted(set(RES_IMPORT_CONSTANT) | set(STORAGE_DAILY) | set(TS_OF_DEC_TECH) | set(TS_OF_DEC_TECH.values())
+                  | set(EVS_BATT_OF_V2G) | set(EVS_BATT_OF_V2G.values()))
+
+
+def load_catalog(case_study_dir: str) -> ModelCatalog:
+    """Load the catalog saved with a case study (<case_study_dir>/output/catalog.npz)"""
+    return ModelCatalog.load(f"{case_study_dir}/output/catalog.npz")
@@ -27,8 +27,8 @@
 ############################
 ###  MILP formulation    ###
 ############################
-set DIMENSIONS := 1 .. 120;		# Number of input data per day (24h x nbr of time series)
-set DAYS := 1 .. 365;			# Number of days 
+set DIMENSIONS default 1 .. 120;		# Number of input data per day (24h x nbr of time series)
+set DAYS default 1 .. 365;			# Number of days 
 
 ### parameters
 param Nbr_TD default 12; 				#Number of TD days
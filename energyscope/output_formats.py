@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to write the output tables of a run in different formats and to read them whatever their format
+
+The output tables keep their usual name (e.g. 'year_balance.csv') in the code and are written with the extension of
+their format:
+- 'csv' (default): plain CSV, as read by any tool;
+- 'csv.gz': gzip-compressed CSV ('.csv.gz');
+- 'csv.zst': zstd-compressed CSV ('.csv.zst'), requires the zstandard package;
+- 'parquet': chunked columnar format ('.parquet', row groups of chunk_size rows), requires pyarrow.
+read_table finds the file of a table in any of these formats and returns the same DataFrame as pd.read_csv would for
+the CSV file. The copies of the input files (e.g. the .dat files) kept in the case study directories are compressed
+with gzip or zstd when the outputs are not written as plain CSV (see copy_file).
+"""
+import gzip
+import os
+import shutil
+from typing import List, Union
+
+import pandas as pd
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+OUTPUT_FORMATS = {'csv': '.csv', 'csv.gz': '.csv.gz', 'csv.zst': '.csv.zst', 'parquet': '.parquet'}
+# Compression of the copies of the input files for each output format
+FILE_COMPRESSIONS = {'csv': None, 'csv.gz': 'gzip', 'csv.zst': 'zstd', 'parquet': 'gzip'}
+
+
+def check_output_format(output_format: str) -> None:
+    """Check that the output format is known and that the package it requires is installed"""
+    assert output_format in OUTPUT_FORMATS, f'Error: output_format must be one of {list(OUTPUT_FORMATS)}.'
+    if output_format == 'csv.zst' and zstandard is None:
+        raise ImportError("The 'csv.zst' output format requires zstandard. Install it with "
+                          "'pip install zstandard' (see requirements-optional.txt) or use output_format='csv.gz'.")
+    if output_format == 'parquet' and pyarrow is None:
+        raise ImportError("The 'parquet' output format requires pyarrow. Install it with "
+                          "'pip install pyarrow' (see requirements-optional.txt) or use output_format='csv.gz'.")
+
+
+def get_table_path(path: str, output_format: str = 'csv') -> str:
+    """Return the path of the file of a table given by its CSV path (e.g. 'output/year_balance.csv') in a format"""
+    base = path[:-len('.csv')] if path.endswith('.csv') else path
+    return f"{base}{OUTPUT_FORMATS[output_format]}"
+
+
+def write_table(df: Union[pd.DataFrame, pd.Series], path: str, output_format: str = 'csv',
+                chunk_size: int = 8760) -> str:
+    """
+    Write a table (index included) in a format
+
+    Parameters
+    ----------
+    df: Union[pd.DataFrame, pd.Series]
+        Table to write
+    path: str
+        Path to the table as a CSV file (e.g. 'output/year_balance.csv'), its extension is replaced by the one of the
+        format
+    output_format: str (default: 'csv')
+        Format of the file (see OUTPUT_FORMATS)
+    chunk_size: int (default: 8760)
+        Number of rows of each row group of the 'parquet' format
+
+    Returns
+    -------
+    str
+        Path to the file written
+    """
+    check_output_format(output_format)
+    out_path = get_table_path(path, output_format)
+    if output_format == 'parquet':
+        # The index is written as columns, as in a CSV file, so that read_table handles index_col in the same way
+        df = df.to_frame() if isinstance(df, pd.Series) else df
+        df = df.reset_index()
+        df.columns = ['' if name is None or name == 'index' else str(name) for name in df.columns]
+        df.to_parquet(out_path, engine='pyarrow', index=False, row_group_size=chunk_size)
+    else:
+        df.to_csv(out_path)
+    return out_path
+
+
+def find_table(path: str) -> str:
+    """Return the path of the file of a table given by its CSV path, whatever its format"""
+    for output_format in OUTPUT_FORMATS:
+        table_path = get_table_path(path, output_format)
+        if os.path.isfile(table_path):
+            return table_path
+    raise FileNotFoundError(f"No file found for {path} (accepted extensions: {list(OUTPUT_FORMATS.values())})")
+
+
+def read_table(path: str, index_col: Union[int, List[int]] = None, **kwargs) -> pd.DataFrame:
+    """
+    Read a table written by write_table (or a CSV file) whatever its format
+
+    Parameters
+    ----------
+    path: str
+        Path to the table as a CSV file (e.g. 'output/year_balance.csv')
+    index_col: Union[int, List[int]] (default: None)
+        Position of the columns used as index (as in pd.read_csv)
+    kwargs:
+        Other arguments of pd.read_csv (CSV formats only)
+
+    Returns
+    -------
+    pd.DataFrame
+        Content of the table
+    """
+    table_path = find_table(path)
+    if not table_path.endswith(OUTPUT_FORMATS['parquet']):
+        return pd.read_csv(table_path, index_col=index_col, **kwargs)
+
+    assert len(kwargs) == 0, f"Error: arguments {list(kwargs)} are not supported for the 'parquet' format."
+    if pyarrow is None:
+        raise ImportError(f"Reading {table_path} requires pyarrow. Install it with 'pip install pyarrow' "
+                          f"(see requirements-optional.txt).")
+    df = pd.read_parquet(table_path, engine='pyarrow')
+    if index_col is not None:
+        positions = [index_col] if isinstance(index_col, int) else index_col
+        df = df.set_index([df.columns[i] for i in positions])
+        df.index.names = [None if name == '' else name for name in df.index.names]
+    return df
+
+
+def copy_file(src: str, dst_dir: str, output_format: str = 'csv') -> str:
+    """
+    Copy a file into a directory, compressed with the compression associated to the output format (see
+    FILE_COMPRESSIONS) and return the path to the copy
+    """
+    compression = FILE_COMPRESSIONS[output_format]
+    dst = os.path.join(dst_dir, os.path.basename(src))
+    if compression is None:
+        shutil.copy2(src, dst)
+        return dst
+    if compression == 'gzip':
+        dst += '.gz'
+        with open(src, 'rb') as f_in, gzip.open(dst, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+    else:
+        dst += '.zst'
+        with open(src, 'rb') as f_in, open(dst, 'wb') as f_out:
+            zstandard.ZstdCompressor().copy_stream(f_in, f_out)
+    return dst
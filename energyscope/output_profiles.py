@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains the output profiles of ESTD STEP 2 runs, which define what is extracted from AMPL, which output files are
+generated and what is kept in the case study directory
+
+An output profile is a dictionary with the keys:
+- 'results', 'parameters', 'sets': names of the variables, parameters and sets extracted from AMPL;
+- 'save': output files generated (keys of SAVE_FUNCTIONS), in this order;
+- 'pickles': extracted entities dumped in pickle files ('results', 'parameters' and/or 'sets');
+- 'summary': variables summarized in the dictionary returned by run_step2_new (see get_summary);
+- 'persist': whether the case study directory is written (False to only return the summary, e.g. in large sweeps);
+- 'output_format': format of the output tables, 'csv' by default (see output_formats.py).
+The named profiles are:
+- 'minimal': objectives and installed capacities returned as a summary, nothing written;
+- 'standard': cost, GWP, Einv and resources breakdowns and year balance, with the pickles of the extracted entities;
+- 'full_hourly': all the outputs, including the hourly dispatch and the Sankey diagram input file (default).
+"""
+import logging
+from typing import Dict, List, Union
+
+import pandas as pd
+
+from energyscope.hourly_dispatch import save_hourly_dispatch
+from energyscope.output_formats import check_output_format
+from energyscope.sankey_input import generate_sankey_file
+from energyscope.step2_output_generator import save_breakdowns, save_year_balance, save_assets, \
+    save_tech_res_matrices, save_losses, save_layers, save_energy_stored
+from energyscope.utils import make_dir
+from energyscope.xarray_export import save_dataset_file
+
+# Entities used by save_results and generate_sankey_file (and the objectives)
+STEP2_RESULTS = ['F', 'F_t', 'F_t_solar', 'Storage_in', 'Storage_out', 'Storage_level', 'End_uses', 'Network_losses',
+                 'C_inv', 'C_maint', 'C_op', 'GWP_constr', 'GWP_op', 'Einv_constr', 'Einv_op',
+                 'TotalCost', 'TotalGWP', 'TotalEinv']
+STEP2_PARAMETERS = ['avail', 'c_op', 'c_p', 'c_p_t', 'f_max', 'f_min', 'fmax_perc', 'fmin_perc', 'gwp_op',
+                    'layers_in_out', 'lifetime', 'storage_eff_in', 'storage_eff_out', 't_op', 'tau']
+STEP2_SETS = ['BIOFUELS', 'BOILERS', 'COGEN', 'END_USES_TYPES', 'EXPORT', 'HOURS', 'HOUR_OF_PERIOD', 'INFRASTRUCTURE',
+              'LAYERS', 'PERIODS', 'RESOURCES', 'STORAGE_OF_END_USES_TYPES', 'STORAGE_TECH', 'TECHNOLOGIES',
+              'TECHNOLOGIES_OF_END_USES_TYPE', 'TS_OF_DEC_TECH', 'TYPICAL_DAYS', 'TYPICAL_DAY_OF_PERIOD']
+OBJECTIVES = ['TotalCost', 'TotalGWP', 'TotalEinv']
+
+# Output files and the function generating them (and their sub-directory of the output directory)
+SAVE_FUNCTIONS = {'breakdowns': (save_breakdowns, ''), 'year_balance': (save_year_balance, ''),
+                  'hourly_dispatch': (save_hourly_dispatch, 'hourly_data/'), 'assets': (save_assets, ''),
+                  'tech_res_matrices': (save_tech_res_matrices, ''), 'losses': (save_losses, ''),
+                  'layers': (save_layers, 'hourly_data/'), 'energy_stored': (save_energy_stored, 'hourly_data/'),
+                  'sankey': (generate_sankey_file, 'sankey/'), 'dataset': (save_dataset_file, '')}
+# Outputs which are not tables (their format does not depend on output_format)
+ARRAY_OUTPUTS = ['hourly_dispatch', 'dataset']
+
+OUTPUT_PROFILES = {
+    'minimal': {'results': ['F'] + OBJECTIVES, 'parameters': [], 'sets': ['RESOURCES', 'STORAGE_TECH', 'TECHNOLOGIES'],
+                'save': [], 'pickles': [], 'summary': OBJECTIVES + ['F'], 'persist': False, 'output_format': 'csv'},
+    'standard': {'results': ['F', 'F_t', 'Storage_in', 'Storage_out', 'End_uses', 'C_inv', 'C_maint', 'C_op',
+                             'GWP_constr', 'GWP_op', 'Einv_constr', 'Einv_op'] + OBJECTIVES,
+                 'parameters': ['avail', 'layers_in_out', 'lifetime', 't_op', 'tau'],
+                 'sets': ['HOURS', 'HOUR_OF_PERIOD', 'LAYERS', 'PERIODS', 'RESOURCES', 'STORAGE_TECH', 'TECHNOLOGIES',
+                          'TYPICAL_DAYS', 'TYPICAL_DAY_OF_PERIOD'],
+                 'save': ['breakdowns', 'year_balance'], 'pickles': ['results', 'parameters', 'sets'],
+                 'summary': OBJECTIVES + ['F'], 'persist': True, 'output_format': 'csv'},
+    'full_hourly': {'results': STEP2_RESULTS, 'parameters': STEP2_PARAMETERS, 'sets': STEP2_SETS,
+                    'save': ['breakdowns', 'year_balance', 'hourly_dispatch', 'sankey'],
+                    'pickles': ['results', 'parameters', 'sets'], 'summary': OBJECTIVES + ['F'], 'persist': True,
+                    'output_format': 'csv'}
+}
+
+
+def get_output_profile(output_profile: Union[str, Dict]) -> Dict:
+    """
+    Return an output profile given by its name (see OUTPUT_PROFILES) or as a dictionary (missing keys are taken from
+    'full_hourly')
+    """
+    if isinstance(output_profile, str):
+        assert output_profile in OUTPUT_PROFILES, f'Error: output_profile must be one of {list(OUTPUT_PROFILES)}.'
+        return OUTPUT_PROFILES[output_profile]
+    unknown = [key for key in output_profile if key not in OUTPUT_PROFILES['full_hourly']]
+    assert len(unknown) == 0, f'Error: unknown keys {unknown} in output_profile.'
+    unknown = [name for name in output_profile.get('save', []) if name not in SAVE_FUNCTIONS]
+    assert len(unknown) == 0, f'Error: unknown outputs {unknown}, accepted outputs are {list(SAVE_FUNCTIONS)}.'
+    output_profile = {**OUTPUT_PROFILES['full_hourly'], **output_profile}
+    check_output_format(output_profile['output_format'])
+    return output_profile
+
+
+def save_outputs(saves: List[str], results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
+                 sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
+    """
+    Generate some output files (see SAVE_FUNCTIONS)
+
+    Parameters
+    ----------
+    saves: List[str]
+        Output files generated (keys of SAVE_FUNCTIONS)
+    results: Dict[str, pd.DataFrame]
+        Dictionary containing for each variable of the problem, the result of the optimization as a DataFrame
+    parameters: Dict[str, pd.DataFrame]
+        Dictionary containing for each parameter of the problem, the corresponding DataFrame
+    sets: Dict
+        Dictionary containing all the sets and subsets defined in the problem
+    output_dir: str
+        Path to the directory where output files ought to be saved
+    output_format: str (default: 'csv')
+        Format of the output tables (see output_formats.py), the hourly dispatch is always saved as .npy arrays and the
+        dataset in NetCDF (see xarray_export.py)
+    """
+    for name in saves:
+        save_function, sub_dir = SAVE_FUNCTIONS[name]
+        logging.info(f"Saving {name.replace('_', ' ')}")
+        kwargs = dict() if name in ARRAY_OUTPUTS else {'output_format': output_format}
+        if sub_dir:
+            make_dir(f"{output_dir}{sub_dir}")
+        save_function(results, parameters, sets, f"{output_dir}{sub_dir}", **kwargs)
+
+
+def get_summary(results: Dict[str, pd.DataFrame], names: List[str]) -> Dict[str, float]:
+    """
+    Summarize some variables in a flat dictionary: value of the scalar variables (e.g. 'TotalCost') and
+    '<name>_<index>' for the variables with one index (e.g. 'F_PV')
+    """
+    summary = dict()
+    for name in names:
+        df = results[name]
+        if df.shape[1] == 1:
+            summary[name] = float(df.iloc[0, 0])
+        else:
+            assert df.shape[1] == 2, f'Error: {name} has more than one index and cannot be summarized.'
+            summary.update({f"{name}_{index}": float(value) for index, value in df.itertuples(index=False)})
+    return summary
@@ -9,6 +9,11 @@ from typing import Dict
 
 import pandas as pd
 
+from energyscope.metadata import get_registry
+from energyscope.output_formats import read_table
+from energyscope.postprocessing_matrix import YearBalanceStack, compute_fec_stack, compute_primary_energy_stack, \
+    compute_gwp_op_stack, aggregate_by_category
+
 
 def get_cost(cs: str):
     """
@@ -16,13 +21,13 @@ def get_cost(cs: str):
     :param cs: directory name.
     :return cost values breakdown between C_inv, C_maint, and C_op.
     """
-    cost = pd.read_csv(f"{cs}/output/cost_breakdown.csv", index_col=0, sep=',')
+    cost = read_table(f"{cs}/output/cost_breakdown.csv", index_col=0)
 
     return cost.sum()
 
 
 def get_total_cost(output_path: str):
-    costs = pd.read_csv(f"{output_path}/output/cost_breakdown.csv", index_col=0)
+    costs = read_table(f"{output_path}/output/cost_breakdown.csv", index_col=0)
     return costs.sum().sum()
 
 
@@ -32,13 +37,13 @@ def get_gwp(cs: str):
     :param cs: directory name.
     :return GWP value.
     """
-    gwp = pd.read_csv(f"{cs}/output/gwp_breakdown.csv", index_col=0, sep=',')
+    gwp = read_table(f"{cs}/output/gwp_breakdown.csv", index_col=0)
 
     return gwp.sum()
 
 
 def get_total_gwp(output_path: str):
-    gwp = pd.read_csv(f"{output_path}/output/gwp_breakdown.csv", index_col=0)
+    gwp = read_table(f"{output_path}/output/gwp_breakdown.csv", index_col=0)
     return gwp.sum().sum()
 
 
@@ -50,7 +55,7 @@ def compute_einv_res(cs: str, all_data: dict):
     :return: the data into pd.DataFrames
     """
     # Load Einv data
-    df_einv = pd.read_csv(f"{cs}/output/einv_breakdown.csv", index_col=0)
+    df_einv = read_table(f"{cs}/output/einv_breakdown.csv", index_col=0)
     # Define the RESOURCES list
     resources = list(all_data['Resources'].index)
     return df_einv.loc[resources].copy()['Einv_op']
@@ -64,25 +69,25 @@ def compute_einv_tech(cs: str, all_data: dict):
     :return: the data into pd.DataFrames
     """
     # Load Einv data
-    df_einv = pd.read_csv(f"{cs}/output/einv_breakdown.csv", index_col=0)
+    df_einv = read_table(f"{cs}/output/einv_breakdown.csv", index_col=0)
     # Define the TECHNOLOGIES list
     technologies = list(all_data['Technologies'].index)
     return df_einv.loc[technologies].copy()['Einv_constr']
 
 
 def get_total_einv(output_path: str):
-    einv = pd.read_csv(f"{output_path}/output/einv_breakdown.csv", index_col=0)
+    einv = read_table(f"{output_path}/output/einv_breakdown.csv", index_col=0)
     return einv.sum().sum()
 
 
 def get_asset_value(output_path: str, param: str, tech: str, from_pickle=False):
-    assets = pd.read_csv(f"{output_path}/output/assets.csv", index_col=0)
+    assets = read_table(f"{output_path}/output/assets.csv", index_col=0)
     assets.columns = [c.strip() for c in assets.columns]
     return float(assets.loc[tech, param])
 
 
 def get_resource_used(output_path: str, res: str):
-    resources_breakdown = pd.read_csv(f"{output_path}/output/resources_breakdown.csv", index_col=0)
+    resources_breakdown = read_table(f"{output_path}/output/resources_breakdown.csv", index_col=0)
     return resources_breakdown.loc[res, 'Used']
 
 
@@ -126,65 +131,12 @@ def compute_fec(year_balance: pd.DataFrame, user_data_dir: str) -> (Dict, Dict):
     :return FEC detailed by EUD and technologies into fec_details dict, and FEC aggregated by EUD into fec_tot dict.
 
     Assumption: FEC ELECTRICITY = EUD ELECTRICITY
-    See the FEC computation details for a given EUD in the function fec_given_tech(eud=eud, tech=tech, data=data)
+    See the FEC computation details in postprocessing_matrix.compute_fec_stack (same as fec_given_tech for each tech)
     """
-    # EUD types except ELECTRICITY
-    eud_types = ['HEAT_HIGH_T', 'HEAT_LOW_T_DHN', 'HEAT_LOW_T_DECEN', 'MOB_PUBLIC', 'MOB_PRIVATE', 'MOB_FREIGHT_RAIL',
-                 'MOB_FREIGHT_BOAT', 'MOB_FREIGHT_ROAD', 'HVC', 'AMMONIA', 'METHANOL']
-
     # Get list of resources
-    # TODO: maybe directly pass the list of resources ? or call a function that gives them
-    resources = list(pd.read_csv(user_data_dir + "/aux_resources.csv", index_col=0).index)
-
-    # fec_details = dict()  #
-    fec_details_df = pd.DataFrame()
-    # fec_tot = dict()
-    for eud in eud_types:
-        # Series with as index the technologies/resource producing the eud given as key and the associated
-        # production of this technology/resource
-        # TODO: why not drop END_USES_DEMAND from the start as it is never used
-        prod_eud = year_balance[eud].drop(index=['END_USES_DEMAND'])[year_balance[eud] > 0]
-        # Total production for this eud
-        prod_sum = prod_eud.sum()
-        # Total consumption of this eud
-        conso_sum = -year_balance[eud].drop(index=['END_USES_DEMAND'])[year_balance[eud] < 0].sum()
-        # Note: conso_eud + eud = prod_sum
-        # -> see appendix B of The energy return on investment of whole-energy systems: application to Belgium.
-        # We calculate the FEC of the eud and not of conso_eud + eud! -> a correction factor is required
-        fec_eud = []
-        for tech_or_res in list(prod_eud.index):
-            # Correction factor to calculate the FEC corresponding to the consumption of the eud
-            corr_factor = prod_eud[tech_or_res] / prod_sum
-            # Note: if consumption = 0, then prod_corr is the same as the non-corrected eud
-            prod_corr = prod_eud[tech_or_res] - conso_sum * corr_factor
-            # Use directly the corrected production if it is a resource and apply a transformation if it is a tech
-            if tech_or_res not in resources:
-                fec_corr = fec_given_tech(tech=tech_or_res, year_balance=year_balance, prod_corr=prod_corr)
-                # TODO: remove ?
-                # fec_tech = fec_given_tech(tech=tech, year_balance=year_balance, prod_corr=prod_tech_eud[tech])
-            else:
-                fec_corr = prod_corr
-                # fec_tech = prod_tech_eud[tech] # TODO: remove ?
-            # print('%s %s %.1f %.1f %.1f' %(eud, tech, fec_tech, fec_tech_corr, corr_factor))
-            fec_eud.append([tech_or_res, fec_corr])
-
-        # TODO: c'est un peu degeu de faire comme ça non ?
-        # fec_details[eud] = pd.DataFrame(fec_eud).round(3)
-        # fec_tot[eud] = pd.DataFrame(fec_eud)[1].sum().round(3)
-        fec_details_df = fec_details_df.append(pd.DataFrame(fec_eud, index=[eud]*len(fec_eud)))
-
-    fec_details_df.loc['ELECTRICITY'] = ['ELECTRICITY', year_balance.loc['END_USES_DEMAND', 'ELECTRICITY']]
-    fec_details_df = fec_details_df.reset_index()
-    fec_details_df.columns = ['eud', 'tech', 'value']
-    fec_details_df = fec_details_df.set_index(['eud', 'tech'])
-    fec_details_df = fec_details_df.round(3)
-
-    # Add electricity
-    # TODO: surtout que ELECTRICITY est pas save de la même manière
-    # fec_details['ELECTRICITY'] = year_balance.loc['END_USES_DEMAND', 'ELECTRICITY']
-    # fec_tot['ELECTRICITY'] = year_balance.loc['END_USES_DEMAND', 'ELECTRICITY']
-
-    # return fec_details, fec_tot
+    resources = list(get_registry(user_data_dir).table('resources').index)
+
+    fec_details_df = compute_fec_stack(YearBalanceStack({'case': year_balance}), resources).loc['case']
     return fec_details_df, fec_details_df.groupby('eud').sum().squeeze()
 
 
@@ -198,44 +150,25 @@ def compute_einv_details(cs: str, user_data: str, all_data: dict):
     :return: the data into pd.DataFrames
     """
     # Load Einv data
-    df_einv = pd.read_csv(f"{cs}/output/einv_breakdown.csv", index_col=0)
+    df_einv = read_table(f"{cs}/output/einv_breakdown.csv", index_col=0)
     # Define the RESOURCES and TECHNOLOGIES lists
     resources = list(all_data['Resources'].index)
     technologies = list(all_data['Technologies'].index)
     df_inv_res = df_einv.loc[resources].copy()
     df_inv_tech = df_einv.loc[technologies].copy()
     # Get the category and subcategory indexes
-    df_aux_res = pd.read_csv(user_data + "/aux_resources.csv", index_col=0)
-    df_aux_tech = pd.read_csv(user_data + "/aux_technologies.csv", index_col=0)
+    registry = get_registry(user_data)
+    res_subcat = registry.table('resources')['Subcategory']
+    tech_cat = registry.table('technologies')['Category']
 
     # 1. Compute the Einv by subcategory of resources
-    res_subcat = list(df_aux_res['Subcategory'].values)
-    res_subcat = list(dict.fromkeys(res_subcat))  # remove duplicate
-
-    res_by_subcat = dict()
-    for sub_cat in res_subcat:
-        res_by_subcat[sub_cat] = list(df_aux_res['Subcategory'][df_aux_res['Subcategory'] == sub_cat].index)
-
-    einv_res_by_subcat = dict()
-    for sub_cat in res_by_subcat.keys():
-        einv_res_by_subcat[sub_cat] = df_inv_res.loc[res_by_subcat[sub_cat]]
-    df_inv_res_by_subcat = pd.DataFrame(
-        data=[einv_res_by_subcat[sub_cat].sum().sum() for sub_cat in einv_res_by_subcat.keys()],
-        index=einv_res_by_subcat.keys(), columns=['RESSOURCES'])  # FIXME: TYPO ?
+    df_inv_res_by_subcat = df_inv_res.sum(axis=1).groupby(res_subcat.reindex(df_inv_res.index)).sum()
+    df_inv_res_by_subcat = df_inv_res_by_subcat.reindex(res_subcat.unique(), fill_value=0.)
+    df_inv_res_by_subcat = df_inv_res_by_subcat.to_frame('RESSOURCES')  # FIXME: TYPO ?
 
     # 2. Compute the Einv by category of technologies
-    tech_cat = list(df_aux_tech['Category'].values)
-    tech_cat = list(dict.fromkeys(tech_cat))  # remove duplicate
-
-    tech_by_cat = dict()
-    for cat in tech_cat:
-        tech_by_cat[cat] = list(df_aux_tech['Category'][df_aux_tech['Category'] == cat].index)
-
-    einv_tech_by_cat = dict()
-    for cat in tech_by_cat.keys():
-        einv_tech_by_cat[cat] = df_inv_tech.loc[tech_by_cat[cat]]
-    df_inv_tech_by_cat = pd.DataFrame(data=[einv_tech_by_cat[cat].sum().sum() for cat in einv_tech_by_cat.keys()],
-                                      index=einv_tech_by_cat.keys(), columns=['TECHNOLOGIES'])
+    df_inv_tech_by_cat = df_inv_tech.sum(axis=1).groupby(tech_cat.reindex(df_inv_tech.index)).sum()
+    df_inv_tech_by_cat = df_inv_tech_by_cat.reindex(tech_cat.unique(), fill_value=0.).to_frame('TECHNOLOGIES')
 
     return df_inv_res_by_subcat, df_inv_tech_by_cat
 
@@ -246,93 +179,31 @@ def compute_primary_energy(cs: str, user_data: str, run: str, all_data: dict):
     :param cs: case study path.
     :param user_data: user_data directory
     :param run: run name.
-    :param all_data: FIXME: complete
+    :param all_data: the data into a dict of pd.DataFrames (as returned by import_data).
     :return: the data into pd.DataFrames.
     """
-    # load year_balance.csv
-    df_y_balance = pd.read_csv(f"{cs}/output/year_balance.csv", index_col=0)
-
     # list the resources
     resources = list(all_data['Resources'][all_data['Resources']['Category'] != 'Others'].index)
     # remove resources related to CO2
     resources.remove('CO2_EMISSIONS')
 
-    # select primary energy from the year_balance.csv into a pd.DataFrame
-    # df_temp = df_y_balance.loc[resources].sum().loc[['ELECTRICITY', 'GASOLINE', 'DIESEL', 'LFO', 'GAS', 'WOOD',
-    #                                                  'WET_BIOMASS', 'COAL', 'URANIUM', 'WASTE', 'H2', 'AMMONIA',
-    #                                                  'METHANOL',
-    #                                                  'RES_WIND', 'RES_SOLAR', 'RES_HYDRO', 'RES_GEO']] / 1000  # TWh
-
-    df_temp = df_y_balance.loc[resources].sum(axis=1) / 1000  # TWh
-    df_primary_energy = pd.DataFrame(data=df_temp.values, index=df_temp.index, columns=['RESSOURCES'])
-
     # Label each resource by its subcategory: ['Other non-renewable', 'Fossil fuel', 'Biomass', 'Non-biomass']
-    df_primary_energy['Subcategory'] = ''
-    df_aux_res = pd.read_csv(user_data + "/aux_resources.csv", index_col=0)
-    for ind in df_primary_energy.index:
-        df_primary_energy['Subcategory'].loc[ind] = df_aux_res.loc[ind]['Subcategory']
-
-    # List of the subcategories into a list
-    res_subcat = list(df_primary_energy['Subcategory'].values)
-    res_subcat = list(dict.fromkeys(res_subcat))  # remove duplicate
+    subcategory = get_registry(user_data).get_subcategories(resources, 'resources')
 
-    # aggregate the primary energy by subcategory
-    primary_dict = dict()
-    for subcat in res_subcat:
-        primary_dict[subcat] = df_primary_energy[df_primary_energy['Subcategory'] == subcat]['RESSOURCES'].sum()
+    # select primary energy from the year_balance.csv [TWh] and aggregate it by subcategory
+    stack = YearBalanceStack.from_case_studies({run: cs})
+    primary_energy = compute_primary_energy_stack(stack, subcategory)
+    df_primary_energy = pd.DataFrame({'RESSOURCES': primary_energy[run], 'Subcategory': subcategory})
 
-    return pd.DataFrame(data=primary_dict.values(), index=primary_dict.keys(), columns=[run]), \
-        df_primary_energy.sort_values(by=['Subcategory'])
+    return aggregate_by_category(primary_energy, subcategory), df_primary_energy.sort_values(by=['Subcategory'])
 
 
 # Function to compute the annual average emission factors of each resource from the outputs #
 def compute_gwp_op(import_folders, out_path='STEP_2_Energy_Model'):
     # import data and model outputs
-    resources = pd.read_csv(import_folders[0] + '/Resources.csv', index_col=2, header=2)
-    yb = pd.read_csv(out_path + '/output/year_balance.csv', index_col=0)
-
-    # clean df and get useful data
-    yb.rename(columns=lambda x: x.strip(), inplace=True)
-    yb.rename(index=lambda x: x.strip(), inplace=True)
-    gwp_op_data = resources['gwp_op'].dropna()
-    res_names = list(gwp_op_data.index)
-    res_names_red = list(set(res_names) & set(list(yb.columns)))  # resources that are a layer
-    yb2 = yb.drop(index='END_USES_DEMAND')
-    tot_year = yb2.mul(yb2.gt(0)).sum()[res_names_red]
-
-    # compute the actual resources used to produce each resource
-    res_used = pd.DataFrame(0, columns=res_names_red, index=res_names)
-    for r in res_names_red:
-        yb_r = yb2.loc[yb2.loc[:, r] > 0, :]
-        for i, j in yb_r.iterrows():
-            if i in res_names:
-                res_used.loc[i, r] = res_used.loc[i, r] + j[i]
-            else:
-                s = list(j[j < 0].index)[0]
-                res_used.loc[s, r] = res_used.loc[s, r] - j[s]
-
-    # differentiate the imported resources from the ones that are the mix
-    # between the imported ones and the produced ones
-    gwp_op_imp = gwp_op_data.copy()
-    gwp_op_imp.rename(index=lambda x: x + '_imp', inplace=True)
-    gwp_op = pd.concat([gwp_op_data.copy(), gwp_op_imp])
-    res_used_imp = pd.DataFrame(0, index=res_used.index, columns=res_used.columns)
-    for i, j in res_used.iteritems():
-        res_used_imp.loc[i, i] = j[i]
-        res_used.loc[i, i] = 0
-    res_used_imp.rename(index=lambda x: x + '_imp', inplace=True)
-    all_res_used = pd.concat([res_used, res_used_imp])
-
-    # compute the gwp_op of each mix through looping over the equations
-    gwp_op_new = gwp_op.copy()
-    conv = 100
-    count = 0
-    while conv > 1e-6:
-        gwp_op = gwp_op_new
-        gwp_op_new = pd.concat([(all_res_used.mul(gwp_op, axis=0).sum() / tot_year).fillna(0), gwp_op_imp])
-        conv = (gwp_op_new - gwp_op).abs().sum()
-        count += 1
-
-    gwp_op_final = gwp_op_new[res_names_red]
-
-    return gwp_op_final.combine_first(gwp_op_data)
+    resources = pd.read_csv(import_folders[0] + '/Resources.csv', index_col=2).drop(index='units')
+    resources.rename(index=lambda x: x.strip(), inplace=True)
+    stack = YearBalanceStack.from_case_studies({'case': out_path})
+
+    # see postprocessing_matrix.compute_gwp_op_stack
+    return compute_gwp_op_stack(stack, resources['gwp_op']).loc['case'].rename(None)
@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains matrix-based versions of the postprocessing functions computing the FEC, the primary energy and the operational
+GWP of the resources from year_balance.csv
+
+The year balances of one or several cases are stacked in an array (cases x rows x layers) with common row (resources,
+technologies and 'END_USES_DEMAND') and layer labels, and the quantities of all the cases are computed at once. The
+functions of postprocessing (compute_fec, compute_primary_energy and compute_gwp_op) are wrappers around these ones.
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from energyscope.output_formats import read_table
+
+# EUD types for which the FEC is computed from the production (the FEC of ELECTRICITY is its end-use demand)
+FEC_EUD_TYPES = ['HEAT_HIGH_T', 'HEAT_LOW_T_DHN', 'HEAT_LOW_T_DECEN', 'MOB_PUBLIC', 'MOB_PRIVATE', 'MOB_FREIGHT_RAIL',
+                 'MOB_FREIGHT_BOAT', 'MOB_FREIGHT_ROAD', 'HVC', 'AMMONIA', 'METHANOL']
+# Outputs which are not taken into account to compute the FEC of a technology
+CO2_LAYERS = ['CO2_ATM', 'CO2_INDUSTRY', 'CO2_CAPTURED']
+
+
+class YearBalanceStack:
+    """
+    Year balances of several cases stacked in an array
+
+    Parameters
+    ----------
+    year_balances: Dict[str, pd.DataFrame]
+        Year balance (as in year_balance.csv) of each case. Missing rows and layers are filled with zeros.
+    """
+
+    def __init__(self, year_balances: Dict[str, pd.DataFrame]):
+        self.cases = list(year_balances.keys())
+        balances = [yb.rename(index=lambda x: x.strip(), columns=lambda x: x.strip())
+                    for yb in year_balances.values()]
+        self.rows = pd.Index(balances[0].index).append([pd.Index(yb.index) for yb in balances[1:]]).unique()
+        self.layers = pd.Index(balances[0].columns).append([pd.Index(yb.columns) for yb in balances[1:]]).unique()
+        self.values = np.stack([yb.reindex(index=self.rows, columns=self.layers).fillna(0.).values.astype(float)
+                                for yb in balances])
+
+    @classmethod
+    def from_case_studies(cls, case_study_dirs: Dict[str, str]) -> 'YearBalanceStack':
+        """Read the year balances of several case studies (<case_study_dir>/output/year_balance.csv)"""
+        return cls({case: read_table(f"{cs}/output/year_balance.csv", index_col=0)
+                    for case, cs in case_study_dirs.items()})
+
+    def get_flows(self) -> Tuple[np.ndarray, pd.Index]:
+        """Return the values without the row 'END_USES_DEMAND' and the corresponding row labels"""
+        mask = self.rows != 'END_USES_DEMAND'
+        return self.values[:, mask, :], self.rows[mask]
+
+
+def compute_fec_stack(stack: YearBalanceStack, resources: List[str],
+                      eud_types: List[str] = None) -> pd.DataFrame:
+    """
+    Compute the FEC of each EUD type detailed by producing technology or resource, for all the cases
+
+    For each EUD type, the production of each producer is corrected by its share of the consumption of the EUD type by
+    other technologies. The FEC of a resource is its corrected production and the FEC of a technology is its corrected
+    production multiplied by the ratio between its inputs and its outputs (CO2 layers excluded).
+
+    Parameters
+    ----------
+    stack: YearBalanceStack
+        Year balances of the cases
+    resources: List[str]
+        List of resources (whose FEC is their production)
+    eud_types: List[str] (default: None)
+        EUD types (FEC_EUD_TYPES by default)
+
+    Returns
+    -------
+    pd.DataFrame
+        FEC (column 'value') indexed by case, EUD type and technology or resource ('case', 'eud', 'tech'). The FEC of
+        ELECTRICITY is its end-use demand.
+    """
+    eud_types = FEC_EUD_TYPES if eud_types is None else eud_types
+    flows, rows = stack.get_flows()
+    eud_idx = stack.layers.get_indexer(eud_types)
+    positive = np.where(flows > 0, flows, 0.)
+    negative = np.where(flows < 0, -flows, 0.)
+
+    # Corrected production of each producer (cases x rows x eud types)
+    prod = positive[:, :, eud_idx]
+    prod_sum = prod.sum(axis=1, keepdims=True)
+    conso_sum = negative[:, :, eud_idx].sum(axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prod_corr = prod * (1 - np.where(prod_sum > 0, conso_sum / prod_sum, 0.))
+
+    # Ratio between inputs and outputs of each technology (1 for the resources)
+    outputs = positive[:, :, ~stack.layers.isin(CO2_LAYERS)].sum(axis=2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(outputs > 0, negative.sum(axis=2) / outputs, np.nan)
+    ratio[:, rows.isin(resources)] = 1.
+    fec = prod_corr * ratio[:, :, None]
+
+    # Long format, with the EUD types in the given order and the producers in the order of the year balance
+    case_idx, eud_pos, row_idx = np.nonzero(prod.transpose(0, 2, 1) > 0)
+    fec_details = pd.DataFrame({'case': np.array(stack.cases, dtype=object)[case_idx],
+                                'eud': np.array(eud_types, dtype=object)[eud_pos],
+                                'tech': rows[row_idx], 'value': fec[case_idx, row_idx, eud_pos]})
+    electricity = stack.values[:, stack.rows.get_loc('END_USES_DEMAND'), stack.layers.get_loc('ELECTRICITY')]
+    fec_elec = pd.DataFrame({'case': stack.cases, 'eud': 'ELECTRICITY', 'tech': 'ELECTRICITY', 'value': electricity})
+    fec_details = pd.concat([fec_details, fec_elec]).sort_values('case', kind='stable', key=lambda c: c.map(
+        {case: i for i, case in enumerate(stack.cases)}))
+    return fec_details.set_index(['case', 'eud', 'tech']).round(3)
+
+
+def compute_primary_energy_stack(stack: YearBalanceStack, resources_subcategory: pd.Series) -> pd.DataFrame:
+    """
+    Compute the primary energy [TWh] of each resource, for all the cases
+
+    Parameters
+    ----------
+    stack: YearBalanceStack
+        Year balances of the cases
+    resources_subcategory: pd.Series
+        Subcategory of each resource counted as primary energy (index: resources)
+
+    Returns
+    -------
+    pd.DataFrame
+        Primary energy with resources as index and cases as columns
+    """
+    row_idx = stack.rows.get_indexer(resources_subcategory.index)
+    assert (row_idx >= 0).all(), 'Error: some resources are not in the year balances.'
+    return pd.DataFrame(stack.values[:, row_idx, :].sum(axis=2).T / 1000, index=resources_subcategory.index,
+                        columns=stack.cases)
+
+
+def aggregate_by_category(values: pd.DataFrame, categories: pd.Series) -> pd.DataFrame:
+    """
+    Sum the rows of values by category with a membership matrix (categories in order of first appearance)
+
+    Parameters
+    ----------
+    values: pd.DataFrame
+        Values with entities (e.g. resources) as index
+    categories: pd.Series
+        Category of each entity
+    """
+    categories = categories.reindex(values.index)
+    labels = pd.Index(categories.unique())
+    membership = (categories.values[:, None] == labels.values[None, :]).astype(float)
+    return pd.DataFrame(membership.T @ values.values, index=labels, columns=values.columns)
+
+
+def compute_gwp_op_stack(stack: YearBalanceStack, gwp_op: pd.Series) -> pd.DataFrame:
+    """
+    Compute the annual average emission factor [ktCO2-eq./GWh] of each resource, for all the cases
+
+    The emission factor of a resource which is a layer is the average of the emission factors of what is used to
+    produce it: its import (with its own gwp_op), the other resources producing it (e.g. METHANOL_RE for METHANOL)
+    and, for each technology producing it, its first input (in the order of the layers). This linear system is solved
+    directly, instead of iterating until convergence.
+
+    Parameters
+    ----------
+    stack: YearBalanceStack
+        Year balances of the cases
+    gwp_op: pd.Series
+        Emission factor of the import of each resource (resources without value are ignored)
+
+    Returns
+    -------
+    pd.DataFrame
+        Emission factors with cases as index and resources as columns
+    """
+    gwp_op = gwp_op.dropna().astype(float)
+    flows, rows = stack.get_flows()
+    nbr_cases = flows.shape[0]
+    # Resources that are layers
+    mix = pd.Index([res for res in gwp_op.index if res in stack.layers])
+    mix_cols = stack.layers.get_indexer(mix)
+    producing = flows[:, :, mix_cols] > 0  # cases x rows x mix
+
+    # Quantity of each resource used to produce each resource of the mix
+    # - by the resources themselves (imports of the resource, or other resources producing it, e.g. METHANOL_RE)
+    res_rows = rows.get_indexer(gwp_op.index)
+    res_valid = res_rows >= 0
+    res_prod = np.where(producing[:, res_rows[res_valid], :], flows[:, res_rows[res_valid], :][:, :, mix_cols], 0.)
+    res_prod_all = np.zeros((nbr_cases, len(gwp_op), len(mix)))
+    res_prod_all[:, res_valid, :] = res_prod
+    in_mix = gwp_op.index.isin(mix)
+    res_used = res_prod_all[:, in_mix, :]  # cases x mix x mix, with the imports on the diagonal
+    # - by the technologies, through their first input (in the order of the layers)
+    techs = ~rows.isin(gwp_op.index)
+    tech_flows = flows[:, techs, :]
+    first_input = (tech_flows < 0).argmax(axis=2)
+    has_input = (tech_flows < 0).any(axis=2)
+    input_qty = np.where(has_input, -np.take_along_axis(tech_flows, first_input[:, :, None], axis=2)[:, :, 0], 0.)
+    input_res = mix.get_indexer(stack.layers[first_input.ravel()]).reshape(first_input.shape)
+    one_hot = (input_res[:, :, None] == np.arange(len(mix))[None, None, :]) * input_qty[:, :, None]
+    res_used = res_used + np.einsum('ctk,ctr->ckr', one_hot, producing[:, techs, :])
+
+    # Imports and resources which are not layers have the emission factor of the data, the others have the emission
+    # factor of their mix: tot[r] g[r] - sum_k res_used[k, r] g[k] = imports[r] gwp_op[r] + sum_i prod[i, r] gwp_op[i]
+    tot = np.where(producing, flows[:, :, mix_cols], 0.).sum(axis=1)
+    imports = np.diagonal(res_used, axis1=1, axis2=2).copy()
+    res_used[:, np.arange(len(mix)), np.arange(len(mix))] = 0.
+    matrix = np.eye(len(mix))[None] * tot[:, None, :] - res_used.transpose(0, 2, 1)
+    rhs = imports * gwp_op[mix].values[None, :] \
+        + np.einsum('cir,i->cr', res_prod_all[:, ~in_mix, :], gwp_op.values[~in_mix])
+    # Resources which are not produced have an emission factor of 0
+    not_produced = tot <= 0
+    matrix[not_produced] = np.eye(len(mix))[np.nonzero(not_produced)[1]]
+    rhs[not_produced] = 0.
+    gwp_mix = np.linalg.solve(matrix, rhs[:, :, None])[:, :, 0]
+
+    gwp = pd.DataFrame(np.repeat(gwp_op.values[None, :], nbr_cases, axis=0), index=stack.cases, columns=gwp_op.index)
+    gwp[mix] = gwp_mix
+    return gwp[sorted(gwp.columns)]
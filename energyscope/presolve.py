@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to remove provably inactive technologies and resources from the data before printing ESTD_data.dat
+and to restore them (with zero values) in the results of the run
+
+An entity is considered as inactive if:
+- technology (storage excluded): f_max = 0, or no connection to any layer, and f_min = 0;
+- storage technology: f_max = 0, or no input and output efficiency on any layer, and f_min = 0;
+- resource: avail = 0.
+Entities referred to by name in the model files or in print_estd/print_12td are never removed.
+"""
+import json
+import logging
+import re
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+from energyscope.model_catalog import ModelCatalog, get_named_elements
+from energyscope.step2_print_data import RES_PARAMS, RES_MULT_PARAMS
+
+# Sets of the model whose elements are technologies or resources
+ENTITY_SETS = ['TECHNOLOGIES', 'STORAGE_TECH', 'INFRASTRUCTURE', 'RESOURCES', 'BIOFUELS', 'RE_RESOURCES', 'EXPORT',
+               'COGEN', 'BOILERS', 'TECHNOLOGIES_OF_END_USES_TYPE', 'TECHNOLOGIES_OF_END_USES_CATEGORY',
+               'STORAGE_OF_END_USES_TYPES']
+
+
+def get_protected_entities(model_fns: List[str] = None) -> List[str]:
+    """
+    Return the technologies and resources referred to by name in print_estd, print_12td and the model files
+    """
+    protected = set(get_named_elements()) | set(RES_PARAMS.values())
+    protected |= set(tech for techs in RES_MULT_PARAMS.values() for tech in techs)
+    for model_fn in model_fns or []:
+        with open(model_fn, 'r') as file:
+            protected |= set(re.findall(r'"([A-Za-z0-9_]+)"', file.read()))
+    return sorted(protected)
+
+
+def get_inactive_entities(data: Dict[str, pd.DataFrame], protected: List[str] = None) -> Tuple[List[str], List[str]]:
+    """
+    Return the inactive technologies and resources
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Data as returned by import_data
+    protected: List[str] (default: None)
+        Entities that must not be removed
+
+    Returns
+    -------
+    Tuple[List[str], List[str]]
+        Inactive technologies and inactive resources
+    """
+    protected = set(protected or [])
+    technologies = data['Technologies'][['f_min', 'f_max']].astype(float)
+    storage_techs = list(data['Storage_eff_in'].index)
+    layers_in_out = data['Layers_in_out'].astype(float)
+    storage_eff = data['Storage_eff_in'].astype(float).abs() + data['Storage_eff_out'].astype(float).abs()
+
+    connected = (layers_in_out.reindex(technologies.index).fillna(0).abs().sum(axis=1) > 0)
+    connected[storage_techs] = storage_eff.sum(axis=1).reindex(storage_techs) > 0
+    inactive_techs = technologies.index[((technologies['f_max'] == 0) | ~connected) & (technologies['f_min'] == 0)]
+
+    avail = data['Resources']['avail'].astype(float)
+    inactive_res = avail.index[avail == 0]
+
+    return [tech for tech in inactive_techs if tech not in protected], \
+           [res for res in inactive_res if res not in protected]
+
+
+def prune_data(data: Dict[str, pd.DataFrame], model_fns: List[str] = None,
+               dropped_fn: str = None) -> Tuple[Dict[str, pd.DataFrame], Dict]:
+    """
+    Remove the inactive technologies and resources from the data (to be used before print_estd)
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Data as returned by import_data
+    model_fns: List[str] (default: None)
+        Paths to the model files (entities referred to by name in the model are kept)
+    dropped_fn: str (default: None)
+        If given, path to a json file where the description of the dropped entities is saved
+
+    Returns
+    -------
+    Tuple[Dict[str, pd.DataFrame], Dict]
+        Pruned data and description of the dropped entities (to be passed to restore_dropped), i.e. a dictionary with
+        the dropped elements of each set (lists, or dictionaries of lists for indexed sets)
+    """
+    techs, resources = get_inactive_entities(data, get_protected_entities(model_fns))
+    entities = set(techs) | set(resources)
+
+    pruned_data = dict(data)
+    for key in ['Technologies', 'Resources', 'Layers_in_out', 'Storage_eff_in', 'Storage_eff_out',
+                'Storage_characteristics']:
+        pruned_data[key] = data[key].drop(index=[e for e in data[key].index if e in entities])
+
+    # Elements of each set that are removed
+    sets = ModelCatalog.from_data(data).get_sets()
+    dropped = dict()
+    for name in ENTITY_SETS:
+        if isinstance(sets[name], dict):
+            dropped[name] = {key: [e for e in values if e in entities] for key, values in sets[name].items()}
+        else:
+            dropped[name] = [e for e in sets[name] if e in entities]
+    logging.info(f"Presolve: {len(techs)} technologies and {len(resources)} resources removed")
+
+    if dropped_fn is not None:
+        with open(dropped_fn, 'w') as file:
+            json.dump(dropped, file, indent=1)
+    return pruned_data, dropped
+
+
+def _pad_entity(df: pd.DataFrame, dropped: List[str]) -> pd.DataFrame:
+    """Add zero rows for the dropped entities to a 'long' DataFrame indexed (first index) over entities"""
+    template = df[df['index0'] == df['index0'].iloc[0]]
+    padding = [template.assign(index0=entity) for entity in dropped if entity not in set(df['index0'])]
+    if len(padding) == 0:
+        return df
+    padding = pd.concat(padding, ignore_index=True)
+    padding[df.columns[-1]] = 0.
+    return pd.concat([df, padding], ignore_index=True)
+
+
+def _get_index_sets(sets: Dict, dropped: Dict) -> List[Tuple[set, List[str]]]:
+    """
+    Return the sets over which the entities can be indexed (first index), as the elements kept by prune_data and the
+    dropped ones, from the smallest to the largest
+    """
+    index_sets = []
+    for name in ENTITY_SETS:
+        if name not in sets or name not in dropped:
+            continue
+        if isinstance(sets[name], dict):
+            index_sets += [(set(sets[name].get(key, [])), values) for key, values in dropped[name].items()]
+        else:
+            index_sets.append((set(sets[name]), dropped[name]))
+    # Sets defined in the model
+    techs, storage, res = (set(sets.get(name, [])) for name in ['TECHNOLOGIES', 'STORAGE_TECH', 'RESOURCES'])
+    dropped_techs, dropped_storage, dropped_res = \
+        (dropped.get(name, []) for name in ['TECHNOLOGIES', 'STORAGE_TECH', 'RESOURCES'])
+    index_sets.append((res | techs - storage, dropped_res + [e for e in dropped_techs if e not in dropped_storage]))
+    index_sets.append((res | techs, dropped_res + dropped_techs))
+    return sorted(index_sets, key=lambda index_set: len(index_set[0]) + len(index_set[1]))
+
+
+def restore_dropped(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame], sets: Dict,
+                    dropped: Dict) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame], Dict]:
+    """
+    Add the entities removed by prune_data to the sets and add zero values for them in the results and parameters
+    (indexed over the technologies or the resources), so that the output files keep the same shape
+
+    The first index of each entity is matched with the smallest set (of ENTITY_SETS, or the unions of resources and
+    technologies used in the model) containing all its elements, and the entity is only padded with the dropped
+    elements of this set.
+
+    Parameters
+    ----------
+    results: Dict[str, pd.DataFrame]
+        Dictionary containing for each variable its values as a 'long' DataFrame
+    parameters: Dict[str, pd.DataFrame]
+        Dictionary containing for each parameter its values as a 'long' DataFrame
+    sets: Dict
+        Dictionary containing all the sets and subsets (of the pruned data)
+    dropped: Dict
+        Description of the dropped entities as returned by prune_data
+
+    Returns
+    -------
+    Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame], Dict]
+        Restored results, parameters and sets
+    """
+    index_sets = _get_index_sets(sets, dropped)
+
+    restored = []
+    for entities in [results, parameters]:
+        entities = dict(entities)
+        for name, df in entities.items():
+            if 'index0' not in df.columns or len(df) == 0:
+                continue
+            index0 = set(df['index0'])
+            for index_set, entities_dropped in index_sets:
+                if index0.issubset(index_set):
+                    entities[name] = _pad_entity(df, entities_dropped)
+                    break
+        restored.append(entities)
+
+    sets = dict(sets)
+    for name, values in dropped.items():
+        if name not in sets:
+            continue
+        if isinstance(values, dict):
+            sets[name] = {key: list(sets[name].get(key, [])) + [e for e in vals if e not in sets[name].get(key, [])]
+                          for key, vals in values.items()}
+        else:
+            sets[name] = list(sets[name]) + [e for e in values if e not in sets[name]]
+
+    return restored[0], restored[1], sets
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to profile the different stages of an EnergyScope run (wall time, CPU time and peak memory)
+
+Stages are declared with the span context manager or the profiled decorator. They are only recorded when a trace is
+active (see tracing), otherwise they have no effect.
+"""
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Trace currently recording spans (None if profiling is disabled)
+_current_trace = None
+
+
+def get_peak_rss() -> float:
+    """
+    Return the peak resident set size of the current process in MB (NaN if it cannot be measured)
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is given in bytes on macOS and in kilobytes on Linux
+        return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        mem_info = psutil.Process().memory_info()
+        return getattr(mem_info, 'peak_wset', mem_info.rss) / 1024 ** 2
+    return float('nan')
+
+
+class Trace:
+    """
+    Collection of timed spans
+
+    Each record is a dictionary with keys 'name', 'parent', 'depth', 'start' (s, relative to the start of the trace),
+    'wall' (s), 'cpu' (s), 'peak_rss' (MB, high-water mark at the end of the span) and 'peak_rss_increase' (MB, increase
+    of the high-water mark during the span).
+    """
+
+    def __init__(self):
+        self.records: List[Dict] = []
+        self._stack: List[str] = []
+        self._t0 = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str):
+        parent = self._stack[-1] if len(self._stack) else ''
+        record = {'name': name, 'parent': parent, 'depth': len(self._stack)}
+        self._stack.append(name)
+        rss_start = get_peak_rss()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            wall_end = time.perf_counter()
+            cpu_end = time.process_time()
+            rss_end = get_peak_rss()
+            self._stack.pop()
+            record.update({'start': wall_start - self._t0,
+                           'wall': wall_end - wall_start,
+                           'cpu': cpu_end - cpu_start,
+                           'peak_rss': rss_end,
+                           'peak_rss_increase': rss_end - rss_start})
+            self.records.append(record)
+
+    def summary(self) -> List[Dict]:
+        """Return the records sorted by starting time (i.e. stages before their sub-steps)"""
+        return sorted(self.records, key=lambda r: (r['start'], r['depth']))
+
+
+@contextmanager
+def span(name: str):
+    """
+    Time the enclosed block as a stage of the active trace (no effect if no trace is active)
+
+    Parameters
+    ----------
+    name: str
+        Name of the stage
+    """
+    if _current_trace is None:
+        yield None
+        return
+    with _current_trace.span(name) as record:
+        yield record
+
+
+def profiled(func: Optional[Callable] = None, name: Optional[str] = None):
+    """
+    Decorator recording each call of a function as a span named after the function (or name if given)
+    """
+
+    def decorator(f: Callable):
+        span_name = name if name is not None else f.__name__
+
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if _current_trace is None:
+                return f(*args, **kwargs)
+            with _current_trace.span(span_name):
+                return f(*args, **kwargs)
+        return wrapper
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def log_trace(trace: Trace) -> None:
+    """
+    Report the stages of a trace in the log
+
+    Parameters
+    ----------
+    trace: Trace
+        Trace to report
+    """
+    logging.info(f"{'Stage':<45}{'Wall [s]':>10}{'CPU [s]':>10}{'Peak RSS [MB]':>15}{'Increase [MB]':>15}")
+    for record in trace.summary():
+        label = '  ' * record['depth'] + record['name']
+        logging.info(f"{label:<45}{record['wall']:>10.3f}{record['cpu']:>10.3f}"
+                     f"{record['peak_rss']:>15.1f}{record['peak_rss_increase']:>15.1f}")
+
+
+def write_trace(trace: Trace, trace_fn: str, chrome_format: bool = False) -> None:
+    """
+    Save a trace to a JSON file
+
+    Parameters
+    ----------
+    trace: Trace
+        Trace to save
+    trace_fn: str
+        Path to the output file
+    chrome_format: bool (default: False)
+        If True, save the trace in the Chrome trace event format (can be opened in chrome://tracing or Perfetto),
+        otherwise save the list of records
+    """
+    records = trace.summary()
+    if chrome_format:
+        pid = os.getpid()
+        content = {'traceEvents': [{'name': r['name'], 'cat': 'energyscope', 'ph': 'X', 'pid': pid, 'tid': 0,
+                                    'ts': r['start'] * 1e6, 'dur': r['wall'] * 1e6,
+                                    'args': {'cpu [s]': r['cpu'], 'peak_rss [MB]': r['peak_rss'],
+                                             'peak_rss_increase [MB]': r['peak_rss_increase']}}
+                                   for r in records],
+                   'displayTimeUnit': 'ms'}
+    else:
+        content = records
+    with open(trace_fn, 'w') as handle:
+        json.dump(content, handle, indent=1)
+
+
+@contextmanager
+def tracing(trace_fn: Optional[str] = None, chrome_format: bool = False):
+    """
+    Record all the stages executed in the enclosed block, report them in the log and optionally save them to a file
+
+    Parameters
+    ----------
+    trace_fn: str (default: None)
+        Path to the trace file. If None or empty, the trace is only reported in the log.
+    chrome_format: bool (default: False)
+        Whether the trace file should be written in the Chrome trace event format
+
+    Examples
+    --------
+    >>> with tracing('trace.json', chrome_format=True):
+    ...     run_step2_new(...)
+    """
+    global _current_trace
+    previous_trace = _current_trace
+    trace = Trace()
+    _current_trace = trace
+    try:
+        with trace.span('total'):
+            yield trace
+    finally:
+        _current_trace = previous_trace
+        log_trace(trace)
+        if trace_fn:
+            write_trace(trace, trace_fn, chrome_format)
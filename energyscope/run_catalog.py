@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains a catalog of the runs of ESTD STEP 2 stored in a local SQLite database, to find runs without reading their
+case study directories
+
+Each run registered by run_step2_new (when given run_catalog) is a row of the table 'runs' with its case study, the
+hash of its configuration (model and data files, overlays and solver options), its objectives, its solve metrics and
+its output directory. Its key scalar inputs (see get_run_inputs) and installed capacities are stored in the tables
+'run_inputs' and 'run_capacities', indexed by name and value. A case study registered again (e.g. overwritten) replaces
+its previous entry.
+
+>>> catalog = RunCatalog('case_studies/runs.sqlite')
+>>> catalog.find_runs(inputs={'GWP_limit': ('<', 20000)}, capacities={'NUCLEAR': ('>', 0)})
+"""
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+from numbers import Number
+from typing import Dict, List, Tuple, Union
+
+import pandas as pd
+
+OBJECTIVES = ['TotalCost', 'TotalGWP', 'TotalEinv']
+METRICS = ['solve_time', 'total_time']
+OPERATORS = ['<', '<=', '>', '>=', '=', '!=']
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_study TEXT, case_study_dir TEXT, config_hash TEXT, created TEXT, solve_result TEXT, output_profile TEXT,
+    {', '.join(f'{name} REAL' for name in OBJECTIVES + METRICS)}, output_dir TEXT);
+CREATE TABLE IF NOT EXISTS run_inputs (run_id INTEGER, name TEXT, value REAL);
+CREATE TABLE IF NOT EXISTS run_capacities (run_id INTEGER, tech TEXT, value REAL);
+CREATE INDEX IF NOT EXISTS runs_case_study_dir ON runs (case_study_dir);
+CREATE INDEX IF NOT EXISTS runs_config_hash ON runs (config_hash);
+{''.join(f'CREATE INDEX IF NOT EXISTS runs_{name} ON runs ({name});' for name in OBJECTIVES)}
+CREATE INDEX IF NOT EXISTS run_inputs_name_value ON run_inputs (name, value);
+CREATE INDEX IF NOT EXISTS run_inputs_run_id ON run_inputs (run_id);
+CREATE INDEX IF NOT EXISTS run_capacities_tech_value ON run_capacities (tech, value);
+CREATE INDEX IF NOT EXISTS run_capacities_run_id ON run_capacities (run_id);
+"""
+
+
+def get_config_hash(fns: List[str], options: Dict = None) -> str:
+    """Return a hash of the content of some files (e.g. model and data files) and of options (e.g. solver options)"""
+    sha = hashlib.sha256()
+    for fn in fns:
+        with open(fn, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                sha.update(chunk)
+    sha.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return sha.hexdigest()[:16]
+
+
+def _to_float(value) -> Union[float, None]:
+    """Convert a numeric value (or 'Infinity') into a float, None for the other values"""
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, Number):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def get_run_inputs(system_limits: Dict = None, overrides: Dict[str, Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Return the key scalar inputs of a run as a flat dictionary
+
+    Parameters
+    ----------
+    system_limits: Dict (default: None)
+        System limits (see print_estd), the nested entries being named '<key>.<sub-key>' (e.g.
+        'technologie_shares.share_heat_dhn_max', 'share_ned.0')
+    overrides: Dict[str, Dict[str, float]] (default: None)
+        Values of the data overridden for the run, by parameter and element (e.g. {'f_min': {'PV': 5.}}), named
+        '<parameter>.<element>'
+
+    Returns
+    -------
+    Dict[str, float]
+        Numeric value of each input
+    """
+    inputs = dict()
+    for key, value in (system_limits or dict()).items():
+        if isinstance(value, dict):
+            entries = {f"{key}.{k}": v for k, v in value.items()}
+        elif isinstance(value, (list, tuple)):
+            entries = {f"{key}.{i}": v for i, v in enumerate(value)}
+        else:
+            entries = {key: value}
+        inputs.update({name: _to_float(v) for name, v in entries.items() if _to_float(v) is not None})
+    for param, values in (overrides or dict()).items():
+        inputs.update({f"{param}.{element}": float(v) for element, v in values.items()})
+    return inputs
+
+
+class RunCatalog:
+    """
+    SQLite catalog of runs (see module description)
+
+    Parameters
+    ----------
+    path: str
+        Path to the SQLite database, created if it does not exist
+    timeout: float (default: 60.)
+        Time [s] waiting for the database to be unlocked by other processes (e.g. parallel runs)
+    """
+
+    def __init__(self, path: str, timeout: float = 60.):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=timeout)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'RunCatalog':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def register(self, case_study_dir: str, config_hash: str = None, inputs: Dict[str, float] = None,
+                 objectives: Dict[str, float] = None, capacities: Dict[str, float] = None,
+                 metrics: Dict[str, float] = None, solve_result: str = None, output_profile: str = None,
+                 output_dir: str = None) -> int:
+        """
+        Register a run, replacing the previous entry of the same case study directory
+
+        Parameters
+        ----------
+        case_study_dir: str
+            Path to the case study directory
+        config_hash: str (default: None)
+            Hash of the configuration of the run (see get_config_hash)
+        inputs: Dict[str, float] (default: None)
+            Key scalar inputs (see get_run_inputs)
+        objectives: Dict[str, float] (default: None)
+            Values of TotalCost, TotalGWP and TotalEinv
+        capacities: Dict[str, float] (default: None)
+            Installed capacity of each technology (F)
+        metrics: Dict[str, float] (default: None)
+            Solve metrics, 'solve_time' and 'total_time' [s]
+        solve_result: str (default: None)
+            Solve status given by AMPL
+        output_profile: str (default: None)
+            Name of the output profile of the run
+        output_dir: str (default: None)
+            Path to the output directory (None if the outputs were not persisted)
+
+        Returns
+        -------
+        int
+            Identifier of the run
+        """
+        case_study_dir = os.path.abspath(case_study_dir)
+        objectives, metrics = objectives or dict(), metrics or dict()
+        with self._connection:
+            previous = [row[0] for row in self._connection.execute(
+                'SELECT run_id FROM runs WHERE case_study_dir = ?', (case_study_dir,))]
+            for table in ['runs', 'run_inputs', 'run_capacities']:
+                self._connection.executemany(f'DELETE FROM {table} WHERE run_id = ?', [(i,) for i in previous])
+            columns = ['case_study', 'case_study_dir', 'config_hash', 'created', 'solve_result', 'output_profile'] + \
+                OBJECTIVES + METRICS + ['output_dir']
+            values = [os.path.basename(case_study_dir), case_study_dir, config_hash,
+                      datetime.datetime.now().isoformat(timespec='seconds'), solve_result, output_profile] + \
+                [objectives.get(name) for name in OBJECTIVES] + [metrics.get(name) for name in METRICS] + [output_dir]
+            cursor = self._connection.execute(
+                f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", values)
+            run_id = cursor.lastrowid
+            self._connection.executemany('INSERT INTO run_inputs VALUES (?, ?, ?)',
+                                         [(run_id, name, value) for name, value in (inputs or dict()).items()])
+            self._connection.executemany('INSERT INTO run_capacities VALUES (?, ?, ?)',
+                                         [(run_id, tech, value) for tech, value in (capacities or dict()).items()])
+        return run_id
+
+    def sql(self, query: str, params: Tuple = ()) -> pd.DataFrame:
+        """Return the result of an SQL query on the catalog"""
+        return pd.read_sql_query(query, self._connection, params=params)
+
+    @staticmethod
+    def _get_condition(table: str, column: str, name: str, condition) -> Tuple[str, List]:
+        operator, value = condition if isinstance(condition, tuple) else ('=', condition)
+        assert operator in OPERATORS, f'Error: operator must be one of {OPERATORS}.'
+        return f"EXISTS (SELECT 1 FROM {table} t WHERE t.run_id = runs.run_id AND t.{column} = ? " \
+               f"AND t.value {operator} ?)", [name, value]
+
+    def find_runs(self, inputs: Dict = None, capacities: Dict = None, objectives: Dict = None,
+                  config_hash: str = None) -> pd.DataFrame:
+        """
+        Return the runs satisfying all the conditions
+
+        Each condition is given as a value (equality) or as a tuple (operator, value), the operator being one of
+        OPERATORS, e.g. find_runs(inputs={'GWP_limit': ('<', 20000)}, capacities={'NUCLEAR': ('>', 0)}).
+
+        Parameters
+        ----------
+        inputs: Dict (default: None)
+            Conditions on the inputs (see get_run_inputs)
+        capacities: Dict (default: None)
+            Conditions on the installed capacities
+        objectives: Dict (default: None)
+            Conditions on TotalCost, TotalGWP and TotalEinv
+        config_hash: str (default: None)
+            Hash of the configuration
+
+        Returns
+        -------
+        pd.DataFrame
+            Entries of the runs (table 'runs') indexed by run_id
+        """
+        conditions, params = [], []
+        for table, column, entries in [('run_inputs', 'name', inputs), ('run_capacities', 'tech', capacities)]:
+            for name, condition in (entries or dict()).items():
+                sql, values = self._get_condition(table, column, name, condition)
+                conditions.append(sql)
+                params += values
+        for name, condition in (objectives or dict()).items():
+            assert name in OBJECTIVES, f'Error: objectives must be some of {OBJECTIVES}.'
+            operator, value = condition if isinstance(condition, tuple) else ('=', condition)
+            assert operator in OPERATORS, f'Error: operator must be one of {OPERATORS}.'
+            conditions.append(f"{name} {operator} ?")
+            params.append(value)
+        if config_hash is not None:
+            conditions.append('config_hash = ?')
+            params.append(config_hash)
+        where = f" WHERE {' AND '.join(conditions)}" if len(conditions) else ''
+        return self.sql(f"SELECT * FROM runs{where} ORDER BY run_id", tuple(params)).set_index('run_id')
+
+    def _get_values(self, table: str, column: str, run_ids: List[int] = None) -> pd.DataFrame:
+        query = f"SELECT run_id, {column}, value FROM {table}"
+        if run_ids is not None:
+            query += f" WHERE run_id IN ({', '.join('?' * len(run_ids))})"
+        df = self.sql(query, tuple(int(i) for i in run_ids or []))
+        return df.pivot(index='run_id', columns=column, values='value')
+
+    def get_inputs(self, run_ids: List[int] = None) -> pd.DataFrame:
+        """Return the inputs of some runs (all by default), with runs as index and inputs as columns"""
+        return self._get_values('run_inputs', 'name', run_ids)
+
+    def get_capacities(self, run_ids: List[int] = None) -> pd.DataFrame:
+        """Return the installed capacities of some runs (all by default), with runs as index and techs as columns"""
+        return self._get_values('run_capacities', 'tech', run_ids)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to write the outputs of a run in its own scratch directory and publish it as the case study
+directory with an atomic rename
+
+The scratch directory of a run is created next to its case study directory (i.e. on the same file system, so that the
+rename does not copy any data) and named '.<case study>.<pid>.<random>.partial'. It is renamed into the case study
+directory once all the outputs are written, so a case study directory is either complete or absent. The scratch
+directory of a failed run is removed; those left by killed processes are removed by clean_partial_runs.
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List
+
+from energyscope.output_formats import copy_file
+
+PARTIAL_SUFFIX = '.partial'
+
+
+def _split(case_study_dir: str):
+    case_study_dir = os.path.abspath(case_study_dir)
+    return os.path.dirname(case_study_dir), os.path.basename(case_study_dir)
+
+
+def check_case_study_dir(case_study_dir: str, overwrite: bool = False) -> None:
+    """Check that the case study directory can be published (i.e. that it does not exist or can be overwritten)"""
+    assert overwrite or not os.path.exists(case_study_dir), \
+        f'Error: the case study directory {case_study_dir} already exists (use overwrite=True to replace it).'
+
+
+def create_scratch_dir(case_study_dir: str) -> str:
+    """
+    Create a unique scratch directory next to case_study_dir (see publish_run) and return its path
+    """
+    parent_dir, name = _split(case_study_dir)
+    os.makedirs(parent_dir, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f".{name}.{os.getpid()}.", suffix=PARTIAL_SUFFIX, dir=parent_dir)
+
+
+def publish_run(scratch_dir: str, case_study_dir: str, overwrite: bool = False) -> None:
+    """
+    Publish a scratch directory as the case study directory with an atomic rename
+
+    Parameters
+    ----------
+    scratch_dir: str
+        Scratch directory created by create_scratch_dir for case_study_dir
+    case_study_dir: str
+        Path to the case study directory
+    overwrite: bool (default: False)
+        Replace the case study directory if it exists (it is first renamed and then removed, so that the case study
+        directory is never half-written)
+    """
+    check_case_study_dir(case_study_dir, overwrite)
+    old_dir = None
+    if os.path.exists(case_study_dir):
+        parent_dir, name = _split(case_study_dir)
+        old_dir = f"{parent_dir}/.{name}.{os.getpid()}.{time.time_ns()}.old"
+        os.rename(case_study_dir, old_dir)
+    os.rename(scratch_dir, case_study_dir)
+    if old_dir is not None:
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def copy_input_files(input_dir: str, scratch_dir: str, output_format: str = 'csv') -> None:
+    """
+    Copy the files at the top level of input_dir (e.g. the .dat files of the run) into the scratch directory,
+    compressed if the outputs are not written as plain CSV (see output_formats.copy_file)
+    """
+    if not os.path.isdir(input_dir):
+        return
+    for entry in os.scandir(input_dir):
+        if entry.is_file():
+            copy_file(entry.path, scratch_dir, output_format)
+
+
+@contextmanager
+def run_dir(case_study_dir: str, overwrite: bool = False):
+    """
+    Context manager yielding a scratch directory which is published as case_study_dir at the end of the block, or
+    removed if an exception is raised in the block
+
+    >>> with run_dir(case_study_dir) as scratch_dir:
+    ...     save_results(results, parameters, sets, f"{scratch_dir}/output/")
+    """
+    check_case_study_dir(case_study_dir, overwrite)
+    scratch_dir = create_scratch_dir(case_study_dir)
+    try:
+        yield scratch_dir
+    except BaseException:
+        logging.error(f"Run of {case_study_dir} failed, removing {scratch_dir}")
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        raise
+    publish_run(scratch_dir, case_study_dir, overwrite)
+
+
+def _is_running(pid: int) -> bool:
+    """Return whether the process is running (always True if it cannot be checked)"""
+    if sys.platform == 'win32':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def clean_partial_runs(case_studies_dir: str, max_age: float = None) -> List[str]:
+    """
+    Remove the scratch directories of the runs which did not complete (e.g. killed processes)
+
+    Parameters
+    ----------
+    case_studies_dir: str
+        Directory containing the case study directories
+    max_age: float (default: None)
+        Also remove the scratch directories older than max_age seconds, even if their process still seems to be running
+        (the processes cannot be checked on Windows)
+
+    Returns
+    -------
+    List[str]
+        Paths to the removed directories
+    """
+    removed = []
+    if not os.path.isdir(case_studies_dir):
+        return removed
+    for entry in os.scandir(case_studies_dir):
+        if not (entry.is_dir() and entry.name.startswith('.')
+                and (entry.name.endswith(PARTIAL_SUFFIX) or entry.name.endswith('.old'))):
+            continue
+        pid = entry.name.split('.')[-3]
+        too_old = max_age is not None and time.time() - entry.stat().st_mtime > max_age
+        if too_old or (pid.isdigit() and int(pid) != os.getpid() and not _is_running(int(pid))):
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed.append(entry.path)
+    if removed:
+        logging.info(f"Removed {len(removed)} half-written runs from {case_studies_dir}")
+    return removed
@@ -16,6 +16,8 @@ The generating function is inspired by [2].
 import pandas as pd
 import plotly.graph_objects as go
 
+from energyscope.output_formats import read_table
+
 
 def hex_to_rgb(hex_color: str, alpha: float) -> str:
     """Convert color in hex to rgb and add alpha channel"""
@@ -99,7 +101,7 @@ def draw_sankey(sankey_dir: str, title='Energy', auto_open: bool = True) -> None
         Whether the diagram should automatically be opened in the default browser or not
     """
     # Read the input data
-    flows = pd.read_csv(f"{sankey_dir}/input2sankey.csv")
+    flows = read_table(f"{sankey_dir}/input2sankey.csv")
     # Generate the figure
     fig = generate_sankey(flows, title=title)
     # Save the figure
@@ -11,6 +11,8 @@ from typing import Dict
 import pandas as pd
 
 from energyscope.amplpy_aux import simplify_df, time_to_pandas
+from energyscope.output_formats import write_table
+from energyscope.profiling import profiled
 
 
 def add_ft_single(sankey_df: pd.DataFrame, index: int, times: pd.Series,
@@ -560,8 +562,9 @@ def add_gasoline(sankey_df: pd.DataFrame, index: int, times: pd.Series,
     return sankey_df, index
 
 
+@profiled
 def generate_sankey_file(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                         sets: Dict, output_dir: str) -> None:
+                         sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
     # Sets
     times = time_to_pandas(sets)
 
@@ -607,7 +610,7 @@ def generate_sankey_file(results: Dict[str, pd.DataFrame], parameters: Dict[str,
     sankey_df, index = add_dhn(sankey_df, index, times, sets, f_t, layers_in_out, end_uses, network_losses,
                                storage_in, storage_out)
 
-    sankey_df.set_index(['source', 'target']).sort_index().to_csv(f"{output_dir}input2sankey.csv")
+    write_table(sankey_df.set_index(['source', 'target']).sort_index(), f"{output_dir}input2sankey.csv", output_format)
 
 
 # TODO: remove
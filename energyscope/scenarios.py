@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to prepare the data of several scenarios from shared base .dat files and small overlay files
+
+The base files ESTD_data.dat and ESTD_<nbr_td>TD.dat are written once in a base directory, under a name containing the
+hash of the data they are printed from, and reused by all the scenarios with the same data. The data of each scenario
+is compared to the base data parameter by parameter and only the changed values are written in an overlay file, as
+AMPL 'let' statements which are evaluated after reading the base files (see step2_main.create_step2_translator).
+Changes of the sets (e.g. new technologies, or a change of layers_in_out or of the category of a resource changing the
+sets derived from the data) cannot be written as an overlay: the sets of each scenario are compared to the base sets
+(see model_catalog.ModelCatalog) and the full data of the scenario is printed instead when they differ.
+"""
+import hashlib
+import json
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from energyscope.model_catalog import ModelCatalog
+from energyscope.step2_print_data import print_estd, print_12td
+
+# Parameters of the scalar entries of system_limits (the others are indexed, see get_data_params)
+SYSTEM_LIMITS_PARAMS = {'i_rate': 'i_rate', 'GWP_limit': 'gwp_limit', 'COST_limit': 'cost_limit',
+                        'EINV_limit': 'einv_limit', 're_share_primary': 're_share_primary',
+                        're_be_share_primary': 're_be_share_primary', 'solar_area': 'solar_area',
+                        'power_density_pv': 'power_density_pv',
+                        'power_density_solar_thermal': 'power_density_solar_thermal', 'c_grid_extra': 'c_grid_extra',
+                        'import_capacity': 'import_capacity'}
+SHARE_NED_TYPES = ['HVC', 'METHANOL', 'AMMONIA']
+# Values above this threshold are printed as Infinity (as in print_estd)
+INFINITY_THRESHOLD = 1e+14
+
+
+def get_data_hash(data: Dict[str, pd.DataFrame], system_limits: Dict = None, extra: str = '') -> str:
+    """
+    Return a hash of the content of the data (DataFrames of import_data), the system limits and an extra string
+    """
+    sha = hashlib.sha256()
+    for key in sorted(data.keys()):
+        df = data[key]
+        sha.update(f"{key}|{list(df.columns)}|{df.shape}".encode())
+        sha.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    sha.update(json.dumps(system_limits, sort_keys=True, default=str).encode())
+    sha.update(extra.encode())
+    return sha.hexdigest()[:16]
+
+
+def _write_once(out_path: str, print_fn, *args, **kwargs) -> None:
+    """Print a .dat file with print_fn if it does not exist yet (written in a temporary file and then renamed)"""
+    if os.path.isfile(out_path):
+        logging.info(f"Reusing {out_path}")
+        return
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    print_fn(tmp_path, *args, **kwargs)
+    os.replace(tmp_path, out_path)
+
+
+def write_estd_data(base_dir: str, data: Dict[str, pd.DataFrame], system_limits: Dict,
+                    catalog: ModelCatalog = None) -> str:
+    """
+    Write ESTD_data.dat (if it does not exist yet) in base_dir, named after the hash of the data and system limits
+
+    Parameters
+    ----------
+    base_dir: str
+        Directory of the base files
+    data: Dict[str, pd.DataFrame]
+        Data (as returned by import_data, the time series are not used)
+    system_limits: Dict
+        System limits (see print_estd)
+    catalog: ModelCatalog (default: None)
+        Sets of the model built from data (see print_estd)
+
+    Returns
+    -------
+    str
+        Path to the ESTD_data.dat file
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    model_data = {key: df for key, df in data.items() if key != 'Time_series'}
+    estd_path = os.path.join(base_dir, f"ESTD_data_{get_data_hash(model_data, system_limits)}.dat")
+    _write_once(estd_path, print_estd, model_data, system_limits, catalog=catalog)
+    return estd_path
+
+
+def write_base_data(base_dir: str, data: Dict[str, pd.DataFrame], system_limits: Dict, step1_output_path: str,
+                    nbr_td: int = 12, catalog: ModelCatalog = None) -> List[str]:
+    """
+    Write the base .dat files (if they do not exist yet) in base_dir, named after the hash of their content
+
+    Parameters
+    ----------
+    base_dir: str
+        Directory of the base files
+    data: Dict[str, pd.DataFrame]
+        Base data (as returned by import_data)
+    system_limits: Dict
+        Base system limits (see print_estd)
+    step1_output_path: str
+        Path to the output of STEP 1 (typical days selected)
+    nbr_td: int (default: 12)
+        Number of typical days
+    catalog: ModelCatalog (default: None)
+        Sets of the model built from data (see print_estd)
+
+    Returns
+    -------
+    List[str]
+        Paths to the base ESTD_data.dat and ESTD_<nbr_td>TD.dat files
+    """
+    estd_path = write_estd_data(base_dir, data, system_limits, catalog)
+
+    with open(step1_output_path, 'r') as file:
+        step1_output = file.read()
+    td_hash = get_data_hash({'Time_series': data['Time_series']}, extra=f"{nbr_td}|{step1_output}")
+    td_path = os.path.join(base_dir, f"ESTD_{nbr_td}TD_{td_hash}.dat")
+    _write_once(td_path, print_12td, data['Time_series'], step1_output_path, nbr_td)
+
+    return [estd_path, td_path]
+
+
+def _to_long(name: str, df: pd.DataFrame, by_column: bool = False) -> pd.DataFrame:
+    """Convert a DataFrame into the long format (param, index0, index1, value)"""
+    values = df.astype(float).stack(dropna=False)
+    long = pd.DataFrame({'index0': values.index.get_level_values(0).astype(str),
+                         'index1': values.index.get_level_values(1).astype(str), 'value': values.values})
+    if by_column:
+        # Each column is a parameter indexed over the rows
+        long = long.rename(columns={'index1': 'param'}).assign(index1='')
+    else:
+        long['param'] = name
+    return long
+
+
+def get_data_params(data: Dict[str, pd.DataFrame], system_limits: Dict) -> pd.DataFrame:
+    """
+    Return the values of the parameters printed by print_estd in the long format
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Data as returned by import_data
+    system_limits: Dict
+        System limits (see print_estd)
+
+    Returns
+    -------
+    pd.DataFrame
+        Values (column 'value') indexed by parameter and indices ('param', 'index0', 'index1', '' if not used)
+    """
+    technologies = data['Technologies'].drop(columns=['Category', 'Subcategory', 'Technologies name'])
+    resources = data['Resources'][['avail', 'gwp_op', 'c_op', 'einv_op']]
+    eud = data['Demand'].drop(columns=['Category', 'Subcategory', 'Units'])
+    shares = system_limits['technologie_shares']
+    scalars = {**{param: system_limits[key] for key, param in SYSTEM_LIMITS_PARAMS.items()}, **shares}
+    limits = pd.DataFrame({'param': list(scalars.keys()), 'index0': '', 'index1': '',
+                           'value': [float(v) for v in scalars.values()]})
+    loss_network = pd.DataFrame({'param': 'loss_network', 'index0': list(system_limits['loss_network'].keys()),
+                                 'index1': '', 'value': [float(v) for v in system_limits['loss_network'].values()]})
+    share_ned = pd.DataFrame({'param': 'share_ned', 'index0': SHARE_NED_TYPES, 'index1': '',
+                              'value': [float(v) for v in system_limits['share_ned']]})
+
+    params = pd.concat([limits, loss_network, share_ned,
+                        _to_long('', technologies, by_column=True), _to_long('', resources, by_column=True),
+                        _to_long('', data['Storage_characteristics'], by_column=True),
+                        _to_long('end_uses_demand_year', eud), _to_long('layers_in_out', data['Layers_in_out']),
+                        _to_long('storage_eff_in', data['Storage_eff_in']),
+                        _to_long('storage_eff_out', data['Storage_eff_out'])], ignore_index=True)
+    return params.set_index(['param', 'index0', 'index1'])['value']
+
+
+def get_changed_sets(base_sets: Dict, sets: Dict) -> List[str]:
+    """
+    Return the names of the sets (see ModelCatalog.get_sets) whose elements are different in base_sets and sets
+
+    The sets derived from the data (e.g. TECHNOLOGIES_OF_END_USES_TYPE from layers_in_out, RE_RESOURCES from the
+    categories of the resources) change with some values of the data, which cannot be written as an overlay.
+    """
+    def _elements(values):
+        if isinstance(values, dict):
+            return {key: sorted(vals) for key, vals in values.items()}
+        return sorted(values)
+    return [name for name in sorted(set(base_sets) | set(sets))
+            if _elements(base_sets.get(name, [])) != _elements(sets.get(name, []))]
+
+
+def get_overlay(base_params: pd.Series, params: pd.Series) -> pd.Series:
+    """
+    Return the values of params which are different from base_params (see get_data_params)
+
+    The two sets of parameters must have the same indices, i.e. the same sets (see get_changed_sets for the sets
+    derived from the values of the data).
+    """
+    added = params.index.difference(base_params.index)
+    removed = base_params.index.difference(params.index)
+    assert len(added) == 0 and len(removed) == 0, \
+        f"Error: the sets are different from the base data (added: {list(added)[:10]}, removed: " \
+        f"{list(removed)[:10]}), the full data must be printed."
+    base = base_params.reindex(params.index).values
+    changed = ~((params.values == base) | (np.isnan(params.values) & np.isnan(base)))
+    return params[changed]
+
+
+def _format_value(value: float) -> str:
+    return 'Infinity' if value > INFINITY_THRESHOLD else repr(float(value))
+
+
+def print_overlay(out_path: str, changes: pd.Series) -> None:
+    """
+    Print the changed values (see get_overlay) as AMPL 'let' statements in out_path
+
+    Parameters
+    ----------
+    out_path: str
+        Path to the overlay file
+    changes: pd.Series
+        Changed values indexed by parameter and indices ('param', 'index0', 'index1')
+    """
+    lines = [f"# Values changed with respect to the base data ({len(changes)})"]
+    for (param, index0, index1), value in changes.items():
+        index = '' if index0 == '' else f"['{index0}']" if index1 == '' else f"['{index0}','{index1}']"
+        lines.append(f"let {param}{index} := {_format_value(value)};")
+    with open(out_path, mode='w', newline='') as file:
+        file.write('\n'.join(lines) + '\n')
+
+
+def write_scenario_data(out_dir: str, data: Dict[str, pd.DataFrame], system_limits: Dict, base_estd_path: str,
+                        base_params: pd.Series, base_sets: Dict) -> Tuple[str, str, pd.Series]:
+    """
+    Write the data of a scenario as an overlay of the base ESTD_data.dat, or print its full ESTD_data.dat (next to the
+    base file, named after the hash of its content) if its sets are different from the base sets
+
+    Parameters
+    ----------
+    out_dir: str
+        Directory where the overlay file (ESTD_overlay.ampl) is written
+    data: Dict[str, pd.DataFrame]
+        Data of the scenario (as returned by import_data)
+    system_limits: Dict
+        System limits of the scenario
+    base_estd_path: str
+        Path to the base ESTD_data.dat (see write_estd_data)
+    base_params: pd.Series
+        Parameters of the base data (see get_data_params)
+    base_sets: Dict
+        Sets of the base data (see ModelCatalog.get_sets)
+
+    Returns
+    -------
+    Tuple[str, str, pd.Series]
+        Path to the ESTD_data.dat file of the scenario, path to the overlay file and values changed with respect to the
+        base data (None if the full data is printed)
+    """
+    catalog = ModelCatalog.from_data(data)
+    changed_sets = get_changed_sets(base_sets, catalog.get_sets())
+    if len(changed_sets):
+        logging.info(f"Sets {changed_sets} are different from the base data, printing the full data")
+        return write_estd_data(os.path.dirname(base_estd_path), data, system_limits, catalog), None, None
+
+    changes = get_overlay(base_params, get_data_params(data, system_limits))
+    logging.info(f"{len(changes)} values changed with respect to the base data")
+    os.makedirs(out_dir, exist_ok=True)
+    overlay_fn = os.path.join(out_dir, 'ESTD_overlay.ampl')
+    print_overlay(overlay_fn, changes)
+    return base_estd_path, overlay_fn, changes
+
+
+def prepare_scenario(out_dir: str, data: Dict[str, pd.DataFrame], system_limits: Dict,
+                     base_data: Dict[str, pd.DataFrame], base_system_limits: Dict, base_dir: str,
+                     step1_output_path: str, nbr_td: int = 12, catalog: ModelCatalog = None,
+                     base_params: pd.Series = None) -> Tuple[List[str], str]:
+    """
+    Prepare the data files of a scenario: the shared base files and an overlay with the changes of the scenario, or the
+    full ESTD_data.dat of the scenario if its sets are different from the base sets (see write_scenario_data)
+
+    Parameters
+    ----------
+    out_dir: str
+        Directory where the overlay file (ESTD_overlay.ampl) is written
+    data: Dict[str, pd.DataFrame]
+        Data of the scenario (as returned by import_data)
+    system_limits: Dict
+        System limits of the scenario
+    base_data: Dict[str, pd.DataFrame]
+        Base data, printed in the base ESTD_data.dat
+    base_system_limits: Dict
+        Base system limits
+    base_dir: str
+        Directory of the base files (see write_base_data)
+    step1_output_path: str
+        Path to the output of STEP 1 (typical days selected)
+    nbr_td: int (default: 12)
+        Number of typical days
+    catalog: ModelCatalog (default: None)
+        Sets of the model built from base_data
+    base_params: pd.Series (default: None)
+        Parameters of the base data (see get_data_params), computed if not given (can be reused for all scenarios)
+
+    Returns
+    -------
+    Tuple[List[str], str]
+        Paths to the data files (the time series of the scenario are used for ESTD_<nbr_td>TD.dat) and path to the
+        overlay file (None if the full data of the scenario is printed)
+    """
+    base_data = {**base_data, 'Time_series': data['Time_series']}
+    catalog = ModelCatalog.from_data(base_data) if catalog is None else catalog
+    data_fns = write_base_data(base_dir, base_data, base_system_limits, step1_output_path, nbr_td, catalog)
+
+    base_params = get_data_params(base_data, base_system_limits) if base_params is None else base_params
+    estd_path, overlay_fn, _ = write_scenario_data(out_dir, data, system_limits, data_fns[0], base_params,
+                                                   catalog.get_sets())
+    return [estd_path, data_fns[1]], overlay_fn
@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to aggregate the 24 hours of each typical day into a smaller number of intra-day segments
+
+This is an optional stage after STEP 1: consecutive hours of each typical day are merged into variable-length segments
+(Ward-like agglomeration of adjacent hours). The .dat file written by print_segmented_td replaces ESTD_12TD.dat: it
+redefines HOURS (segments) and PERIODS (segments of the year), and gives T_H_TD, t_op (length of each segment) and the
+time series of each segment. It requires a model in which HOURS and PERIODS are not fixed (e.g. declared with a
+default value). Note that storage self-losses are then applied once per segment instead of once per hour.
+"""
+import csv
+import logging
+import os
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from energyscope.step2_print_data import ampl_syntax, print_df, newline, EUD_PARAMS, RES_PARAMS, RES_MULT_PARAMS
+from energyscope.profiling import profiled
+
+
+def read_td_of_days(step1_output_path: str) -> np.ndarray:
+    """Return the representative day (1 to 365) of each day of the year from the output of STEP 1"""
+    return pd.read_csv(step1_output_path, names=['TD_of_days'])['TD_of_days'].values
+
+
+def get_td_profiles(time_series: pd.DataFrame, td_of_days: np.ndarray,
+                    correct: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return the hourly profiles of the typical days, by default corrected to preserve the yearly sum of each series
+    (as in print_12td), and the number of days represented by each typical day
+
+    Parameters
+    ----------
+    time_series: pd.DataFrame
+        Hourly time series (8760 rows, one column per series)
+    td_of_days: np.ndarray
+        Representative day of each day of the year
+    correct: bool (default: True)
+        Whether to correct the profiles
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray]
+        Profiles of shape (nbr_td, 24, nbr_series) (typical days sorted by representative day, as in print_12td) and
+        number of days represented by each typical day
+    """
+    days = time_series.values.reshape(365, 24, -1)
+    rep_days, nbr_days = np.unique(td_of_days, return_counts=True)
+    profiles = days[rep_days - 1]
+    if not correct:
+        return profiles, nbr_days
+    norm = days.sum(axis=(0, 1))
+    norm_td = (profiles.sum(axis=1) * nbr_days[:, None]).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correction = np.where(norm_td > 0, norm / norm_td, 0.)
+    return profiles * correction, nbr_days
+
+
+def segment_profile(profile: np.ndarray, nbr_segments: int) -> np.ndarray:
+    """
+    Merge the consecutive hours of a daily profile into segments
+
+    At each step, the two adjacent segments whose merging increases the least the sum of squared deviations from
+    the segment means are merged.
+
+    Parameters
+    ----------
+    profile: np.ndarray
+        Profile of shape (24, nbr_series) (series are expected to be normalized)
+    nbr_segments: int
+        Number of segments
+
+    Returns
+    -------
+    np.ndarray
+        Length (in hours) of each segment
+    """
+    sums = [row.copy() for row in profile]
+    lengths = [1] * len(profile)
+    while len(lengths) > nbr_segments:
+        means = np.array(sums) / np.array(lengths)[:, None]
+        n = np.array(lengths)
+        costs = (n[:-1] * n[1:] / (n[:-1] + n[1:])) * ((means[:-1] - means[1:]) ** 2).sum(axis=1)
+        i = int(np.argmin(costs))
+        sums[i] = sums[i] + sums.pop(i + 1)
+        lengths[i] = lengths[i] + lengths.pop(i + 1)
+    return np.array(lengths)
+
+
+def segment_typical_days(profiles: np.ndarray, nbr_segments: int) -> pd.DataFrame:
+    """
+    Segment each typical day
+
+    Parameters
+    ----------
+    profiles: np.ndarray
+        Profiles of the typical days of shape (nbr_td, 24, nbr_series)
+    nbr_segments: int
+        Number of segments per typical day
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with one row per segment of each typical day and columns 'td' (1 to nbr_td), 'segment'
+        (1 to nbr_segments), 'start' (first hour of the segment, 1 to 24) and 't_op' (length of the segment)
+    """
+    assert 1 <= nbr_segments <= 24, 'Error: the number of segments must be between 1 and 24.'
+    # Normalize the series so that each of them has the same weight in the segmentation
+    scale = np.abs(profiles).max(axis=(0, 1))
+    normalized = profiles / np.where(scale > 0, scale, 1.)
+    rows = []
+    for td, profile in enumerate(normalized, start=1):
+        lengths = segment_profile(profile, nbr_segments)
+        starts = np.concatenate(([1], 1 + np.cumsum(lengths)[:-1]))
+        rows += [{'td': td, 'segment': s, 'start': start, 't_op': length}
+                 for s, (start, length) in enumerate(zip(starts, lengths), start=1)]
+    return pd.DataFrame(rows)
+
+
+def aggregate_profiles(profiles: np.ndarray, segments: pd.DataFrame) -> np.ndarray:
+    """
+    Average the profiles over each segment
+
+    Returns
+    -------
+    np.ndarray
+        Mean value of each series over each segment, of shape (nbr_td, nbr_segments, nbr_series)
+    """
+    nbr_segments = segments['segment'].max()
+    seg_profiles = np.zeros((profiles.shape[0], nbr_segments, profiles.shape[2]))
+    for row in segments.itertuples():
+        hours = slice(row.start - 1, row.start - 1 + row.t_op)
+        seg_profiles[row.td - 1, row.segment - 1] = profiles[row.td - 1, hours].mean(axis=0)
+    return seg_profiles
+
+
+def expand_segments(seg_profiles: np.ndarray, segments: pd.DataFrame) -> np.ndarray:
+    """Return the hourly profiles of the typical days (nbr_td, 24, nbr_series) given by the segment means"""
+    profiles = np.zeros((seg_profiles.shape[0], 24, seg_profiles.shape[2]))
+    for row in segments.itertuples():
+        profiles[row.td - 1, row.start - 1:row.start - 1 + row.t_op] = seg_profiles[row.td - 1, row.segment - 1]
+    return profiles
+
+
+def get_reconstruction_error(time_series: pd.DataFrame, td_of_days: np.ndarray, profiles: np.ndarray,
+                             seg_profiles: np.ndarray, segments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Compare the original time series with their reconstruction from the typical days and from the segments
+
+    Returns
+    -------
+    pd.DataFrame
+        For each series, the RMSE of both reconstructions (normalized by the maximum of the series), the maximum of
+        the original series and of both reconstructions, and the relative error on the yearly sum of the segments
+    """
+    rep_days = np.unique(td_of_days)
+    td_index = np.searchsorted(rep_days, td_of_days)
+    original = time_series.values
+    from_tds = profiles[td_index].reshape(8760, -1)
+    from_segments = expand_segments(seg_profiles, segments)[td_index].reshape(8760, -1)
+
+    scale = np.abs(original).max(axis=0)
+    scale = np.where(scale > 0, scale, 1.)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sum_error = np.where(original.sum(axis=0) != 0, from_segments.sum(axis=0) / original.sum(axis=0) - 1, 0.)
+    return pd.DataFrame({'rmse_td': np.sqrt(((from_tds - original) ** 2).mean(axis=0)) / scale,
+                         'rmse_segments': np.sqrt(((from_segments - original) ** 2).mean(axis=0)) / scale,
+                         'max': original.max(axis=0), 'max_td': from_tds.max(axis=0),
+                         'max_segments': from_segments.max(axis=0), 'sum_error_segments': sum_error},
+                        index=time_series.columns)
+
+
+@profiled
+def print_segmented_td(out_path: str, time_series: pd.DataFrame, step1_output_path: str, nbr_segments: int,
+                       report_path: str = None) -> pd.DataFrame:
+    """
+    Create the .dat file of the time-dependent data with intra-day segments (replaces the file written by print_12td)
+
+    Parameters
+    ----------
+    out_path: str
+        Path to the .dat file
+    time_series: pd.DataFrame
+        Hourly time series (as in the data returned by import_data)
+    step1_output_path: str
+        Path to the output of STEP 1 (typical days selected)
+    nbr_segments: int
+        Number of segments per typical day
+    report_path: str (default: None)
+        If given, path to a csv file where the reconstruction error of each series is saved
+
+    Returns
+    -------
+    pd.DataFrame
+        Segments of each typical day (see segment_typical_days)
+    """
+    logging.info(f"Printing {os.path.basename(out_path)} with {nbr_segments} segments per typical day")
+
+    td_of_days = read_td_of_days(step1_output_path)
+    profiles, _ = get_td_profiles(time_series, td_of_days)
+    nbr_td = profiles.shape[0]
+    segments = segment_typical_days(profiles, nbr_segments)
+    seg_profiles = aggregate_profiles(profiles, segments)
+    series = list(time_series.columns)
+
+    # T_H_TD: each segment of each day of the year is a period
+    rep_days = np.unique(td_of_days)
+    td_index = np.searchsorted(rep_days, td_of_days) + 1
+    t_h_td = pd.DataFrame({'H_of_Y': np.arange(1, 365 * nbr_segments + 1),
+                           'H_of_D': np.tile(np.arange(1, nbr_segments + 1), 365),
+                           'TD_of_day': np.repeat(td_index, nbr_segments)})
+    t_h_td = t_h_td.assign(par_g='(', comma1=',', comma2=',', par_d=')')
+    t_h_td = t_h_td[['par_g', 'H_of_Y', 'comma1', 'H_of_D', 'comma2', 'TD_of_day', 'par_d']]
+
+    t_op = segments.pivot(index='segment', columns='td', values='t_op')
+
+    # Peak space heating factor computed on the segments of the uncorrected profiles (as in print_12td)
+    sh = series.index('Space Heating (%_sh)')
+    raw_profiles = get_td_profiles(time_series, td_of_days, correct=False)[0]
+    peak_sh_factor = time_series.iloc[:, sh].max() / aggregate_profiles(raw_profiles, segments)[:, :, sh].max()
+
+    header_fn = os.path.join(Path(__file__).parents[0], 'headers/header_12td.txt')
+    with open(out_path, mode='w', newline='') as td_file, open(header_fn, 'r') as header:
+        for line in header:
+            td_file.write(line)
+        td_writer = csv.writer(td_file, delimiter='\t', quotechar=' ', quoting=csv.QUOTE_MINIMAL)
+        td_writer.writerow([f'set HOURS := {" ".join(str(h) for h in range(1, nbr_segments + 1))};'])
+        # Ranges (1 .. n) are not allowed in data files
+        td_writer.writerow([f'set PERIODS := {" ".join(str(t) for t in range(1, 365 * nbr_segments + 1))};'])
+        td_writer.writerow(['param peak_sh_factor	:=	' + str(peak_sh_factor)])
+        td_writer.writerow([';		'])
+        td_writer.writerow(['		'])
+        td_writer.writerow(['#SETS [Figure 3]		'])
+        td_writer.writerow(['set T_H_TD := 		'])
+    t_h_td.to_csv(out_path, sep='\t', header=False, index=False, mode='a', quoting=csv.QUOTE_NONE)
+    with open(out_path, mode='a', newline='') as td_file:
+        td_writer = csv.writer(td_file, delimiter='\t', quotechar=' ', quoting=csv.QUOTE_MINIMAL)
+        td_writer.writerow([';'])
+        td_writer.writerow([''])
+    print_df('param t_op :', ampl_syntax(t_op, '# length of each segment [h]'), out_path)
+    newline(out_path)
+
+    def segment_df(k: str, energy: bool) -> pd.DataFrame:
+        # Segments in rows, typical days in columns
+        values = seg_profiles[:, :, series.index(k)].T
+        if energy:
+            # End-use time series are shares of the yearly demand: sum over the hours of the segment
+            values = values * t_op.values
+        return pd.DataFrame(values, index=t_op.index, columns=np.arange(1, nbr_td + 1)).fillna(0)
+
+    # printing EUD timeseries param
+    for k in EUD_PARAMS.keys():
+        print_df(EUD_PARAMS[k], ampl_syntax(segment_df(k, True), ''), out_path)
+        newline(out_path)
+
+    # printing c_p_t param
+    with open(out_path, mode='a', newline='') as td_file:
+        td_writer = csv.writer(td_file, delimiter='\t', quotechar=' ', quoting=csv.QUOTE_MINIMAL)
+        td_writer.writerow(['param c_p_t:='])
+    techs_of_series = [(k, tech) for k, tech in RES_PARAMS.items()] + \
+                      [(k, tech) for k, techs in RES_MULT_PARAMS.items() for tech in techs]
+    for k, tech in techs_of_series:
+        ts = ampl_syntax(segment_df(k, False), '')
+        ts.to_csv(out_path, sep='\t', mode='a', header=True, index=True, index_label='["' + tech + '",*,*]:',
+                  quoting=csv.QUOTE_NONE)
+        newline(out_path)
+    with open(out_path, mode='a', newline='') as td_file:
+        td_writer = csv.writer(td_file, delimiter='\t', quotechar=' ', quoting=csv.QUOTE_MINIMAL)
+        td_writer.writerow([';'])
+
+    if report_path is not None:
+        error = get_reconstruction_error(time_series, td_of_days, profiles, seg_profiles, segments)
+        error.index.name = 'Series'
+        error.round(6).to_csv(report_path)
+        logging.info(f"Normalized RMSE of the segments: {error['rmse_segments'].mean():.4f} on average "
+                     f"({error['rmse_td'].mean():.4f} with 24 hours per typical day)")
+
+    return segments
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to share the base data of a sweep of scenarios between worker processes without copying it
+
+SharedDataset places the numerical values of the DataFrames returned by import_data (and additional arrays, e.g. the
+typical-day tensors) once in a memory-mapped file or in a multiprocessing.shared_memory block. Only a small handle
+(name of the block and labels of the values) is sent to the workers, which attach to the block and read the values
+without copying them. The DataFrames whose columns are all numerical (Time_series, Layers_in_out, Storage_eff_in, ...)
+are views on the block; the few non-numerical columns of the other ones (e.g. Category) are sent with the handle.
+
+run_sweep runs a list of scenarios given as small deltas with respect to the base data: the base ESTD_data.dat is
+printed once and each worker only writes the values changed by its scenario in an overlay file, or the full data if
+the sets of the scenario are different (see scenarios.py).
+"""
+import copy
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from energyscope.model_catalog import ModelCatalog
+from energyscope.scenarios import get_data_params, write_estd_data, write_scenario_data
+from energyscope.step2_main import run_step2_new
+from energyscope.run_dirs import clean_partial_runs
+from energyscope.run_catalog import get_run_inputs
+from energyscope.validation import check_data
+
+STORAGES = ['memmap', 'shm']
+# Alignment of the values in the block [bytes]
+ALIGNMENT = 64
+
+# Base data of the worker processes of run_sweep (set once per process by _init_sweep_worker)
+_worker_base = None
+
+
+def _get_numeric_columns(df: pd.DataFrame) -> List[str]:
+    """Return the columns whose values are all numbers (or strings of numbers, as returned by import_data)"""
+    numeric = []
+    for col in df.columns:
+        values = pd.to_numeric(df[col], errors='coerce')
+        if values.isna().sum() == df[col].isna().sum():
+            numeric.append(col)
+    return numeric
+
+
+class SharedDataset:
+    """
+    Handle to the base data placed in a memory-mapped file or a shared memory block (see create and attach)
+
+    The handle is light and can be sent to the worker processes (e.g. as argument of the initializer of a
+    ProcessPoolExecutor). The process which created the block must remove it with unlink (or use the handle as a
+    context manager).
+    """
+
+    def __init__(self, layout: Dict, storage: str, location: str, size: int):
+        self.layout = layout
+        self.storage = storage
+        self.location = location
+        self.size = size
+        self._buffer = None
+        self._shm = None
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state['_buffer'] = None
+        state['_shm'] = None
+        return state
+
+    def __enter__(self) -> 'SharedDataset':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.unlink()
+
+    @classmethod
+    def create(cls, data: Dict[str, pd.DataFrame], arrays: Dict[str, np.ndarray] = None, storage: str = 'memmap',
+               memmap_fn: str = None) -> 'SharedDataset':
+        """
+        Place the values of data and arrays in a memory-mapped file or a shared memory block
+
+        Parameters
+        ----------
+        data: Dict[str, pd.DataFrame]
+            DataFrames, e.g. as returned by import_data
+        arrays: Dict[str, np.ndarray] (default: None)
+            Additional arrays, e.g. typical-day tensors
+        storage: str (default: 'memmap')
+            'memmap' (file memmap_fn, in the page cache shared by the processes) or 'shm' (shared memory block, limited
+            by the size of /dev/shm)
+        memmap_fn: str (default: None)
+            Path to the file of the 'memmap' storage
+        """
+        assert storage in STORAGES, f'Error: storage must be one of {STORAGES}.'
+        assert storage != 'memmap' or memmap_fn is not None, "Error: memmap_fn is required with storage 'memmap'."
+
+        layout = {'frames': dict(), 'arrays': dict()}
+        values = []
+        offset = 0
+        for key, df in data.items():
+            numeric = _get_numeric_columns(df)
+            block = df[numeric].apply(pd.to_numeric).values.astype(np.float64)
+            others = df[[col for col in df.columns if col not in numeric]]
+            layout['frames'][key] = {'index': df.index, 'columns': df.columns, 'numeric': numeric, 'others': others,
+                                     'offset': offset, 'shape': block.shape, 'dtype': 'float64'}
+            values.append((offset, block))
+            offset += -(-block.nbytes // ALIGNMENT) * ALIGNMENT
+        for key, array in (arrays or dict()).items():
+            array = np.ascontiguousarray(array)
+            layout['arrays'][key] = {'offset': offset, 'shape': array.shape, 'dtype': array.dtype.str}
+            values.append((offset, array))
+            offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+        size = max(offset, 1)
+
+        if storage == 'shm':
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            dataset = cls(layout, storage, shm.name, size)
+            dataset._shm = shm
+            buffer = np.ndarray((size,), dtype=np.uint8, buffer=shm.buf)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(memmap_fn)), exist_ok=True)
+            buffer = np.memmap(memmap_fn, dtype=np.uint8, mode='w+', shape=(size,))
+            dataset = cls(layout, storage, memmap_fn, size)
+        for start, array in values:
+            buffer[start:start + array.nbytes] = array.reshape(-1).view(np.uint8)
+        if storage == 'memmap':
+            buffer.flush()
+        del buffer
+        logging.info(f"Base data placed in {storage} {dataset.location} ({size / 1e6:.1f} MB)")
+        return dataset
+
+    def _get_buffer(self):
+        if self._buffer is None:
+            if self.storage == 'shm':
+                self._shm = shared_memory.SharedMemory(name=self.location) if self._shm is None else self._shm
+                self._buffer = self._shm.buf
+            else:
+                self._buffer = np.memmap(self.location, dtype=np.uint8, mode='r', shape=(self.size,))
+        return self._buffer
+
+    def _get_view(self, entry: Dict) -> np.ndarray:
+        view = np.ndarray(entry['shape'], dtype=np.dtype(entry['dtype']), buffer=self._get_buffer(),
+                          offset=entry['offset'])
+        view.flags.writeable = False
+        return view
+
+    def attach(self) -> Tuple[Dict[str, pd.DataFrame], Dict[str, np.ndarray]]:
+        """
+        Return the DataFrames and arrays, as read-only views on the block (the non-numerical columns are copies)
+
+        The DataFrames must be copied before being modified (as done by uncertainty.apply_sample and apply_delta).
+        """
+        frames = dict()
+        for key, entry in self.layout['frames'].items():
+            df = pd.DataFrame(self._get_view(entry), index=entry['index'], columns=entry['numeric'], copy=False)
+            for col in entry['others'].columns:
+                df.insert(entry['columns'].get_loc(col), col, entry['others'][col].values)
+            frames[key] = df
+        arrays = {key: self._get_view(entry) for key, entry in self.layout['arrays'].items()}
+        return frames, arrays
+
+    def close(self) -> None:
+        """Detach from the block (the views returned by attach must not be used anymore)"""
+        self._buffer = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self) -> None:
+        """Remove the block (to be called by the process which created it)"""
+        if self.storage == 'shm':
+            shm = self._shm if self._shm is not None else shared_memory.SharedMemory(name=self.location)
+            self._shm = None
+            self._buffer = None
+            shm.close()
+            shm.unlink()
+        else:
+            self.close()
+            if os.path.isfile(self.location):
+                os.remove(self.location)
+
+
+def apply_delta(data: Dict[str, pd.DataFrame], delta: Dict[str, Dict]) -> Dict[str, pd.DataFrame]:
+    """
+    Return a copy of data with the values of a scenario
+
+    Only the modified DataFrames are copied, the other ones are shared with data.
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Base data
+    delta: Dict[str, Dict]
+        New values of each modified DataFrame, by column and row, e.g. {'Technologies': {'f_min': {'PV': 5.}}}. The
+        key 'system_limits' is ignored (see update_system_limits).
+    """
+    modified_data = dict(data)
+    for key, columns in delta.items():
+        if key == 'system_limits':
+            continue
+        df = data[key].copy()
+        for col, values in columns.items():
+            assert col in df.columns, f"Error: {key} has no column {col}."
+            rows = list(values.keys())
+            missing = [row for row in rows if row not in df.index]
+            assert len(missing) == 0, f"Error: {key} has no rows {missing}."
+            df.loc[rows, col] = list(values.values())
+        modified_data[key] = df
+    return modified_data
+
+
+def update_system_limits(system_limits: Dict, delta: Dict) -> Dict:
+    """Return a copy of system_limits updated with the (nested) values of delta['system_limits']"""
+    updated = copy.deepcopy(system_limits)
+
+    def _update(target: Dict, values: Dict) -> None:
+        for key, value in values.items():
+            if isinstance(value, dict) and isinstance(target.get(key), dict):
+                _update(target[key], value)
+            else:
+                target[key] = value
+
+    _update(updated, delta.get('system_limits', dict()))
+    return updated
+
+
+def _init_sweep_worker(dataset: SharedDataset, system_limits: Dict) -> None:
+    global _worker_base
+    data, _ = dataset.attach()
+    _worker_base = {'dataset': dataset, 'data': data, 'params': get_data_params(data, system_limits),
+                    'sets': ModelCatalog.from_data(data).get_sets()}
+
+
+def run_scenario(name: str, delta: Dict, system_limits: Dict, data_fns: List[str], case_studies_dir: str,
+                 ampl_path: str, solver_options: Dict, model_fns: List[str], temp_dir: str,
+                 run_kwargs: Dict = None) -> Dict:
+    """
+    Run ESTD STEP 2 for one scenario of a sweep (executed in the worker processes, see run_sweep)
+
+    The data of the scenario is checked first (see validation.check_data): an inconsistent scenario fails without being
+    solved. The scenario is written as an overlay of the base ESTD_data.dat (data_fns[0]), or as a full ESTD_data.dat if
+    its sets are different from the base sets (see scenarios.write_scenario_data), and the ESTD_data.dat used is copied
+    in the case study.
+    """
+    row = {'scenario': name}
+    scenario_temp_dir = f"{temp_dir}/{name}"
+    try:
+        os.makedirs(scenario_temp_dir, exist_ok=True)
+        data = apply_delta(_worker_base['data'], delta)
+        scenario_system_limits = update_system_limits(system_limits, delta)
+        # Inconsistent scenarios fail before being translated and solved
+        check_data(data, scenario_system_limits)
+        estd_path, overlay_fn, changes = \
+            write_scenario_data(scenario_temp_dir, data, scenario_system_limits, data_fns[0], _worker_base['params'],
+                                _worker_base['sets'])
+        shutil.copy(estd_path, f"{scenario_temp_dir}/ESTD_data.dat")
+        overrides = {col: values for key, columns in delta.items() if key != 'system_limits'
+                     for col, values in columns.items()}
+        inputs = get_run_inputs(scenario_system_limits, overrides)
+        summary = run_step2_new(f"{case_studies_dir}/{name}", ampl_path, solver_options, model_fns,
+                                [estd_path] + data_fns[1:], scenario_temp_dir,
+                                overlay_fns=[] if overlay_fn is None else [overlay_fn], inputs=inputs,
+                                **(run_kwargs or dict()))
+        row.update({'status': 'ok', 'nbr_changes': None if changes is None else len(changes), **summary})
+    except Exception as e:
+        logging.error(f"Scenario {name} failed: {e}")
+        row['status'] = f"failed: {e}"
+    finally:
+        shutil.rmtree(scenario_temp_dir, ignore_errors=True)
+    return row
+
+
+def run_sweep(data: Dict[str, pd.DataFrame], scenarios: Dict[str, Dict], system_limits: Dict, td_data_fn: str,
+              case_studies_dir: str, ampl_path: str, solver_options: Dict, model_fns: List[str], temp_dir: str,
+              nbr_workers: int = None, storage: str = 'memmap', output_profile: Union[str, Dict] = 'full_hourly',
+              run_kwargs: Dict = None) -> pd.DataFrame:
+    """
+    Run a sweep of scenarios of ESTD STEP 2 in worker processes sharing the base data
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Base data as returned by import_data, checked before running the scenarios (see validation.check_data)
+    scenarios: Dict[str, Dict]
+        Delta of each scenario with respect to the base data (see apply_delta), with the changes of the system limits
+        under the key 'system_limits', e.g. {'gwp_20000': {'system_limits': {'GWP_limit': 20000}}}
+    system_limits: Dict
+        Base system limits
+    td_data_fn: str
+        Path to the ESTD_12TD.dat file (shared by all scenarios, see print_12td)
+    case_studies_dir: str
+        Directory where the case study of each scenario is saved
+    ampl_path: str
+        Path to AMPL
+    solver_options: Dict
+        Solver name and solver options
+    model_fns: List[str]
+        Paths to the model files
+    temp_dir: str
+        Directory of the base data files (named after the hash of their content, see scenarios.write_estd_data) and of
+        the temporary directories of the scenarios
+    nbr_workers: int (default: None)
+        Number of worker processes (default: number of processors)
+    storage: str (default: 'memmap')
+        Storage of the base data (see SharedDataset.create)
+    output_profile: Union[str, Dict] (default: 'full_hourly')
+        Output profile of the runs (see output_profiles.py), e.g. 'minimal' to only collect the summaries of the
+        scenarios without writing their case study directories
+    run_kwargs: Dict (default: None)
+        Additional arguments of run_step2_new (e.g. backend and backend_options, or run_catalog to register the
+        scenarios with their system limits and modified values as inputs)
+
+    Returns
+    -------
+    pd.DataFrame
+        Status, number of values changed (None if the full data of the scenario is printed) and summary (see
+        output_profiles.get_summary) of each scenario
+    """
+    run_kwargs = {'output_profile': output_profile, **(run_kwargs or dict())}
+    os.makedirs(temp_dir, exist_ok=True)
+    os.makedirs(case_studies_dir, exist_ok=True)
+    clean_partial_runs(case_studies_dir)
+    check_data(data, system_limits)
+    # The time series are not needed to print the data of the scenarios (ESTD_12TD.dat is shared)
+    base_data = {key: df for key, df in data.items() if key != 'Time_series'}
+    estd_path = write_estd_data(temp_dir, base_data, system_limits)
+
+    rows = []
+    with SharedDataset.create(base_data, storage=storage, memmap_fn=f"{temp_dir}/base_data.bin") as dataset:
+        with ProcessPoolExecutor(max_workers=nbr_workers, initializer=_init_sweep_worker,
+                                 initargs=(dataset, system_limits)) as executor:
+            futures = [executor.submit(run_scenario, name, delta, system_limits, [estd_path, td_data_fn],
+                                       case_studies_dir, ampl_path, solver_options, model_fns, temp_dir, run_kwargs)
+                       for name, delta in scenarios.items()]
+            for nb_done, future in enumerate(as_completed(futures), start=1):
+                rows.append(future.result())
+                logging.info(f"{nb_done}/{len(futures)} scenarios completed ({rows[-1]['scenario']}: "
+                             f"{rows[-1]['status']})")
+
+    return pd.DataFrame(rows).set_index('scenario').reindex(list(scenarios.keys()))
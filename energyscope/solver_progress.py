@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to stream and parse the output of the solver while it runs, to report the progress of the solve and
+to abort the solves whose progress stalls
+
+solve_with_progress solves the model asynchronously (solveAsync of the translator) and receives the output of the solver
+through the output handler of the translator. Each line is parsed incrementally by the parser of the solver (see
+PARSERS) into progress events, dictionaries with keys:
+- 'time': time since the start of the solve [s];
+- 'phase': 'presolve', 'barrier', 'crossover', 'simplex', 'mip' or 'done';
+- 'iteration': iteration of the barrier or simplex algorithm (iteration count for the MIP);
+- 'node': number of nodes explored (MIP only);
+- 'primal', 'dual': primal and dual objectives (best integer solution and best bound for the MIP);
+- 'gap': relative MIP gap.
+The values not given by a line are None. The events are passed to the callbacks and written in the progress log (one
+JSON object per line). The solve is aborted (with the interrupt method of the translator) if no event shows progress
+(see ProgressMonitor) for stall_time seconds.
+
+The iteration logs are only printed by the solver if its display options are set, e.g. cplex_options
+'bardisplay=1 display=1 mipdisplay=2' for CPLEX.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+FLOAT = r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?'
+EVENT_KEYS = ['time', 'phase', 'iteration', 'node', 'primal', 'dual', 'gap']
+# Columns of the node log of CPLEX giving an event value (the other columns, e.g. 'Objective' or the 'Variable B NodeID
+# Parent Depth' columns of the wide node logs, are ignored and the gap is read from the value ending with '%')
+CPLEX_NODE_COLUMNS = {'Node': 'node', 'Best Integer': 'primal', 'Best Bound': 'dual', 'ItCnt': 'iteration'}
+
+
+def _to_float(token: str) -> Optional[float]:
+    try:
+        return float(token.rstrip('+*%'))
+    except ValueError:
+        return None
+
+
+class CplexParser:
+    """Parser of the output of CPLEX (barrier, simplex and MIP node logs)"""
+
+    def __init__(self):
+        self.phase = None
+        self._node_columns = None
+
+    def _parse_node_line(self, line: str) -> Dict:
+        """Assign the values of a line of the node log to the columns whose header ends closest to their end"""
+        event = dict()
+        for match in re.finditer(r'\S+', line):
+            value = _to_float(match.group())
+            if value is None:
+                continue
+            if match.group().endswith('%'):
+                event['gap'] = value / 100
+                continue
+            name, end = min(self._node_columns, key=lambda col: abs(col[1] - match.end()))
+            key = CPLEX_NODE_COLUMNS.get(name)
+            if key is not None:
+                event[key] = int(value) if key in ['node', 'iteration'] else value
+        return event
+
+    def parse(self, line: str) -> Optional[Dict]:
+        """Return the event given by a line of output (None if the line does not give any progress information)"""
+        if re.match(r'\s*Node\s+Left\s+Objective', line):
+            # End position of each column in the header of the node log (the values are right-aligned)
+            self._node_columns = [(match.group(), match.end())
+                                  for match in re.finditer(r'Best Integer|Best Bound|\S+', line)]
+            self.phase = 'mip'
+            return {'phase': 'mip'}
+        if self.phase == 'mip' and re.match(r'[*HhM ]\s*\d+\+?\s+\d+\+?\s', line):
+            return {'phase': 'mip', **self._parse_node_line(line)}
+
+        match = re.match(r'\s*Iteration:\s+(\d+)\s+(.*?)\s*=\s*(' + FLOAT + ')', line)
+        if match:
+            self.phase = 'simplex'
+            event = {'phase': 'simplex', 'iteration': int(match.group(1))}
+            label = match.group(2).lower()
+            if 'infeas' not in label:
+                event['dual' if 'dual' in label else 'primal'] = float(match.group(3))
+            return event
+        if re.match(r'\s*Itn\s+Primal Obj\s+Dual Obj', line):
+            self.phase = 'barrier'
+            return {'phase': 'barrier'}
+        match = re.match(r'\s*(\d+)\s+(' + FLOAT + r')\s+(' + FLOAT + r')\s', line + ' ')
+        if self.phase == 'barrier' and match:
+            return {'phase': 'barrier', 'iteration': int(match.group(1)), 'primal': float(match.group(2)),
+                    'dual': float(match.group(3))}
+
+        match = re.search(r'(optimal|infeasible|unbounded|limit|solution)[^;]*;\s*objective\s+(' + FLOAT + ')', line)
+        if match:
+            self.phase = 'done'
+            return {'phase': 'done', 'primal': float(match.group(2))}
+        if self.phase == 'done':
+            # Statistics printed after the solution
+            return None
+        lower = line.lower()
+        for phase, pattern in [('crossover', 'crossover'), ('simplex', 'simplex'), ('simplex', 'iteration log'),
+                               ('presolve', 'presolve')]:
+            if pattern in lower and phase != self.phase:
+                self.phase = phase
+                return {'phase': phase}
+        return None
+
+
+# Parsers of the output of each solver (classes with a parse method returning an event or None for each line), new
+# ones can be added with register_parser
+PARSERS = {'cplex': CplexParser}
+
+
+def register_parser(name: str, parser: Callable) -> None:
+    """
+    Add a solver output parser
+
+    Parameters
+    ----------
+    name: str
+        Name of the solver (name of the solver executable, e.g. 'cplex')
+    parser: Callable
+        Class (or function) returning an object with a parse method, taking a line of output and returning an event
+        dictionary (see module description) or None
+    """
+    PARSERS[name] = parser
+
+
+def _get_relative_gap(event: Dict) -> Optional[float]:
+    if event.get('gap') is not None:
+        return event['gap']
+    if event.get('primal') is None or event.get('dual') is None:
+        return None
+    return abs(event['primal'] - event['dual']) / max(abs(event['primal']), 1e-10)
+
+
+class ProgressMonitor:
+    """
+    Output handler parsing the output of the solver into progress events (see module description)
+
+    An event shows progress if it changes the phase of the solve, reduces the relative gap between the primal and dual
+    objectives (or the MIP gap) or changes an objective by more than rtol (relative). The events without any objective
+    (e.g. the iterations of the phase I of the simplex, which only report the infeasibility) are not considered as
+    stalled either. The stall clock starts with the first event.
+
+    Parameters
+    ----------
+    parser: str (default: 'cplex')
+        Name of the parser of the solver output (see PARSERS)
+    callbacks: List[Callable] (default: None)
+        Functions called with each event
+    log_file: str (default: None)
+        Path to the progress log (JSON lines)
+    stall_time: float (default: None)
+        Time without progress [s] after which the solve is considered as stalled (never if None)
+    rtol: float (default: 1e-6)
+        Minimum relative change of the objectives or of the gap considered as progress
+    echo: bool (default: True)
+        Print the output of the solver (as the default output handler of amplpy)
+    """
+
+    def __init__(self, parser: str = 'cplex', callbacks: List[Callable] = None, log_file: str = None,
+                 stall_time: float = None, rtol: float = 1e-6, echo: bool = True):
+        assert parser in PARSERS, f"Error: parser must be one of {list(PARSERS.keys())}."
+        self.parser = PARSERS[parser]()
+        self.callbacks = list(callbacks or [])
+        self.stall_time = stall_time
+        self.rtol = rtol
+        self.echo = echo
+        self.events: List[Dict] = []
+        self.stalled = False
+        self.closed = False
+        self._buffer = ''
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._last_progress = None
+        self._reference = {'phase': None, 'gap': None, 'primal': None, 'dual': None}
+        self._log = None
+        if log_file is not None:
+            os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+            self._log = open(log_file, 'w')
+
+    def output(self, kind, msg: str) -> None:
+        """Receive some output of the translator (amplpy.OutputHandler interface)"""
+        if self.echo:
+            print(msg, end='')
+        if self.closed:
+            return
+        with self._lock:
+            lines = (self._buffer + msg).split('\n')
+            self._buffer = lines.pop()
+            for line in lines:
+                self.add_line(line)
+
+    def add_line(self, line: str) -> None:
+        """Parse a line of output and record the event it gives"""
+        event = self.parser.parse(line.rstrip('\r'))
+        if event is not None:
+            self.add_event(event)
+
+    def _has_progressed(self, event: Dict) -> bool:
+        reference = self._reference
+        progressed = event['phase'] != reference['phase']
+        reference['phase'] = event['phase']
+        if all(event[key] is None for key in ['primal', 'dual', 'gap']):
+            return True
+        gap = _get_relative_gap(event)
+        if gap is not None and (reference['gap'] is None or gap < reference['gap'] * (1 - self.rtol)):
+            reference['gap'] = gap
+            progressed = True
+        for key in ['primal', 'dual']:
+            value = event[key]
+            if value is not None and (reference[key] is None
+                                      or abs(value - reference[key]) > self.rtol * max(abs(reference[key]), 1.)):
+                reference[key] = value
+                progressed = True
+        return progressed
+
+    def add_event(self, event: Dict) -> None:
+        """Record an event, write it in the progress log and pass it to the callbacks"""
+        event = {'time': time.perf_counter() - self._t0, **{key: event.get(key) for key in EVENT_KEYS[1:]}}
+        if event['phase'] is None:
+            event['phase'] = self.parser.phase
+        previous_phase = self._reference['phase']
+        if self._has_progressed(event):
+            self._last_progress = time.perf_counter()
+        if event['phase'] != previous_phase:
+            logging.info(f"Solver phase: {event['phase']}")
+        self.events.append(event)
+        if self._log is not None:
+            self._log.write(json.dumps(event) + '\n')
+            self._log.flush()
+        for callback in self.callbacks:
+            callback(event)
+
+    def is_stalled(self) -> bool:
+        """Return whether no event showed progress for stall_time seconds"""
+        with self._lock:
+            return self.stall_time is not None and self._last_progress is not None \
+                and time.perf_counter() - self._last_progress > self.stall_time
+
+    def abort(self) -> None:
+        """Mark the solve as stalled and record an 'aborted' event"""
+        with self._lock:
+            self.stalled = True
+            self.add_event({'phase': 'aborted'})
+
+    def close(self) -> None:
+        """Parse the last line of output and close the progress log (the output is then only echoed)"""
+        with self._lock:
+            self.closed = True
+            if self._buffer:
+                self.add_line(self._buffer)
+                self._buffer = ''
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+
+def get_solver_name(ampl_trans) -> str:
+    """Return the name of the solver of a translator (name of the executable given by the option 'solver')"""
+    solver = ampl_trans.getOption('solver') or 'cplex'
+    return os.path.splitext(os.path.basename(str(solver)))[0].lower()
+
+
+def solve_with_progress(ampl_trans, callbacks: List[Callable] = None, log_file: str = None, stall_time: float = None,
+                        parser: str = None, rtol: float = 1e-6, poll_interval: float = 1.,
+                        echo: bool = True) -> ProgressMonitor:
+    """
+    Solve the model of a translator while streaming and parsing the output of the solver (see module description)
+
+    Parameters
+    ----------
+    ampl_trans:
+        Translator (see translator.py) whose model and data are read
+    callbacks: List[Callable] (default: None)
+        Functions called with each progress event
+    log_file: str (default: None)
+        Path to the progress log (JSON lines)
+    stall_time: float (default: None)
+        Time without progress [s] after which the solve is aborted (never if None)
+    parser: str (default: None)
+        Name of the parser of the solver output (see PARSERS), the parser of the solver of the translator by default
+        (or the one of CPLEX if the solver has no parser)
+    rtol: float (default: 1e-6)
+        Minimum relative change considered as progress (see ProgressMonitor)
+    poll_interval: float (default: 1.)
+        Interval [s] between two checks of the progress
+    echo: bool (default: True)
+        Print the output of the solver
+
+    Returns
+    -------
+    ProgressMonitor
+        Monitor containing the events of the solve
+    """
+    if parser is None:
+        parser = get_solver_name(ampl_trans)
+        parser = parser if parser in PARSERS else 'cplex'
+    monitor = ProgressMonitor(parser, callbacks, log_file, stall_time, rtol, echo)
+    previous_handler = None
+    if hasattr(ampl_trans, 'setOutputHandler'):
+        previous_handler = ampl_trans.getOutputHandler() if hasattr(ampl_trans, 'getOutputHandler') else None
+        ampl_trans.setOutputHandler(monitor)
+
+    try:
+        if hasattr(ampl_trans, 'solveAsync'):
+            _solve_async(ampl_trans, monitor, poll_interval)
+        else:
+            # The output is still parsed but the solve cannot be aborted
+            ampl_trans.solve()
+    finally:
+        monitor.close()
+        if previous_handler is not None:
+            ampl_trans.setOutputHandler(previous_handler)
+
+    assert not monitor.stalled, f"Error: the solve was aborted after {stall_time} s without progress."
+    return monitor
+
+
+class _SolveCallback:
+    """Callback of solveAsync signalling the end of the solve"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+    def run(self) -> None:
+        self.done.set()
+
+
+def _solve_async(ampl_trans, monitor: ProgressMonitor, poll_interval: float) -> None:
+    """Solve asynchronously, interrupting the solve if it stalls, and wait for the end of the solve"""
+    callback = _SolveCallback()
+    ampl_trans.solveAsync(callback)
+    while not callback.done.wait(poll_interval):
+        # The callback is not called if the solve fails (the error is raised in the thread of the solve)
+        assert ampl_trans.isBusy() or callback.done.wait(poll_interval), 'Error: the solve failed.'
+        if not monitor.stalled and monitor.is_stalled():
+            logging.error(f"No progress of the solver for {monitor.stall_time} s, aborting the solve")
+            monitor.abort()
+            ampl_trans.interrupt()
+    # The callback is called before the end of the thread of the solve
+    ampl_trans.wait()
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to perform step1 of EnergyScope without the MILP, for any number of days (e.g. several weather years)
+
+The MILP of step1.mod selects Nbr_TD days (medoids) minimizing the sum of the distances (L1 norm) between each day and
+its typical day, which requires N x N binaries. Here, the same problem is solved heuristically with a k-medoids
+algorithm (alternating assignment and medoid update, several random initializations), computing the distances by blocks
+in float32 so that the memory used stays limited for 10 000 days and more.
+
+The typical days are then mapped onto a reference year for print_12td: each day of the reference year is assigned to its
+typical day, and the profile of each typical day is written on one of the days of the reference year assigned to it.
+"""
+import logging
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Maximum number of float32 elements of the temporary arrays used to compute the distances
+BLOCK_ELEMENTS = 2 ** 24
+
+
+def get_daily_features(time_series: pd.DataFrame, series: List[str] = None,
+                       weights: Dict[str, float] = None) -> np.ndarray:
+    """
+    Build the normalized daily features from hourly time series
+
+    Each series is divided by its maximum (so that each one lies in [0, 1]) and multiplied by its weight, then the 24
+    hourly values of each series are concatenated for each day.
+
+    Parameters
+    ----------
+    time_series: pd.DataFrame
+        Hourly time series (24 x nbr_days rows, e.g. several years of 365 days, one column per series)
+    series: List[str] (default: None)
+        Series used for the clustering (all by default)
+    weights: Dict[str, float] (default: None)
+        Weight of each series (1 by default)
+
+    Returns
+    -------
+    np.ndarray
+        Features of shape (nbr_days, 24 x nbr_series) in float32
+    """
+    series = list(time_series.columns) if series is None else series
+    assert len(time_series) % 24 == 0, 'Error: the time series must contain a whole number of days.'
+    values = time_series[series].values.astype(np.float32)
+    scale = np.abs(values).max(axis=0)
+    values = values / np.where(scale > 0, scale, 1.)
+    if weights is not None:
+        values = values * np.array([weights.get(s, 1.) for s in series], dtype=np.float32)
+    # (nbr_days, 24, nbr_series) -> (nbr_days, nbr_series x 24), i.e. series by series as in step1_input.csv
+    return np.ascontiguousarray(values.reshape(-1, 24, len(series)).transpose(0, 2, 1).reshape(-1, 24 * len(series)))
+
+
+def read_step1_features(input_fn: str) -> np.ndarray:
+    """Read the (already normalized) daily features of step1_input.csv, whatever the number of days"""
+    data = pd.read_csv(input_fn, index_col=0)
+    return data.drop(index=["Type", "Weights", "Norm"]).values.astype(np.float32)
+
+
+def get_distances(features: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """
+    Compute the L1 distances (as in step1.mod) between two sets of days by blocks
+
+    Parameters
+    ----------
+    features: np.ndarray
+        Features of shape (nbr_days, nbr_features)
+    others: np.ndarray
+        Features of shape (nbr_others, nbr_features)
+
+    Returns
+    -------
+    np.ndarray
+        Distances of shape (nbr_days, nbr_others) in float32
+    """
+    distances = np.empty((len(features), len(others)), dtype=np.float32)
+    block_size = max(1, BLOCK_ELEMENTS // max(1, others.size))
+    for start in range(0, len(features), block_size):
+        block = features[start:start + block_size]
+        distances[start:start + len(block)] = np.abs(block[:, None, :] - others[None, :, :]).sum(axis=2)
+    return distances
+
+
+def _get_medoid(features: np.ndarray) -> int:
+    """Return the index of the day minimizing the sum of the distances to the other days"""
+    # The L1 distance is separable: for each feature, the sum of |x_i - x_j| over j is obtained from the sorted values
+    # and their cumulative sums, without computing the distances between all the pairs of days
+    nbr_days = len(features)
+    order = np.argsort(features, axis=0)
+    values = np.take_along_axis(features, order, axis=0).astype(np.float64)
+    cumsum = np.cumsum(values, axis=0)
+    rank = np.arange(nbr_days)[:, None]
+    sorted_sums = values * rank - (cumsum - values) + (cumsum[-1] - cumsum) - values * (nbr_days - 1 - rank)
+    total = np.zeros_like(values)
+    np.put_along_axis(total, order, sorted_sums, axis=0)
+    return int(np.argmin(total.sum(axis=1)))
+
+
+def _init_medoids(features: np.ndarray, nbr_td: int, rng: np.random.Generator) -> np.ndarray:
+    """Choose the initial medoids (k-medoids++: each new medoid is drawn proportionally to the distance)"""
+    medoids = [int(rng.integers(len(features)))]
+    min_dist = get_distances(features, features[medoids]).min(axis=1).astype(np.float64)
+    for _ in range(1, nbr_td):
+        prob = min_dist / min_dist.sum() if min_dist.sum() > 0 else None
+        medoids.append(int(rng.choice(len(features), p=prob)))
+        min_dist = np.minimum(min_dist, get_distances(features, features[medoids[-1:]])[:, 0])
+    return np.array(medoids)
+
+
+def kmedoids(features: np.ndarray, nbr_td: int, nbr_init: int = 5, max_iter: int = 100,
+             seed: int = 0) -> Tuple[np.ndarray, np.ndarray, float]:
+    """
+    Select typical days with a k-medoids algorithm (L1 distance)
+
+    Parameters
+    ----------
+    features: np.ndarray
+        Daily features of shape (nbr_days, nbr_features)
+    nbr_td: int
+        Number of typical days
+    nbr_init: int (default: 5)
+        Number of random initializations (the best solution is kept)
+    max_iter: int (default: 100)
+        Maximum number of iterations for each initialization
+    seed: int (default: 0)
+        Seed of the random generator
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray, float]
+        Index of the typical days (sorted), index of the typical day of each day (among the days) and objective (sum of
+        the distances between each day and its typical day, as in step1.mod)
+    """
+    assert 1 <= nbr_td <= len(features), 'Error: the number of typical days must be between 1 and the number of days.'
+    features = np.asarray(features, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    best = (None, None, np.inf)
+    for init in range(nbr_init):
+        medoids = _init_medoids(features, nbr_td, rng)
+        for _ in range(max_iter):
+            labels = get_distances(features, features[medoids]).argmin(axis=1)
+            new_medoids = medoids.copy()
+            for k in range(nbr_td):
+                members = np.flatnonzero(labels == k)
+                if len(members) > 0:
+                    new_medoids[k] = members[_get_medoid(features[members])]
+            if np.array_equal(new_medoids, medoids):
+                break
+            medoids = new_medoids
+        distances = get_distances(features, features[medoids])
+        objective = float(distances.min(axis=1).sum(dtype=np.float64))
+        logging.debug(f"k-medoids initialization {init}: objective {objective}")
+        if objective < best[2]:
+            best = (medoids, distances.argmin(axis=1), objective)
+
+    medoids, labels, objective = best
+    return np.sort(medoids), medoids[labels], objective
+
+
+def map_to_reference_year(features: np.ndarray, medoids: np.ndarray, ref_days: np.ndarray) -> np.ndarray:
+    """
+    Assign each day of the reference year to a typical day, making sure that each typical day is used
+
+    Each day is assigned to its closest typical day. If a typical day is not used by any day of the reference year, the
+    day of the reference year closest to it (among the days whose typical day is used by other days) is reassigned.
+
+    Parameters
+    ----------
+    features: np.ndarray
+        Daily features of all the days
+    medoids: np.ndarray
+        Index of the typical days
+    ref_days: np.ndarray
+        Index of the days of the reference year (365 values)
+
+    Returns
+    -------
+    np.ndarray
+        Index (in medoids) of the typical day of each day of the reference year
+    """
+    distances = get_distances(features[ref_days], features[medoids])
+    labels = distances.argmin(axis=1)
+    for k in range(len(medoids)):
+        if (labels == k).any():
+            continue
+        counts = np.bincount(labels, minlength=len(medoids))
+        candidates = np.flatnonzero(counts[labels] > 1)
+        labels[candidates[np.argmin(distances[candidates, k])]] = k
+    return labels
+
+
+def run_step1_kmedoids(nbr_td: int, time_series: pd.DataFrame, ref_year: int = 0, series: List[str] = None,
+                       weights: Dict[str, float] = None, output_dir: str = None, nbr_init: int = 5,
+                       seed: int = 0) -> Tuple[np.ndarray, pd.DataFrame]:
+    """
+    Run Step 1 of EnergyScope TD with the k-medoids heuristic on one or several years of time series
+
+    Parameters
+    ----------
+    nbr_td: int
+        Number of typical days
+    time_series: pd.DataFrame
+        Hourly time series of one or several years of 365 days (8760 x nbr_years rows), with the same columns as
+        Time_series.csv
+    ref_year: int (default: 0)
+        Index of the year on which the typical days are mapped
+    series: List[str] (default: None)
+        Series used for the clustering (all by default)
+    weights: Dict[str, float] (default: None)
+        Weight of each series in the clustering (1 by default)
+    output_dir: str (default: None)
+        If given, directory where TD_of_days_<nbr_td>.out and the time series of the reference year
+        (Time_series_<nbr_td>.csv) are saved, to be given to print_12td
+    nbr_init: int (default: 5)
+        Number of random initializations of the k-medoids
+    seed: int (default: 0)
+        Seed of the random generator
+
+    Returns
+    -------
+    Tuple[np.ndarray, pd.DataFrame]
+        Typical day (day of the reference year, 1 to 365) of each day of the reference year and time series of the
+        reference year in which the profile of each typical day is written on the day representing it
+    """
+    assert len(time_series) % 8760 == 0, 'Error: the time series must contain whole years of 365 days.'
+    nbr_years = len(time_series) // 8760
+    assert 0 <= ref_year < nbr_years, f"Error: the reference year must be between 0 and {nbr_years - 1}."
+    logging.info(f'Running STEP1 (k-medoids) with {nbr_td} typical days on {nbr_years} year(s)')
+
+    features = get_daily_features(time_series, series, weights)
+    medoids, labels, objective = kmedoids(features, nbr_td, nbr_init=nbr_init, seed=seed)
+    logging.info(f"Sum of the distances to the typical days: {objective:.4f}")
+
+    # Map the typical days onto the reference year
+    ref_days = np.arange(365 * ref_year, 365 * (ref_year + 1))
+    ref_labels = map_to_reference_year(features, medoids, ref_days)
+    # Each typical day is written on the day of the reference year closest to it among the days it represents
+    distances = get_distances(features[ref_days], features[medoids])
+    hosts = np.array([np.flatnonzero(ref_labels == k)[np.argmin(distances[ref_labels == k, k])]
+                      for k in range(nbr_td)])
+    ref_ts = time_series.iloc[8760 * ref_year:8760 * (ref_year + 1)].copy()
+    values = time_series.values.reshape(-1, 24, time_series.shape[1])
+    ref_values = ref_ts.values.reshape(365, 24, -1)
+    ref_values[hosts] = values[medoids]
+    ref_ts = pd.DataFrame(ref_values.reshape(8760, -1), index=np.arange(1, 8761), columns=time_series.columns)
+    td_of_days = hosts[ref_labels] + 1
+
+    if output_dir is not None:
+        pd.DataFrame(td_of_days).to_csv(os.path.join(output_dir, f'TD_of_days_{nbr_td}.out'), header=False,
+                                        index=False, sep='\t')
+        ref_ts.to_csv(os.path.join(output_dir, f'Time_series_{nbr_td}.csv'))
+    return td_of_days, ref_ts
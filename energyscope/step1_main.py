@@ -12,13 +12,15 @@ from sys import platform
 from pathlib import Path
 import csv
 import logging
+from typing import Dict
 
-import numpy as np
 import pandas as pd
 
 import amplpy
 
 from energyscope.amplpy_aux import get_results
+from energyscope.translator import create_translator
+from energyscope.solver_progress import solve_with_progress
 import energyscope as es
 
 
@@ -38,7 +40,8 @@ def print_step1_data(nbr_td: int, input_fn: str, output_fn: str) -> None:
 
     data = pd.read_csv(input_fn, index_col=0)
     data_header = data.loc[["Type", "Weights", "Norm"]]
-    data = data.loc[[str(i) for i in range(1, 366)]].astype(float)
+    # All the other rows are days (365 by default, but several years can be given)
+    data = data.drop(index=["Type", "Weights", "Norm"]).astype(float)
 
     # Add header
     header_fn = os.path.join(Path(__file__).parents[0], 'headers/step1_header.txt')
@@ -51,6 +54,11 @@ def print_step1_data(nbr_td: int, input_fn: str, output_fn: str) -> None:
     es.print_param('Nbr_TD', nbr_td, '', output_fn)
     es.newline(output_fn)
 
+    # Specify days and dimensions
+    es.print_set(list(data.index), 'DAYS', output_fn)
+    es.print_set([str(i) for i in range(1, data.shape[1] + 1)], 'DIMENSIONS', output_fn)
+    es.newline(output_fn)
+
     # Print comments
     data_header.index = [f"# {idx}" for idx in data_header.index]
     data_header.to_csv(output_fn, sep='\t', mode='a', header=False, index=True, quoting=csv.QUOTE_NONE)
@@ -71,17 +79,20 @@ def print_step1_out(ampl_trans: amplpy.AMPL, step1_out_fn: str) -> None:
         Output file name
 
     """
-    # Get results
-    results_step1 = get_results(ampl_trans)
-
-    # Do some manipulation on the cluster matrix
-    cm = results_step1['Cluster_matrix'].pivot(index='index0', columns='index1', values='Cluster_matrix.val')
-    cm.index.name = None
-    out = pd.DataFrame(cm.mul(np.arange(1, 366), axis=0).sum(axis=0)).astype(int)
+    # Get results (only the nonzero elements of the cluster matrix, i.e. one per day)
+    results_step1 = get_results(ampl_trans, names=['Cluster_matrix'], sparse=['Cluster_matrix'], tol=0.5)
+
+    # For each day (index1), the selected typical day is the one (index0) to which it is assigned
+    cm = results_step1['Cluster_matrix'].astype({'index0': int, 'index1': int})
+    nbr_days = ampl_trans.getSet('DAYS').size()
+    assert len(cm) == nbr_days and cm['index1'].nunique() == nbr_days, \
+        'Error: each day must be assigned to one typical day.'
+    out = pd.DataFrame(cm.sort_values('index1')['index0'])
     out.to_csv(step1_out_fn, header=False, index=False, sep='\t')
 
 
-def run_step1(nbr_td: int, data_path: str, ampl_path: str, solver_path: str) -> None:
+def run_step1(nbr_td: int, data_path: str, ampl_path: str, solver_path: str,
+              backend: str = 'amplpy', backend_options: Dict = None, progress_options: Dict = None) -> None:
     """
     Run Step 1 of EnergyScope TD (i.e. time series aggregation) with a given number of time steps
 
@@ -95,13 +106,20 @@ def run_step1(nbr_td: int, data_path: str, ampl_path: str, solver_path: str) ->
         Path to AMPL
     solver_path: str
         Path to solver
+    backend: str (default: 'amplpy')
+        Translator backend (see energyscope.translator)
+    backend_options: Dict (default: None)
+        Options of the translator backend
+    progress_options: Dict (default: None)
+        Stream the solver output during the solve with these options of solver_progress.solve_with_progress (e.g.
+        {'log_file': ..., 'stall_time': 600} to follow the MIP gap and abort the solve if it stalls)
 
     """
     # running ES
     logging.info('Running STEP1')
 
     # Create AMPL environment
-    ampl_trans = amplpy.AMPL(environment=amplpy.Environment(ampl_path))
+    ampl_trans = create_translator(ampl_path, backend, backend_options)
 
     # Set solver
     ampl_trans.setOption('solver', solver_path)
@@ -117,7 +135,10 @@ def run_step1(nbr_td: int, data_path: str, ampl_path: str, solver_path: str) ->
     ampl_trans.readData(data_fn)
 
     # Solve
-    ampl_trans.solve()
+    if progress_options is None:
+        ampl_trans.solve()
+    else:
+        solve_with_progress(ampl_trans, **progress_options)
 
     # Print output
     output_fn = os.path.join(Path(__file__).parents[0], f'step1_io/TD_of_days_{nbr_td}.out')
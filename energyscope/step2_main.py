@@ -8,18 +8,34 @@ Also contains functions to analyse input data
 @author: Paolo Thiran, Antoine Dubois
 """
 import logging
+import os
 import shutil
+import time
 import pickle
+from contextlib import nullcontext
 from subprocess import CalledProcessError, run
-from typing import Dict, List
+from typing import Dict, List, Union
 
-import amplpy
-
-from energyscope.step2_output_generator import save_results
-from energyscope.amplpy_aux import get_sets, get_parameters, get_results
+from energyscope.amplpy_aux import get_sets, get_parameters, get_results, get_duals, get_reduced_costs, simplify_df
 
 from energyscope.utils import make_dir
-from energyscope.sankey_input import generate_sankey_file
+from energyscope.run_dirs import check_case_study_dir, copy_input_files, run_dir
+from energyscope.model_catalog import ModelCatalog
+from energyscope.output_profiles import get_output_profile, save_outputs, get_summary
+from energyscope.step2_output_generator import save_marginal_costs
+from energyscope.profiling import span
+from energyscope.run_catalog import OBJECTIVES, RunCatalog, get_config_hash
+from energyscope.solver_progress import solve_with_progress
+from energyscope.translator import create_translator
+from energyscope.presolve import restore_dropped
+
+
+# Constraints and variables used by save_marginal_costs
+STEP2_DUALS = ['layer_balance', 'Minimum_GWP_reduction', 'Minimum_RE_share', 'solar_area_limited']
+STEP2_REDUCED_COSTS = ['F']
+# Parameters and sets used by save_marginal_costs
+MARGINAL_COSTS_PARAMETERS = ['t_op']
+MARGINAL_COSTS_SETS = ['HOUR_OF_PERIOD', 'PERIODS', 'TECHNOLOGIES', 'TYPICAL_DAY_OF_PERIOD']
 
 
 def run_step2(case_study_dir: str, run_file_name: str, ampl_path: str, temp_dir: str):
@@ -29,9 +45,10 @@ def run_step2(case_study_dir: str, run_file_name: str, ampl_path: str, temp_dir:
     :param case_study_dir: path to the case study directory.
     :param run_file_name: path and name of the .run file.
     :param ampl_path: ampl path to execute the .run file.
-    :param temp_dir: directory to copy the results.
+    :param temp_dir: directory where the .run file writes the results, moved to case_study_dir at the end of the run
     """
 
+    check_case_study_dir(case_study_dir)
     make_dir(f"{temp_dir}/output")
     make_dir(f"{temp_dir}/output/hourly_data")
     make_dir(f"{temp_dir}/output/sankey")
@@ -42,22 +59,67 @@ def run_step2(case_study_dir: str, run_file_name: str, ampl_path: str, temp_dir:
     # running ES
     logging.info('Running EnergyScope')
     try:
-        run(f"{ampl_path} {run_file_name}", shell=True, check=True)
+        with span('ampl run'):
+            run(f"{ampl_path} {run_file_name}", shell=True, check=True)
     except CalledProcessError as e:
         print("The run didn't end normally.")
         print(e)
         exit()
 
-    # Copy temporary results to case studies directory
-    shutil.copytree(temp_dir, case_study_dir)
+    # Move the results and copy the input files of the run to the case study directory
+    with span('publish'):
+        with run_dir(case_study_dir) as scratch_dir:
+            shutil.move(f"{temp_dir}/output", f"{scratch_dir}/output")
+            copy_input_files(temp_dir, scratch_dir)
 
     logging.info('End of run')
     return
 
 
+def create_step2_translator(ampl_path: str, solver_options: Dict, model_fns: List[str], data_fns: List[str],
+                            backend: str = 'amplpy', backend_options: Dict = None, overlay_fns: List[str] = None):
+    """
+    Create an AMPL translator with the solver options, models and data files of ESTD STEP 2 (not solved yet).
+
+    :param ampl_path: ampl path.
+    :param solver_options: solver name and solver options
+    :param model_fns: list of paths to the model files
+    :param data_fns: list of paths to the data files
+    :param backend: translator backend (see translator.py)
+    :param backend_options: options of the translator backend
+    :param overlay_fns: list of paths to files with AMPL statements evaluated after reading the data files (e.g. the
+     changes of a scenario with respect to the base data, see scenarios.prepare_scenario)
+    :return: translator ready to be solved
+    """
+    # Create AMPL environment
+    ampl_trans = create_translator(ampl_path, backend, backend_options)
+
+    # Set solver and solver options
+    for option_name in solver_options.keys():
+        option_value = solver_options[option_name]
+        ampl_trans.setOption(option_name, option_value)
+
+    # Read models and data files
+    with span('ampl read'):
+        for model_fn in model_fns:
+            ampl_trans.read(model_fn)
+        for data_fn in data_fns:
+            ampl_trans.readData(data_fn)
+        for overlay_fn in overlay_fns or []:
+            with open(overlay_fn, 'r') as file:
+                ampl_trans.eval(file.read())
+
+    return ampl_trans
+
+
 def run_step2_new(case_study_dir: str, ampl_path: str, solver_options: Dict,
                   model_fns: List[str], data_fns: List[str], temp_dir: str,
-                  dump_res_only: bool = False) -> None:
+                  dump_res_only: bool = False, backend: str = 'amplpy', backend_options: Dict = None,
+                  extract_all: bool = False, extract_duals: bool = False, dropped: Dict = None,
+                  catalog: ModelCatalog = None, overlay_fns: List[str] = None,
+                  output_profile: Union[str, Dict] = 'full_hourly', overwrite: bool = False,
+                  run_catalog: str = None, inputs: Dict[str, float] = None,
+                  progress_options: Dict = None) -> Dict[str, float]:
     """
     Run ESTD STEP 2 using Python and amplpy.
 
@@ -66,61 +128,115 @@ def run_step2_new(case_study_dir: str, ampl_path: str, solver_options: Dict,
     :param solver_options: solver name and solver options
     :param model_fns: list of paths to the model files
     :param data_fns: list of paths to the data files
-    :param temp_dir: directory to copy the results.
-    :param dump_res_only: save raw results only
+    :param temp_dir: directory of the input files of the run (e.g. the .dat files), copied in case_study_dir. The
+     outputs are written in a scratch directory next to case_study_dir and renamed into case_study_dir (see
+     run_dirs.py).
+    :param dump_res_only: save raw results only (pickles of the extracted entities of the output profile, no output
+     file)
+    :param backend: translator backend, 'amplpy' or 'replay' to reuse recorded results without AMPL (see translator.py)
+    :param backend_options: options of the translator backend (e.g. {'replay_dir': path to a previous output dir})
+    :param extract_all: extract all the variables, parameters and sets instead of only those used to save the outputs
+    :param extract_duals: extract dual values and reduced costs and save marginal costs (see save_marginal_costs)
+    :param dropped: entities removed from the data by presolve.prune_data, restored with zero values in the outputs
+    :param catalog: sets of the model built from the data (see model_catalog.ModelCatalog), used by the outputs instead
+     of the subsets extracted from AMPL and saved with the case study
+    :param overlay_fns: list of paths to files with AMPL statements evaluated after reading the data files
+    :param output_profile: name of an output profile ('minimal', 'standard' or 'full_hourly') or output profile
+     defining what is extracted, saved and kept in case_study_dir (see output_profiles.py)
+    :param overwrite: replace case_study_dir if it already exists
+    :param run_catalog: path to the SQLite catalog where the run is registered (see run_catalog.RunCatalog)
+    :param inputs: key scalar inputs of the run registered in the catalog (see run_catalog.get_run_inputs)
+    :param progress_options: stream the solver output during the solve with these options of
+     solver_progress.solve_with_progress (e.g. {'callbacks': [...], 'stall_time': 600}), the progress log being written
+     in case_study_dir (progress.jsonl) by default if the outputs are persisted. The run fails if the solve stalls.
+    :return: summary of the run (objectives and installed capacities by default, see output_profiles.get_summary)
     """
 
-    make_dir(f"{temp_dir}/output")
-    make_dir(f"{temp_dir}/output/hourly_data")
-    make_dir(f"{temp_dir}/output/sankey")
-    # make_dir(f"{temp_dir}/output/sets")
-    # make_dir(f"{temp_dir}/output/parameters")
-    # make_dir(f"{temp_dir}/output/results")
+    start_time = time.perf_counter()
+    profile = get_output_profile(output_profile)
+    if dump_res_only:
+        profile = {**profile, 'save': []}
+    if profile['persist']:
+        check_case_study_dir(case_study_dir, overwrite)
 
     # running ES
     logging.info('Running EnergyScope')
 
-    # Create AMPL environment
-    ampl_trans = amplpy.AMPL(environment=amplpy.Environment(ampl_path))
-
-    # Set solver and solver options
-    for option_name in solver_options.keys():
-        option_value = solver_options[option_name]
-        ampl_trans.setOption(option_name, option_value)
-
-    # Read models
-    for model_fn in model_fns:
-        ampl_trans.read(model_fn)
-
-    # Read data files
-    for data_fn in data_fns:
-        ampl_trans.readData(data_fn)
-
-    # Solve
-    ampl_trans.solve()
-
-    # Get inputs and outputs
-    results = get_results(ampl_trans)
-    parameters = get_parameters(ampl_trans)
-    sets = get_sets(ampl_trans)
-
-    # Dump results into a pickle file
-    # if dump_res_only:
-    # logging.info("Only dump results")
-    with open(f"{temp_dir}/output/results.pickle", 'wb') as handle:
-        pickle.dump(results, handle, protocol=pickle.HIGHEST_PROTOCOL)
-    with open(f"{temp_dir}/output/parameters.pickle", 'wb') as handle:
-        pickle.dump(parameters, handle, protocol=pickle.HIGHEST_PROTOCOL)
-    with open(f"{temp_dir}/output/sets.pickle", 'wb') as handle:
-        pickle.dump(sets, handle, protocol=pickle.HIGHEST_PROTOCOL)
-    # else:
-    logging.info("Saving results")
-    save_results(results, parameters, sets, f"{temp_dir}/output/")
-
-    logging.info("Creating Sankey diagram input file")
-    generate_sankey_file(results, parameters, sets, f"{temp_dir}/output/sankey/")
-
-    # Copy temporary results to case studies directory
-    shutil.copytree(temp_dir, case_study_dir)
+    # Create AMPL environment and read models and data files
+    ampl_trans = create_step2_translator(ampl_path, solver_options, model_fns, data_fns, backend, backend_options,
+                                         overlay_fns)
+
+    # Write the outputs (and the progress log of the solve) in a scratch directory published as the case study
+    # directory once complete
+    with run_dir(case_study_dir, overwrite) if profile['persist'] else nullcontext() as scratch_dir:
+        # Solve
+        with span('solve'):
+            solve_start_time = time.perf_counter()
+            if progress_options is None:
+                ampl_trans.solve()
+            else:
+                log_file = None if scratch_dir is None else f"{scratch_dir}/progress.jsonl"
+                solve_with_progress(ampl_trans, **{'log_file': log_file, **progress_options})
+            solve_time = time.perf_counter() - solve_start_time
+
+        # Get inputs and outputs
+        parameter_names, set_names = profile['parameters'], profile['sets']
+        if extract_duals:
+            parameter_names = sorted(set(parameter_names) | set(MARGINAL_COSTS_PARAMETERS))
+            set_names = sorted(set(set_names) | set(MARGINAL_COSTS_SETS))
+        with span('get_results'):
+            results = get_results(ampl_trans, None if extract_all else profile['results'])
+        with span('get_parameters'):
+            parameters = get_parameters(ampl_trans, None if extract_all else parameter_names)
+        with span('get_sets'):
+            sets = get_sets(ampl_trans, None if extract_all else set_names)
+        if extract_duals:
+            with span('get_duals'):
+                duals = get_duals(ampl_trans, None if extract_all else STEP2_DUALS)
+                reduced_costs = get_reduced_costs(ampl_trans, None if extract_all else STEP2_REDUCED_COSTS)
+        if catalog is not None:
+            # Sets built from the data rather than the subsets extracted from AMPL
+            sets = {**sets, **catalog.get_sets()}
+        if dropped is not None:
+            with span('restore_dropped'):
+                results, parameters, sets = restore_dropped(results, parameters, sets, dropped)
+        summary = get_summary(results, profile['summary'])
+
+        if scratch_dir is not None:
+            output_dir = f"{scratch_dir}/output"
+            make_dir(output_dir)
+            # Dump results into a pickle file
+            with span('pickle dump'):
+                for name, entities in [('results', results), ('parameters', parameters), ('sets', sets)]:
+                    if name in profile['pickles']:
+                        with open(f"{output_dir}/{name}.pickle", 'wb') as handle:
+                            pickle.dump(entities, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                if extract_duals:
+                    with open(f"{output_dir}/duals.pickle", 'wb') as handle:
+                        pickle.dump(duals, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                    with open(f"{output_dir}/reduced_costs.pickle", 'wb') as handle:
+                        pickle.dump(reduced_costs, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                if catalog is not None:
+                    catalog.save(f"{output_dir}/catalog.npz")
+            logging.info("Saving results")
+            save_outputs(profile['save'], results, parameters, sets, f"{output_dir}/", profile['output_format'])
+            if extract_duals:
+                logging.info("Saving marginal costs")
+                save_marginal_costs(duals, reduced_costs, parameters, sets, f"{output_dir}/", profile['output_format'])
+
+            # Copy the input files of the run (e.g. the .dat files) next to the outputs
+            with span('copy inputs'):
+                copy_input_files(temp_dir, scratch_dir, profile['output_format'])
+
+    if run_catalog is not None:
+        with span('register run'), RunCatalog(run_catalog) as runs:
+            capacities = simplify_df(results['F']).squeeze(axis=1).to_dict() if 'F' in results else None
+            runs.register(case_study_dir, get_config_hash(model_fns + data_fns + (overlay_fns or []), solver_options),
+                          inputs, {name: summary[name] for name in OBJECTIVES if name in summary}, capacities,
+                          {'solve_time': solve_time, 'total_time': time.perf_counter() - start_time},
+                          str(ampl_trans.getValue('solve_result')),
+                          output_profile if isinstance(output_profile, str) else 'custom',
+                          os.path.abspath(f"{case_study_dir}/output") if profile['persist'] else None)
 
     logging.info('End of run')
+    return summary
@@ -8,19 +8,25 @@ Contains functions to generate appropriate output files from an ESTD STEP 2 run
 """
 import itertools
 import logging
+import os
 from typing import Dict
 
+import numpy as np
 import pandas as pd
 from functools import reduce
 from itertools import product
 import pickle
 
 from energyscope.amplpy_aux import simplify_df, time_to_pandas
-from energyscope.sankey_input import generate_sankey_file
+from energyscope.hourly_dispatch import save_hourly_dispatch
+from energyscope.model_catalog import ModelCatalog, load_catalog
+from energyscope.output_formats import write_table
+from energyscope.profiling import profiled
 
 
+@profiled
 def save_breakdowns(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                    sets: Dict, output_dir: str) -> None:
+                    sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
     """See save_results"""
 
     # Cost Breakdown
@@ -34,7 +40,7 @@ def save_breakdowns(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.D
     cost_breakdown = reduce(lambda left, right: pd.merge(left, right, on='Name', how='outer'),
                             [c_inv, c_maint, c_op])
     cost_breakdown = cost_breakdown.fillna(0).round(6).sort_index()
-    cost_breakdown.to_csv(f"{output_dir}cost_breakdown.csv")
+    write_table(cost_breakdown, f"{output_dir}cost_breakdown.csv", output_format)
 
     # GWP breakdown
     gwp_constr = simplify_df(results["GWP_constr"])
@@ -45,7 +51,7 @@ def save_breakdowns(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.D
 
     gwp_breakdown = reduce(lambda left, right: pd.merge(left, right, on='Name', how='outer'), [gwp_constr, gwp_op])
     gwp_breakdown = gwp_breakdown.fillna(0).round(6).sort_index()
-    gwp_breakdown.to_csv(f"{output_dir}gwp_breakdown.csv")
+    write_table(gwp_breakdown, f"{output_dir}gwp_breakdown.csv", output_format)
 
     # Einv breakdown
     einv_constr = simplify_df(results["Einv_constr"])
@@ -56,7 +62,7 @@ def save_breakdowns(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.D
 
     einv_breakdown = reduce(lambda left, right: pd.merge(left, right, on='Name', how='outer'), [einv_constr, einv_op])
     einv_breakdown = einv_breakdown.fillna(0).round(6).sort_index()
-    einv_breakdown.to_csv(f"{output_dir}einv_breakdown.csv")
+    write_table(einv_breakdown, f"{output_dir}einv_breakdown.csv", output_format)
 
     # Resources breakdown
     avail = simplify_df(parameters["avail"]).squeeze()
@@ -70,11 +76,12 @@ def save_breakdowns(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.D
     for res in resources:
         resources_breakdown.loc[res, 'Used'] = (f_t.loc[res].loc[times] * t_op.loc[times]).sum()
         resources_breakdown.loc[res, 'Potential'] = avail[res]
-    resources_breakdown.round(6).to_csv(f"{output_dir}resources_breakdown.csv")
+    write_table(resources_breakdown.round(6), f"{output_dir}resources_breakdown.csv", output_format)
 
 
+@profiled
 def save_tech_res_matrices(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                           sets: Dict, output_dir: str) -> None:
+                           sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
     """See save_results"""
 
     # Cost Op Tech and GWP tech
@@ -120,12 +127,13 @@ def save_tech_res_matrices(results: Dict[str, pd.DataFrame], parameters: Dict[st
             cost_op_tech.loc[tech, res] = (num_cost / den).sum()
             gwp_tech.loc[tech, res] = (num_gwp / den).sum()
 
-    cost_op_tech.to_csv(f"{output_dir}cost_op_tech.csv")
-    gwp_tech.to_csv(f"{output_dir}gwp_tech.csv")
+    write_table(cost_op_tech, f"{output_dir}cost_op_tech.csv", output_format)
+    write_table(gwp_tech, f"{output_dir}gwp_tech.csv", output_format)
 
 
+@profiled
 def save_losses(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                sets: Dict, output_dir: str) -> None:
+                sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
     """See save_results"""
 
     network_losses = results['Network_losses'].set_index(['index0', 'index1', 'index2']).squeeze()
@@ -138,11 +146,12 @@ def save_losses(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataF
     for eut in euts:
         losses.loc[eut] = (network_losses.loc[eut].loc[times] * t_op.loc[times]).sum()
 
-    losses.round(3).to_csv(f"{output_dir}losses.csv")
+    write_table(losses.round(3), f"{output_dir}losses.csv", output_format)
 
 
+@profiled
 def save_assets(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                sets: Dict, output_dir: str) -> None:
+                sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
     """See save_results"""
 
     # Results
@@ -234,11 +243,20 @@ def save_assets(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataF
         assets.loc[tech, 'c_p'] = (f_t.loc[tech].loc[times] * t_op.loc[times]).sum() / (8760 * max(f[tech], 1e-4))
 
     assets.loc[all_techs] = assets.loc[all_techs].astype(float).round(6)
-    assets.to_csv(f"{output_dir}assets.csv")
+    write_table(assets, f"{output_dir}assets.csv", output_format)
 
 
+def get_t_op(parameters: Dict[str, pd.DataFrame], times: pd.Series) -> np.ndarray:
+    """Return the duration [h] of each period of times (see time_to_pandas), 1 if t_op was not extracted"""
+    if 't_op' not in parameters:
+        return np.ones(len(times))
+    t_op = parameters['t_op'].set_index(['index0', 'index1']).squeeze(axis=1)
+    return t_op.loc[list(times)].values
+
+
+@profiled
 def save_year_balance(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                      sets: Dict, output_dir: str) -> None:
+                      sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
     """See save_results"""
 
     # Sets
@@ -256,24 +274,27 @@ def save_year_balance(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd
 
     # Parameters
     layers_in_out = parameters['layers_in_out'].set_index(['index0', 'index1']).squeeze()
+    # Duration of each period (1 hour, unless the typical days are split into segments)
+    t_op = get_t_op(parameters, times)
 
     year_balance = pd.DataFrame(0., index=all_techs + ['END_USES_DEMAND'], columns=layers, dtype=float)
     for lay in layers:
 
         for rt in res_and_techs:
-            year_balance.loc[rt, lay] = (layers_in_out.loc[rt, lay] * f_t.loc[rt].loc[times]).sum()
+            year_balance.loc[rt, lay] = (layers_in_out.loc[rt, lay] * f_t.loc[rt].loc[times] * t_op).sum()
 
         for tech in storage_techs:
-            year_balance.loc[tech, lay] = (storage_out.loc[tech, lay].loc[times]
-                                           - storage_in.loc[tech, lay].loc[times]).sum()
+            year_balance.loc[tech, lay] = ((storage_out.loc[tech, lay].loc[times]
+                                            - storage_in.loc[tech, lay].loc[times]) * t_op).sum()
 
-        year_balance.loc['END_USES_DEMAND', lay] = end_uses.loc[lay].loc[times].sum()
+        year_balance.loc['END_USES_DEMAND', lay] = (end_uses.loc[lay].loc[times] * t_op).sum()
 
-    year_balance.round(6).to_csv(f"{output_dir}year_balance.csv")
+    write_table(year_balance.round(6), f"{output_dir}year_balance.csv", output_format)
 
 
+@profiled
 def save_layers(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                sets: Dict, output_dir: str) -> None:
+                sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
     """See save_results"""
 
     # Sets
@@ -323,11 +344,12 @@ def save_layers(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataF
 
         layers_df.loc[tds_hs, 'END_USE'] = -end_uses.loc[lay].loc[hs_tds].values
 
-        layers_df.round(6).to_csv(f"{output_dir}layer_{lay}.csv")
+        write_table(layers_df.round(6), f"{output_dir}layer_{lay}.csv", output_format)
 
 
+@profiled
 def save_energy_stored(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                       sets: Dict, output_dir: str) -> None:
+                       sets: Dict, output_dir: str, output_format: str = 'csv') -> None:
 
     # TODO: also not the same result for TS_DEC_HP_ELEC and BEV_BATT but seems correct in the python version as it
     #  contains the same values as in Storage_level.csv (error in this file?)
@@ -363,13 +385,71 @@ def save_energy_stored(results: Dict[str, pd.DataFrame], parameters: Dict[str, p
             energy_stored.loc[times.index, f"{tech}_Pout"] -= \
                 (storage_out.loc[tech, lay].loc[times] / storage_eff_out.loc[tech, lay]).values
 
-    energy_stored.round(6).to_csv(f"{output_dir}energy_stored.csv")
+    write_table(energy_stored.round(6), f"{output_dir}energy_stored.csv", output_format)
+
+
+@profiled
+def save_marginal_costs(duals: Dict[str, pd.DataFrame], reduced_costs: Dict[str, pd.DataFrame],
+                        parameters: Dict[str, pd.DataFrame], sets: Dict, output_dir: str,
+                        output_format: str = 'csv') -> None:
+    """
+    Generate output files based on the dual values and reduced costs of an ESTD STEP 2 run
 
+    - hourly_data/marginal_costs.csv: marginal cost of each layer for each hour of the year (dual of layer_balance,
+      divided by the duration represented by the corresponding hour of typical day, i.e. its number of occurrences in
+      T_H_TD times t_op) [M€/GWh for energy layers]
+    - shadow_prices.csv: dual value of each scalar constraint (e.g. Minimum_GWP_reduction for the CO2 price)
+    - reduced_costs.csv: reduced costs of the variables indexed over the technologies (e.g. F)
+
+    Parameters
+    ----------
+    duals: Dict[str, pd.DataFrame]
+        Dictionary containing for each constraint its dual values as a DataFrame (see amplpy_aux.get_duals)
+    reduced_costs: Dict[str, pd.DataFrame]
+        Dictionary containing for each variable its reduced costs as a DataFrame (see amplpy_aux.get_reduced_costs)
+    parameters: Dict[str, pd.DataFrame]
+        Dictionary containing for each parameter of the problem, the corresponding DataFrame
+    sets: Dict
+        Dictionary containing all the sets and subsets defined in the problem
+    output_dir: str
+        Path to the directory where output files ought to be saved
+    output_format: str (default: 'csv')
+        Format of the output files (see output_formats.py)
+    """
 
+    # Hourly marginal costs
+    if 'layer_balance' in duals:
+        times = time_to_pandas(sets)
+        t_op = parameters['t_op'].set_index(['index0', 'index1']).squeeze()
+        duration = times.value_counts() * t_op.reindex(times.value_counts().index).values
+        marginal_costs = duals['layer_balance'].set_index(['index0', 'index1', 'index2']).squeeze().unstack(0)
+        marginal_costs = marginal_costs.div(duration.reindex(marginal_costs.index).values, axis=0)
+        marginal_costs = marginal_costs.reindex(pd.MultiIndex.from_tuples(times.values))
+        marginal_costs.index = pd.MultiIndex.from_arrays([times.index] + list(zip(*times.values)),
+                                                         names=['Period', 'Hour', 'Td'])
+        marginal_costs.columns.name = None
+        write_table(marginal_costs.round(9), f"{output_dir}hourly_data/marginal_costs.csv", output_format)
+
+    # Shadow prices of the scalar constraints
+    shadow_prices = pd.Series({name: df.iloc[0, -1] for name, df in duals.items() if df.shape[1] == 1},
+                              name='dual', dtype=float)
+    shadow_prices.index.name = 'Constraint'
+    write_table(shadow_prices, f"{output_dir}shadow_prices.csv", output_format)
+
+    # Reduced costs of the variables indexed over the technologies
+    techs = sorted(sets['TECHNOLOGIES'])
+    rcs = [simplify_df(df) for df in reduced_costs.values() if df.shape[1] == 2]
+    rcs = [df for df in rcs if set(df.index) == set(techs)]
+    if len(rcs):
+        write_table(pd.concat(rcs, axis=1).loc[techs].round(9), f"{output_dir}reduced_costs.csv", output_format)
+
+
+@profiled
 def save_results(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame],
-                 sets: Dict, output_dir: str) -> None:
+                 sets: Dict, output_dir: str, catalog: ModelCatalog = None, output_format: str = 'csv') -> None:
     """
-    Generate output files based on ESTD STEP 2 results and inputs
+    Generate output files based on ESTD STEP 2 results and inputs: breakdowns, year balance and hourly dispatch (see
+    output_profiles.py to choose the outputs)
 
     Parameters
     ----------
@@ -381,24 +461,21 @@ def save_results(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.Data
         Dictionary containing all the sets and subsets defined in the problem
     output_dir: str
         Path to the directory where output files ought to be saved
+    catalog: ModelCatalog (default: None)
+        Sets of the model built from the data, used instead of the subsets extracted from AMPL if given
+    output_format: str (default: 'csv')
+        Format of the output tables, 'csv', 'csv.gz', 'csv.zst' or 'parquet' (see output_formats.py)
     """
 
+    if catalog is not None:
+        sets = {**sets, **catalog.get_sets()}
     logging.info('Saving breakdowns')
-    save_breakdowns(results, parameters, sets, output_dir)
+    save_breakdowns(results, parameters, sets, output_dir, output_format)
     logging.info('Saving year balance')
-    save_year_balance(results, parameters, sets, output_dir)
-    # logging.info('Saving assets')
-    # save_assets(results, parameters, sets, output_dir)
-    if 0:
-
-        logging.info('Saving technology-resource matrices')
-        save_tech_res_matrices(results, parameters, sets, output_dir)
-        logging.info('Saving losses')
-        save_losses(results, parameters, sets, output_dir)
-        logging.info('Saving layers')
-        save_layers(results, parameters, sets, f"{output_dir}hourly_data/")
-        logging.info('Saving energy stored')
-        save_energy_stored(results, parameters, sets, f"{output_dir}hourly_data/")
+    save_year_balance(results, parameters, sets, output_dir, output_format)
+    logging.info('Saving hourly dispatch')
+    os.makedirs(f"{output_dir}hourly_data/", exist_ok=True)
+    save_hourly_dispatch(results, parameters, sets, f"{output_dir}hourly_data/")
 
 
 def extract_results_step2(case_study_dir: str) -> None:
@@ -418,11 +495,12 @@ def extract_results_step2(case_study_dir: str) -> None:
     with open(f"{case_study_dir}/output/sets.pickle", 'rb') as handle:
         sets = pickle.load(handle)
 
-    logging.info("Saving results")
-    save_results(results, parameters, sets, f"{case_study_dir}/output/")
+    catalog = None
+    if os.path.isfile(f"{case_study_dir}/output/catalog.npz"):
+        catalog = load_catalog(case_study_dir)
 
-    logging.info("Creating Sankey diagram input file")
-    # generate_sankey_file(results, parameters, sets, f"{case_study_dir}/output/sankey/")
+    logging.info("Saving results")
+    save_results(results, parameters, sets, f"{case_study_dir}/output/", catalog)
 
     logging.info('End of run')
 
@@ -15,6 +15,24 @@ import numpy as np
 import pandas as pd
 import csv
 
+from energyscope.model_catalog import ModelCatalog
+from energyscope.profiling import profiled
+
+
+# DICTIONARIES TO TRANSLATE TIME SERIES NAMES INTO AMPL SYNTAX #
+# for EUD timeseries
+EUD_PARAMS = {'Electricity (%_elec)': 'param electricity_time_series :',
+              'Space Heating (%_sh)': 'param heating_time_series :',
+              'Passanger mobility (%_pass)': 'param mob_pass_time_series :',  # TODO: change to 'Passenger' ?
+              'Freight mobility (%_freight)': 'param mob_freight_time_series :'}
+# for resources timeseries that have only 1 tech linked to it
+RES_PARAMS = {'PV': 'PV',
+              'Wind_onshore': 'WIND_ONSHORE',
+              'Wind_offshore': 'WIND_OFFSHORE',
+              'Hydro_river': 'HYDRO_RIVER'}
+# for resources timeseries that have several techs linked to it
+RES_MULT_PARAMS = {'Solar': ['DHN_SOLAR', 'DEC_SOLAR']}
+
 
 def ampl_syntax(df: pd.DataFrame, comment: str = '') -> pd.DataFrame:
     # adds ampl syntax to df
@@ -53,6 +71,7 @@ def print_param(name: str, param: float, comment: str, out_path: str) -> None:
             writer.writerow(['param ' + str(name) + ' := ' + str(param) + '; # ' + str(comment)])
 
 
+@profiled
 def import_data(user_data_dir: str, developer_data_dir: str):
     """
     Dictionary with the DataFrames containing all the data in the form :
@@ -97,13 +116,18 @@ def import_data(user_data_dir: str, developer_data_dir: str):
     return all_df
 
 
-def print_estd(out_path: str, data: dict, system_limits: dict):
+@profiled
+def print_estd(out_path: str, data: dict, system_limits: dict, segments: pd.DataFrame = None,
+               catalog: ModelCatalog = None):
     """
     Prints the data into .dat file (out_path) with the right syntax for AMPL.
 
     :param out_path: path to the directory to save the .dat file
     :param data: dict composed of DataFrames with the data to export.
     :param system_limits: dict with values for system limits: GWP, ... cf configuration file.
+    :param segments: intra-day segments of the typical days as returned by print_segmented_td (if used instead of
+     print_12td). The hourly parameters (state_of_charge_ev) are then given per segment.
+    :param catalog: sets of the model built from data (see model_catalog.ModelCatalog), built if not given.
     """
 
     logging.info('Printing ESTD_data.dat')
@@ -111,7 +135,6 @@ def print_estd(out_path: str, data: dict, system_limits: dict):
     eud = data['Demand']
     resources = data['Resources']
     technologies = data['Technologies']
-    end_uses_categories = data['End_uses_categories']
     layers_in_out = data['Layers_in_out']
     storage_characteristics = data['Storage_characteristics']
     storage_eff_in = data['Storage_eff_in']
@@ -167,91 +190,19 @@ def print_estd(out_path: str, data: dict, system_limits: dict):
     a[0, 6] = 0.6
     a[1, 6] = 0.6
     state_of_charge_ev = pd.DataFrame(a, columns=np.arange(1, 25), index=['PHEV_BATT', 'BEV_BATT'])
+    if segments is not None:
+        # Most constraining value over the hours covered by each segment (in any typical day)
+        state_of_charge_ev = pd.concat([state_of_charge_ev.loc[:, row.start:row.start + row.t_op - 1].max(axis=1)
+                                        .rename(row.segment) for row in segments.itertuples()], axis=1)
+        state_of_charge_ev = state_of_charge_ev.groupby(level=0, axis=1).max()
     # Network
     loss_network = {'ELECTRICITY': system_limits['loss_network']['ELECTRICITY'],
                     'HEAT_LOW_T_DHN': system_limits['loss_network']['HEAT_LOW_T_DHN']}
     # cost to reinforce the grid due to intermittent renewable energy penetration. See 2.2.2
     c_grid_extra = system_limits['c_grid_extra']
 
-    # Storage daily
-    # TODO automatise
-    STORAGE_DAILY = ['TS_DEC_HP_ELEC', 'TS_DEC_THHP_GAS', 'TS_DEC_COGEN_GAS', 'TS_DEC_COGEN_OIL',
-                     'TS_DEC_ADVCOGEN_GAS', 'TS_DEC_ADVCOGEN_H2', 'TS_DEC_BOILER_GAS', 'TS_DEC_BOILER_WOOD',
-                     'TS_DEC_BOILER_OIL', 'TS_DEC_DIRECT_ELEC', 'TS_DHN_DAILY', 'BATT_LI', 'TS_HIGH_TEMP']
-
     # Building SETS from data #
-    SECTORS = list(eud_simple.columns)
-    END_USES_INPUT = list(eud_simple.index)
-    END_USES_CATEGORIES = list(end_uses_categories.loc[:, 'END_USES_CATEGORIES'].unique())
-    RESOURCES = list(resources_simple.index)
-    RES_IMPORT_CONSTANT = ['GAS', 'GAS_RE', 'H2_RE', 'H2']  # TODO automatise
-    BIOFUELS = list(resources[resources.loc[:, 'Subcategory'] == 'Biofuel'].index)
-    # TODO: change to resources ?
-    re_ressources = resources.loc[(resources['Category'] == 'Renewable'), :]
-    RE_RESOURCES = list(re_ressources.index)
-    re_be_non_biomass = re_ressources.loc[(re_ressources['Subcategory'] == 'Non-biomass'), :]
-    re_be_biomass = re_ressources.loc[(re_ressources['Subcategory'] == 'Biomass'), :]
-    RE_BE_RESOURCES = list(re_be_non_biomass.index) + list(re_be_biomass.index)
-    EXPORT = list(resources.loc[resources['Category'] == 'Export', :].index)
-
-    END_USES_TYPES_OF_CATEGORY = []
-    for i in END_USES_CATEGORIES:
-        li = list(end_uses_categories.loc[
-                      end_uses_categories.loc[:, 'END_USES_CATEGORIES'] == i, 'END_USES_TYPES_OF_CATEGORY'])
-        END_USES_TYPES_OF_CATEGORY.append(li)
-
-    # TECHNOLOGIES_OF_END_USES_TYPE -> # METHOD 2 (uses layer_in_out to determine the END_USES_TYPE)
-    END_USES_TYPES = list(end_uses_categories.loc[:, 'END_USES_TYPES_OF_CATEGORY'])
-
-    ALL_TECHS = list(technologies_simple.index)
-
-    layers_in_out_tech = layers_in_out.loc[~layers_in_out.index.isin(RESOURCES), :]
-    TECHNOLOGIES_OF_END_USES_TYPE = []
-    for i in END_USES_TYPES:
-        li = list(layers_in_out_tech.loc[layers_in_out_tech.loc[:, i] == 1, :].index)
-        TECHNOLOGIES_OF_END_USES_TYPE.append(li)
-
-    # STORAGE and INFRASTRUCTURES
-    ALL_TECH_OF_EUT = [item for sublist in TECHNOLOGIES_OF_END_USES_TYPE for item in sublist]
-
-    STORAGE_TECH = list(storage_eff_in.index)
-    INFRASTRUCTURE = [item for item in ALL_TECHS if item not in STORAGE_TECH and item not in ALL_TECH_OF_EUT]
-
-    # EVs
-    EVs_BATT = list(evs.loc[:, 'EVs_BATT'])
-    V2G = list(evs.index)
-
-    # STORAGE_OF_END_USES_TYPES ->  #METHOD 2 (using storage_eff_in)
-    STORAGE_OF_END_USES_TYPES_DHN = []
-    STORAGE_OF_END_USES_TYPES_DEC = []
-    STORAGE_OF_END_USES_TYPES_ELEC = []
-    STORAGE_OF_END_USES_TYPES_HIGH_T = []
-
-    for i in STORAGE_TECH:
-        if storage_eff_in.loc[i, 'HEAT_LOW_T_DHN'] > 0:
-            STORAGE_OF_END_USES_TYPES_DHN.append(i)
-        elif storage_eff_in.loc[i, 'HEAT_LOW_T_DECEN'] > 0:
-            STORAGE_OF_END_USES_TYPES_DEC.append(i)
-        elif storage_eff_in.loc[i, 'ELECTRICITY'] > 0:
-            STORAGE_OF_END_USES_TYPES_ELEC.append(i)
-        elif storage_eff_in.loc[i, 'HEAT_HIGH_T'] > 0:
-            STORAGE_OF_END_USES_TYPES_HIGH_T.append(i)
-
-    STORAGE_OF_END_USES_TYPES_ELEC.remove('BEV_BATT')
-    STORAGE_OF_END_USES_TYPES_ELEC.remove('PHEV_BATT')
-
-    # etc. still TS_OF_DEC_TECH and EVs_BATT_OF_V2G missing... -> hard coded !
-
-    COGEN = []
-    BOILERS = []
-
-    for i in ALL_TECH_OF_EUT:
-        if (layers_in_out.loc[i, 'HEAT_HIGH_T'] == 1 or layers_in_out.loc[i, 'HEAT_LOW_T_DHN'] == 1 or
-                layers_in_out.loc[i, 'HEAT_LOW_T_DECEN'] == 1):
-            if layers_in_out.loc[i, 'ELECTRICITY'] > 0:
-                COGEN.append(i)
-            else:
-                BOILERS.append(i)
+    sets = ModelCatalog.from_data(data).get_sets() if catalog is None else catalog.get_sets()
 
     # Adding AMPL syntax #
     # creating Batt_per_Car_df for printing
@@ -285,63 +236,42 @@ def print_estd(out_path: str, data: dict, system_limits: dict):
             file.write(line)
 
     # printing sets
-    print_set(SECTORS, 'SECTORS', out_path)
-    print_set(END_USES_INPUT, 'END_USES_INPUT', out_path)
-    print_set(END_USES_CATEGORIES, 'END_USES_CATEGORIES', out_path)
-    print_set(RESOURCES, 'RESOURCES', out_path)
-    print_set(RES_IMPORT_CONSTANT, 'RES_IMPORT_CONSTANT', out_path)
-    print_set(BIOFUELS, 'BIOFUELS', out_path)
-    print_set(RE_RESOURCES, 'RE_RESOURCES', out_path)
-    print_set(RE_BE_RESOURCES, 'RE_BE_RESOURCES', out_path)
-    print_set(EXPORT, 'EXPORT', out_path)
+    for name in ['SECTORS', 'END_USES_INPUT', 'END_USES_CATEGORIES', 'RESOURCES', 'RES_IMPORT_CONSTANT', 'BIOFUELS',
+                 'RE_RESOURCES', 'RE_BE_RESOURCES', 'EXPORT']:
+        print_set(sets[name], name, out_path)
     newline(out_path)
-    n = 0
-    for j in END_USES_TYPES_OF_CATEGORY:
-        print_set(j, 'END_USES_TYPES_OF_CATEGORY' + '["' + END_USES_CATEGORIES[n] + '"]', out_path)
-        n += 1
+    for cat, euts in sets['END_USES_TYPES_OF_CATEGORY'].items():
+        print_set(euts, 'END_USES_TYPES_OF_CATEGORY' + '["' + cat + '"]', out_path)
     newline(out_path)
-    n = 0
-    for j in TECHNOLOGIES_OF_END_USES_TYPE:
-        print_set(j, 'TECHNOLOGIES_OF_END_USES_TYPE' + '["' + END_USES_TYPES[n] + '"]', out_path)
-        n += 1
+    for eut, techs in sets['TECHNOLOGIES_OF_END_USES_TYPE'].items():
+        print_set(techs, 'TECHNOLOGIES_OF_END_USES_TYPE' + '["' + eut + '"]', out_path)
     newline(out_path)
-    print_set(STORAGE_TECH, 'STORAGE_TECH', out_path)
-    print_set(INFRASTRUCTURE, 'INFRASTRUCTURE', out_path)
+    print_set(sets['STORAGE_TECH'], 'STORAGE_TECH', out_path)
+    print_set(sets['INFRASTRUCTURE'], 'INFRASTRUCTURE', out_path)
     newline(out_path)
     with open(out_path, mode='a', newline='') as file:
         writer = csv.writer(file, delimiter='\t', quotechar=' ', quoting=csv.QUOTE_MINIMAL)
         writer.writerow(['# Storage subsets'])
-    print_set(EVs_BATT, 'EVs_BATT', out_path)
-    print_set(V2G, 'V2G', out_path)
-    print_set(STORAGE_DAILY, 'STORAGE_DAILY', out_path)
+    print_set(sets['EVs_BATT'], 'EVs_BATT', out_path)
+    print_set(sets['V2G'], 'V2G', out_path)
+    print_set(sets['STORAGE_DAILY'], 'STORAGE_DAILY', out_path)
     newline(out_path)
-    print_set(STORAGE_OF_END_USES_TYPES_DHN, 'STORAGE_OF_END_USES_TYPES ["HEAT_LOW_T_DHN"]', out_path)
-    print_set(STORAGE_OF_END_USES_TYPES_DEC, 'STORAGE_OF_END_USES_TYPES ["HEAT_LOW_T_DECEN"]', out_path)
-    print_set(STORAGE_OF_END_USES_TYPES_ELEC, 'STORAGE_OF_END_USES_TYPES ["ELECTRICITY"]', out_path)
-    print_set(STORAGE_OF_END_USES_TYPES_HIGH_T, 'STORAGE_OF_END_USES_TYPES ["HEAT_HIGH_T"]', out_path)
+    for eut, storage_techs in sets['STORAGE_OF_END_USES_TYPES'].items():
+        print_set(storage_techs, 'STORAGE_OF_END_USES_TYPES ["' + eut + '"]', out_path)
     newline(out_path)
     with open(out_path, mode='a', newline='') as file:
         writer = csv.writer(file, delimiter='\t', quotechar=' ', quoting=csv.QUOTE_MINIMAL)
         writer.writerow(['# Link between storages & specific technologies	'])
-    # Hardcoded
-    print_set(['TS_DEC_HP_ELEC'], 'TS_OF_DEC_TECH ["DEC_HP_ELEC"]', out_path)
-    print_set(['TS_DEC_DIRECT_ELEC'], 'TS_OF_DEC_TECH ["DEC_DIRECT_ELEC"]', out_path)
-    print_set(['TS_DEC_THHP_GAS'], 'TS_OF_DEC_TECH ["DEC_THHP_GAS"]', out_path)
-    print_set(['TS_DEC_COGEN_GAS'], 'TS_OF_DEC_TECH ["DEC_COGEN_GAS"]', out_path)
-    print_set(['TS_DEC_ADVCOGEN_GAS'], 'TS_OF_DEC_TECH ["DEC_ADVCOGEN_GAS"]', out_path)
-    print_set(['TS_DEC_COGEN_OIL'], 'TS_OF_DEC_TECH ["DEC_COGEN_OIL"]', out_path)
-    print_set(['TS_DEC_ADVCOGEN_H2'], 'TS_OF_DEC_TECH ["DEC_ADVCOGEN_H2"]', out_path)
-    print_set(['TS_DEC_BOILER_GAS'], 'TS_OF_DEC_TECH ["DEC_BOILER_GAS"]', out_path)
-    print_set(['TS_DEC_BOILER_WOOD'], 'TS_OF_DEC_TECH ["DEC_BOILER_WOOD"]', out_path)
-    print_set(['TS_DEC_BOILER_OIL'], 'TS_OF_DEC_TECH ["DEC_BOILER_OIL"]', out_path)
-    print_set(['PHEV_BATT'], 'EVs_BATT_OF_V2G ["CAR_PHEV"]', out_path)
-    print_set(['BEV_BATT'], 'EVs_BATT_OF_V2G ["CAR_BEV"]', out_path)
+    for tech, storage_techs in sets['TS_OF_DEC_TECH'].items():
+        print_set(storage_techs, 'TS_OF_DEC_TECH ["' + tech + '"]', out_path)
+    for tech, storage_techs in sets['EVs_BATT_OF_V2G'].items():
+        print_set(storage_techs, 'EVs_BATT_OF_V2G ["' + tech + '"]', out_path)
     newline(out_path)
     with open(out_path, mode='a', newline='') as file:
         writer = csv.writer(file, delimiter='\t', quotechar=' ', quoting=csv.QUOTE_MINIMAL)
         writer.writerow(['# Additional sets, just needed for printing results	'])
-    print_set(COGEN, 'COGEN', out_path)
-    print_set(BOILERS, 'BOILERS', out_path)
+    print_set(sets['COGEN'], 'COGEN', out_path)
+    print_set(sets['BOILERS'], 'BOILERS', out_path)
     newline(out_path)
 
     # printing parameters
@@ -439,6 +369,7 @@ def print_estd(out_path: str, data: dict, system_limits: dict):
 
 
 # TODO: the name of this function should be changed
+@profiled
 def print_12td(out_path: str, time_series: pd.DataFrame, step1_output_path: str, nbr_td: int = 12):
     f"""
     Create the ESTD_{nbr_td}TD.dat file from timeseries and STEP1 results.
@@ -452,18 +383,9 @@ def print_12td(out_path: str, time_series: pd.DataFrame, step1_output_path: str,
     logging.info('Printing ESTD_' + str(nbr_td) + 'TD.dat')
 
     # DICTIONARIES TO TRANSLATE NAMES INTO AMPL SYNTAX #
-    # for EUD timeseries
-    eud_params = {'Electricity (%_elec)': 'param electricity_time_series :',
-                  'Space Heating (%_sh)': 'param heating_time_series :',
-                  'Passanger mobility (%_pass)': 'param mob_pass_time_series :',  # TODO: change to 'Passenger' ?
-                  'Freight mobility (%_freight)': 'param mob_freight_time_series :'}
-    # for resources timeseries that have only 1 tech linked to it
-    res_params = {'PV': 'PV',
-                  'Wind_onshore': 'WIND_ONSHORE',
-                  'Wind_offshore': 'WIND_OFFSHORE',
-                  'Hydro_river': 'HYDRO_RIVER'}
-    # for resources timeseries that have several techs linked to it
-    res_mult_params = {'Solar': ['DHN_SOLAR', 'DEC_SOLAR']}
+    eud_params = EUD_PARAMS
+    res_params = RES_PARAMS
+    res_mult_params = RES_MULT_PARAMS
 
     # READING OUTPUT OF STEP1 #
     td_of_days = pd.read_csv(step1_output_path, names=['TD_of_days'])
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to generate synthetic (but consistent) results, parameters and sets of an ESTD STEP 2 run, in the
+same 'long' format as the one produced by energyscope.amplpy_aux. They allow to run and benchmark the output
+generation functions without an AMPL licence.
+
+The synthetic case is built on top of the reference Belgian data (the output generators and the Sankey generator refer
+to some technologies by name) and can be scaled up with additional technologies, layers, storage units and typical days.
+"""
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from energyscope.model_catalog import ModelCatalog
+from energyscope.step2_print_data import import_data, RES_PARAMS, RES_MULT_PARAMS
+
+# Technologies whose capacity factor follows a time series (see print_12td)
+TS_TECHS = list(RES_PARAMS.values()) + [tech for techs in RES_MULT_PARAMS.values() for tech in techs]
+
+
+def long_df(name: str, levels: List[List], values: np.ndarray, variable: bool = True) -> pd.DataFrame:
+    """
+    Build a 'long' DataFrame with columns index0, ..., indexN and the values of an entity (as done by amplpy_aux.to_pd)
+
+    Parameters
+    ----------
+    name: str
+        Name of the AMPL entity
+    levels: List[List]
+        List of the sets indexing the entity
+    values: np.ndarray
+        Values of the entity, of shape (len(levels[0]), ..., len(levels[-1]))
+    variable: bool (default: True)
+        Whether the entity is a variable (values column named '<name>.val') or a parameter (column named '<name>')
+
+    Returns
+    -------
+    pd.DataFrame
+    """
+    col_name = f"{name}.val" if variable else name
+    if len(levels) == 0:
+        return pd.DataFrame({col_name: [float(values)]})
+    df = pd.MultiIndex.from_product(levels).to_frame(index=False, name=[f"index{i}" for i in range(len(levels))])
+    df[col_name] = np.asarray(values, dtype=float).ravel()
+    return df
+
+
+def generate_synthetic_case(nbr_td: int = 12, nbr_techs: int = None, nbr_layers: int = None,
+                            nbr_storage: int = None, data_dir: str = None,
+                            seed: int = 0) -> Tuple[Dict[str, pd.DataFrame], Dict[str, pd.DataFrame], Dict]:
+    """
+    Generate synthetic results, parameters and sets of an ESTD STEP 2 run
+
+    The values are random but consistent with each other: F_t <= F * c_p_t, the costs and emissions are computed from
+    F and F_t as in the model, End_uses closes the layer balance (when positive) and each typical day represents at
+    least one day of the year.
+
+    Parameters
+    ----------
+    nbr_td: int (default: 12)
+        Number of typical days (between 1 and 365)
+    nbr_techs: int (default: None)
+        Number of technologies (storage excluded). Synthetic technologies are added to the reference ones to reach it.
+        If None, only the reference technologies are used.
+    nbr_layers: int (default: None)
+        Number of layers. Synthetic layers are added to the reference ones to reach it.
+    nbr_storage: int (default: None)
+        Number of storage technologies. Synthetic storage units are added to the reference ones to reach it.
+    data_dir: str (default: None)
+        Path to the Data directory containing the reference data. If None, the Data directory of the repository is used.
+    seed: int (default: 0)
+        Seed of the random number generator
+
+    Returns
+    -------
+    results: Dict[str, pd.DataFrame]
+        Dictionary containing the values of each output variable
+    parameters: Dict[str, pd.DataFrame]
+        Dictionary containing the values of each parameter
+    sets: Dict
+        Dictionary containing all the sets and subsets
+    """
+    assert 1 <= nbr_td <= 365, "Error: the number of typical days must be between 1 and 365."
+    rng = np.random.default_rng(seed)
+
+    if data_dir is None:
+        data_dir = os.path.join(Path(__file__).parents[1], 'Data')
+    data = import_data(f"{data_dir}/User_data", f"{data_dir}/Developer_data")
+    sets = ModelCatalog.from_data(data).get_sets()
+    technologies = data['Technologies']
+    resources = data['Resources']
+    layers_in_out = data['Layers_in_out'].astype(float)
+    storage_eff_in = data['Storage_eff_in'].astype(float)
+    storage_eff_out = data['Storage_eff_out'].astype(float)
+    storage_characteristics = data['Storage_characteristics'].astype(float)
+
+    # Scale up the reference case
+    ref_techs = [tech for tech in sets['TECHNOLOGIES'] if tech not in sets['STORAGE_TECH']]
+    for name, nbr, nbr_ref in [('techs', nbr_techs, len(ref_techs)), ('layers', nbr_layers, len(sets['LAYERS'])),
+                               ('storage', nbr_storage, len(sets['STORAGE_TECH']))]:
+        assert nbr is None or nbr >= nbr_ref, \
+            f"Error: nbr_{name} must be larger than the number of reference {name} ({nbr_ref})."
+    extra_layers = [f"SYN_LAYER_{i}" for i in range(0 if nbr_layers is None else nbr_layers - len(sets['LAYERS']))]
+    extra_techs = [f"SYN_TECH_{i}" for i in range(0 if nbr_techs is None else nbr_techs - len(ref_techs))]
+    extra_sto = [f"SYN_STO_{i}" for i in range(0 if nbr_storage is None else nbr_storage - len(sets['STORAGE_TECH']))]
+
+    sets['LAYERS'] += extra_layers
+    layers = sets['LAYERS']
+    layers_in_out = layers_in_out.reindex(columns=layers, fill_value=0.)
+    # Each synthetic technology converts a layer into another one
+    for tech in extra_techs:
+        lay_in, lay_out = rng.choice(layers, 2, replace=False)
+        layers_in_out.loc[tech] = 0.
+        layers_in_out.loc[tech, [lay_in, lay_out]] = [-rng.uniform(1., 3.), 1.]
+    # Each synthetic storage unit is connected to one layer
+    storage_eff_in = storage_eff_in.reindex(columns=layers, fill_value=0.)
+    storage_eff_out = storage_eff_out.reindex(columns=layers, fill_value=0.)
+    for sto in extra_sto:
+        lay = rng.choice(layers)
+        storage_eff_in.loc[sto] = 0.
+        storage_eff_out.loc[sto] = 0.
+        storage_eff_in.loc[sto, lay] = rng.uniform(0.8, 1.)
+        storage_eff_out.loc[sto, lay] = rng.uniform(0.8, 1.)
+        storage_characteristics.loc[sto] = [4., 4., 1., 0.]
+    sets['INFRASTRUCTURE'] += extra_techs
+    sets['STORAGE_TECH'] += extra_sto
+    sets['TECHNOLOGIES'] += extra_techs + extra_sto
+
+    # Time sets
+    hours = [float(h) for h in range(1, 25)]
+    tds = [float(td) for td in range(1, nbr_td + 1)]
+    periods = [float(t) for t in range(1, 8761)]
+    # Each TD represents at least one day
+    td_of_days = np.concatenate((np.arange(1, nbr_td + 1), rng.integers(1, nbr_td + 1, 365 - nbr_td)))
+    rng.shuffle(td_of_days)
+    td_of_periods = np.repeat(td_of_days, 24).astype(float)
+    h_of_periods = np.tile(np.arange(1, 25), 365).astype(float)
+    sets['HOURS'] = hours
+    sets['TYPICAL_DAYS'] = tds
+    sets['PERIODS'] = periods
+    sets['T_H_TD'] = list(zip(periods, h_of_periods, td_of_periods))
+    sets['HOUR_OF_PERIOD'] = {t: [h] for t, h in zip(periods, h_of_periods)}
+    sets['TYPICAL_DAY_OF_PERIOD'] = {t: [td] for t, td in zip(periods, td_of_periods)}
+    # Weight of each (h, td) in the year
+    days_per_td = np.bincount(td_of_days, minlength=nbr_td + 1)[1:].astype(float)
+
+    res = sets['RESOURCES']
+    techs = sets['TECHNOLOGIES']
+    sto_techs = sets['STORAGE_TECH']
+    conv_techs = [tech for tech in techs if tech not in sto_techs]
+    entities = res + conv_techs
+    n_h, n_td = len(hours), len(tds)
+
+    # Parameters
+    tech_params = technologies.loc[[t for t in techs if t in technologies.index],
+                                   ['c_inv', 'c_maint', 'gwp_constr', 'einv_constr', 'lifetime', 'c_p', 'fmin_perc',
+                                    'fmax_perc', 'f_min', 'f_max']].astype(float)
+    tech_params = tech_params.reindex(techs)
+    nb_missing = tech_params['c_inv'].isna().sum()
+    tech_params.loc[tech_params['c_inv'].isna()] = \
+        np.column_stack([rng.uniform(0.1, 2., nb_missing), rng.uniform(0.01, 0.1, nb_missing),
+                         rng.uniform(0., 1., nb_missing), rng.uniform(0., 1., nb_missing),
+                         rng.integers(15, 50, nb_missing), np.ones(nb_missing), np.zeros(nb_missing),
+                         np.ones(nb_missing), np.zeros(nb_missing), np.full(nb_missing, 1e15)])
+    i_rate = 0.015
+    tau = i_rate * (1 + i_rate) ** tech_params['lifetime'] / ((1 + i_rate) ** tech_params['lifetime'] - 1)
+    res_params = resources.loc[res, ['avail', 'gwp_op', 'c_op', 'einv_op']].astype(float)
+
+    c_p_t = np.ones((len(techs), n_h, n_td))
+    for i, tech in enumerate(techs):
+        if tech in TS_TECHS:
+            c_p_t[i] = rng.uniform(0., 1., (n_h, n_td))
+    t_op = np.ones((n_h, n_td))
+
+    parameters = dict()
+    for col in tech_params.columns:
+        parameters[col] = long_df(col, [techs], tech_params[col].values, False)
+    parameters['tau'] = long_df('tau', [techs], tau.values, False)
+    for col in res_params.columns:
+        parameters[col] = long_df(col, [res], res_params[col].values, False)
+    parameters['i_rate'] = long_df('i_rate', [], i_rate, False)
+    parameters['t_op'] = long_df('t_op', [hours, tds], t_op, False)
+    parameters['c_p_t'] = long_df('c_p_t', [techs, hours, tds], c_p_t, False)
+    parameters['layers_in_out'] = long_df('layers_in_out', [entities, layers],
+                                          layers_in_out.loc[entities, layers].values, False)
+    parameters['storage_eff_in'] = long_df('storage_eff_in', [sto_techs, layers],
+                                           storage_eff_in.loc[sto_techs, layers].values, False)
+    parameters['storage_eff_out'] = long_df('storage_eff_out', [sto_techs, layers],
+                                            storage_eff_out.loc[sto_techs, layers].values, False)
+    for col in storage_characteristics.columns:
+        parameters[col] = long_df(col, [sto_techs], storage_characteristics.loc[sto_techs, col].values, False)
+
+    # Results
+    f = pd.Series(rng.uniform(0., 50., len(techs)), index=techs)
+    f[rng.uniform(size=len(techs)) < 0.2] = 0.  # Some technologies are not installed
+    f_t_techs = f.values[:, None, None] * c_p_t * rng.uniform(0., 1., c_p_t.shape)
+    f_t_res = rng.uniform(0., 50., (len(res), n_h, n_td))
+    f_t_res[rng.uniform(size=len(res)) < 0.3] = 0.
+    f_t = pd.concat((pd.DataFrame(f_t_res.reshape(len(res), -1), index=res),
+                     pd.DataFrame(f_t_techs.reshape(len(techs), -1), index=techs)))
+    f_t = f_t[~f_t.index.duplicated()]
+
+    eff_in = storage_eff_in.loc[sto_techs, layers].values
+    eff_out = storage_eff_out.loc[sto_techs, layers].values
+    sto_in = rng.uniform(0., 5., (len(sto_techs), len(layers), n_h * n_td)) * (eff_in > 0)[:, :, None]
+    sto_out = rng.uniform(0., 5., (len(sto_techs), len(layers), n_h * n_td)) * (eff_out > 0)[:, :, None]
+    sto_in *= (f[sto_techs].values > 0)[:, None, None]
+    sto_out *= (f[sto_techs].values > 0)[:, None, None]
+
+    # Layer balance: production + storage output - storage input = end uses
+    balance = layers_in_out.loc[entities, layers].values.T @ f_t.loc[entities].values \
+        + (sto_out - sto_in).sum(axis=0)
+    end_uses = np.clip(balance, 0., None)
+    euts = sets['END_USES_TYPES']
+    network_losses = np.zeros((len(euts), n_h * n_td))
+    for i, eut in enumerate(euts):
+        if eut in ['ELECTRICITY', 'HEAT_LOW_T_DHN']:
+            network_losses[i] = 0.05 * end_uses[layers.index(eut)]
+
+    # Yearly use of each entity
+    yearly_use = (f_t.values.reshape(len(f_t), n_h, n_td) * t_op * days_per_td).sum(axis=(1, 2))
+    yearly_use = pd.Series(yearly_use, index=f_t.index)
+
+    dec_techs = list(sets['TS_OF_DEC_TECH'].keys())
+    storage_level = f[sto_techs].values[:, None] * rng.uniform(0., 1., (len(sto_techs), len(periods)))
+
+    results = dict()
+    results['F'] = long_df('F', [techs], f.values)
+    results['F_t'] = long_df('F_t', [f_t.index.tolist(), hours, tds], f_t.values)
+    results['F_t_solar'] = long_df('F_t_solar', [dec_techs, hours, tds],
+                                   rng.uniform(0., 1., (len(dec_techs), n_h, n_td)))
+    results['F_solar'] = long_df('F_solar', [dec_techs], rng.uniform(0., 1., len(dec_techs)))
+    results['Storage_in'] = long_df('Storage_in', [sto_techs, layers, hours, tds], sto_in)
+    results['Storage_out'] = long_df('Storage_out', [sto_techs, layers, hours, tds], sto_out)
+    results['Storage_level'] = long_df('Storage_level', [sto_techs, periods], storage_level)
+    results['End_uses'] = long_df('End_uses', [layers, hours, tds], end_uses)
+    results['Network_losses'] = long_df('Network_losses', [euts, hours, tds], network_losses)
+    results['C_inv'] = long_df('C_inv', [techs], tech_params['c_inv'].values * f.values)
+    results['C_maint'] = long_df('C_maint', [techs], tech_params['c_maint'].values * f.values)
+    results['C_op'] = long_df('C_op', [res], res_params['c_op'].values * yearly_use[res].values)
+    results['GWP_constr'] = long_df('GWP_constr', [techs], tech_params['gwp_constr'].values * f.values)
+    results['GWP_op'] = long_df('GWP_op', [res], res_params['gwp_op'].values * yearly_use[res].values)
+    results['Einv_constr'] = long_df('Einv_constr', [techs], tech_params['einv_constr'].values * f.values)
+    results['Einv_op'] = long_df('Einv_op', [res], res_params['einv_op'].values * yearly_use[res].values)
+    results['TotalCost'] = long_df('TotalCost', [],
+                                   (tau.values * results['C_inv']['C_inv.val'].values).sum()
+                                   + results['C_maint']['C_maint.val'].sum() + results['C_op']['C_op.val'].sum())
+    results['TotalGWP'] = long_df('TotalGWP', [], results['GWP_op']['GWP_op.val'].sum())
+    results['TotalEinv'] = long_df('TotalEinv', [], results['Einv_op']['Einv_op.val'].sum()
+                                   + (results['Einv_constr']['Einv_constr.val'].values
+                                      / tech_params['lifetime'].values).sum())
+
+    return results, parameters, sets
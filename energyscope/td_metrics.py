@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to measure how well a selection of typical days (output of STEP 1) reproduces the original time
+series
+
+For each selection (TD_of_days) and each series, the 8760-hour series is reconstructed from the typical days (with the
+same correction of the yearly sum as in print_12td) and compared to the original series with:
+- rmse: root mean square error, divided by the maximum of the series;
+- duration_curve_error: root mean square error between the duration curves, divided by the maximum of the series;
+- peak_factor: maximum of the series divided by the maximum of the reconstruction (as peak_sh_factor in print_12td);
+- ramp_error: root mean square error between the duration curves of the hourly ramps, divided by the maximum of the
+  series;
+- max_ramp_ratio: largest hourly ramp of the reconstruction divided by the largest hourly ramp of the series.
+All the selections are evaluated at once with array operations.
+"""
+import logging
+import os
+import re
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from energyscope.segmentation import read_td_of_days
+
+TD_METRICS = ['rmse', 'duration_curve_error', 'peak_factor', 'ramp_error', 'max_ramp_ratio']
+
+
+def read_td_of_days_dir(step1_io_dir: str) -> Dict[int, np.ndarray]:
+    """Return the selections (TD_of_days_<nbr_td>.out files) found in a directory, indexed by number of TDs"""
+    selections = dict()
+    for fn in os.listdir(step1_io_dir):
+        match = re.fullmatch(r'TD_of_days_(\d+)\.out', fn)
+        if match:
+            selections[int(match.group(1))] = read_td_of_days(os.path.join(step1_io_dir, fn))
+    return dict(sorted(selections.items()))
+
+
+def reconstruct_series(values: np.ndarray, td_of_days: np.ndarray, correct: bool = True) -> np.ndarray:
+    """
+    Rebuild the hourly series of the year from the typical days
+
+    Parameters
+    ----------
+    values: np.ndarray
+        Original series of shape (8760, nbr_series)
+    td_of_days: np.ndarray
+        Representative day (1 to 365) of each day of the year for one or several selections, of shape (365,) or
+        (nbr_selections, 365)
+    correct: bool (default: True)
+        Whether to scale the reconstructed series to preserve the yearly sum of each series (as in print_12td)
+
+    Returns
+    -------
+    np.ndarray
+        Reconstructed series of shape (8760, nbr_series) or (nbr_selections, 8760, nbr_series)
+    """
+    days = values.reshape(365, 24, -1)
+    rec = days[td_of_days - 1]
+    if correct:
+        norm = days.sum(axis=(0, 1))
+        norm_td = rec.sum(axis=(-3, -2), keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rec = rec * np.where(norm_td > 0, norm / norm_td, 0.)
+    return rec.reshape(td_of_days.shape[:-1] + (8760, values.shape[1]))
+
+
+def _get_metrics(original: np.ndarray, rec: np.ndarray) -> Dict[str, np.ndarray]:
+    """Compute the metrics (arrays of shape (nbr_selections, nbr_series)) of a stack of reconstructions"""
+    scale = np.abs(original).max(axis=0)
+    scale = np.where(scale > 0, scale, 1.)
+
+    def rmse(a, b):
+        return np.sqrt(((a - b) ** 2).mean(axis=-2)) / scale
+
+    ramps = np.diff(original, axis=0)
+    rec_ramps = np.diff(rec, axis=-2)
+    # Duration curves are sorted in ascending order, which does not change the errors
+    with np.errstate(divide='ignore', invalid='ignore'):
+        peak_factor = np.where(rec.max(axis=-2) > 0, original.max(axis=0) / rec.max(axis=-2), 1.)
+        max_ramp = np.abs(ramps).max(axis=0)
+        max_ramp_ratio = np.where(max_ramp > 0, np.abs(rec_ramps).max(axis=-2) / max_ramp, 1.)
+    return {'rmse': rmse(rec, original),
+            'duration_curve_error': rmse(np.sort(rec, axis=-2), np.sort(original, axis=0)),
+            'peak_factor': peak_factor,
+            'ramp_error': rmse(np.sort(rec_ramps, axis=-2), np.sort(ramps, axis=0)),
+            'max_ramp_ratio': max_ramp_ratio}
+
+
+def evaluate_td_selections(time_series: pd.DataFrame, selections: Dict[int, np.ndarray], correct: bool = True,
+                           batch_size: int = 16) -> pd.DataFrame:
+    """
+    Compute the quality metrics (see TD_METRICS) of several selections of typical days
+
+    Parameters
+    ----------
+    time_series: pd.DataFrame
+        Hourly time series (8760 rows, one column per series), e.g. as in Time_series.csv
+    selections: Dict[int, np.ndarray]
+        Representative day of each day of the year (365 values) for each selection, indexed by a label (e.g. the
+        number of TDs, see read_td_of_days_dir)
+    correct: bool (default: True)
+        Whether to scale the reconstructed series to preserve the yearly sum of each series (as in print_12td)
+    batch_size: int (default: 16)
+        Number of selections evaluated at once (limits the memory usage)
+
+    Returns
+    -------
+    pd.DataFrame
+        Metrics (columns) for each selection and each series (index levels 'Nbr_TD' and 'Series')
+    """
+    original = time_series.values.astype(float)
+    assert original.shape[0] == 8760, 'Error: the time series must have 8760 rows.'
+    labels = list(selections.keys())
+    tds = np.array([np.asarray(selections[label], dtype=int) for label in labels])
+    assert tds.ndim == 2 and tds.shape[1] == 365, 'Error: each selection must give the typical day of 365 days.'
+
+    metrics = {metric: [] for metric in TD_METRICS}
+    for start in range(0, len(labels), batch_size):
+        batch_metrics = _get_metrics(original, reconstruct_series(original, tds[start:start + batch_size], correct))
+        for metric in TD_METRICS:
+            metrics[metric].append(batch_metrics[metric])
+
+    index = pd.MultiIndex.from_product([labels, time_series.columns], names=['Nbr_TD', 'Series'])
+    return pd.DataFrame({metric: np.concatenate(values).ravel() for metric, values in metrics.items()}, index=index)
+
+
+def get_convergence_report(metrics: pd.DataFrame, budget: Dict[str, float] = None,
+                           series: List[str] = None) -> pd.DataFrame:
+    """
+    Summarize the metrics of each selection by their worst value over the series
+
+    Parameters
+    ----------
+    metrics: pd.DataFrame
+        Metrics as returned by evaluate_td_selections
+    budget: Dict[str, float] (default: None)
+        Maximum error allowed for some metrics. For 'peak_factor' and 'max_ramp_ratio', the error is the distance to 1.
+    series: List[str] (default: None)
+        Series taken into account (all by default)
+
+    Returns
+    -------
+    pd.DataFrame
+        Worst error of each metric (columns) for each selection (index), and if a budget is given, a column
+        'within_budget' telling whether all the errors are below the budget
+    """
+    if series is not None:
+        metrics = metrics[metrics.index.get_level_values('Series').isin(series)]
+    errors = metrics.copy()
+    for metric in ['peak_factor', 'max_ramp_ratio']:
+        errors[metric] = (errors[metric] - 1).abs()
+    report = errors.groupby(level='Nbr_TD').max()
+    if budget is not None:
+        assert set(budget.keys()).issubset(TD_METRICS), f"Error: the budget can only be given for {TD_METRICS}."
+        report['within_budget'] = (report[list(budget.keys())] <= pd.Series(budget)).all(axis=1)
+    return report
+
+
+def select_nbr_td(time_series: pd.DataFrame, selections: Dict[int, np.ndarray], budget: Dict[str, float],
+                  series: List[str] = None, report_path: str = None) -> int:
+    """
+    Return the smallest number of typical days whose selection meets the error budget
+
+    Parameters
+    ----------
+    time_series: pd.DataFrame
+        Hourly time series (8760 rows, one column per series)
+    selections: Dict[int, np.ndarray]
+        Representative day of each day of the year for each number of typical days
+    budget: Dict[str, float]
+        Maximum error allowed for some metrics (see get_convergence_report)
+    series: List[str] (default: None)
+        Series taken into account (all by default)
+    report_path: str (default: None)
+        If given, path to a csv file where the convergence report is saved
+
+    Returns
+    -------
+    int
+        Number of typical days (None if no selection meets the budget)
+    """
+    report = get_convergence_report(evaluate_td_selections(time_series, selections), budget, series)
+    if report_path is not None:
+        report.round(6).to_csv(report_path)
+    valid = report.index[report['within_budget']]
+    if len(valid) == 0:
+        logging.warning('No selection of typical days meets the error budget')
+        return None
+    logging.info(f"Smallest number of typical days meeting the error budget: {min(valid)}")
+    return int(min(valid))
@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains the translator backends used to build, solve and query the optimization problems
+
+The default backend ('amplpy') creates an amplpy.AMPL object. The 'replay' backend mimics the part of the amplpy.AMPL
+interface used by EnergyScope and serves previously recorded variables, parameters and sets (e.g. the pickles or the
+csv files saved by a real run, or a synthetic case). It allows to run the whole Python pipeline without AMPL.
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+
+class ReplayDataFrame:
+    """Minimal equivalent of amplpy.DataFrame built on a pandas.DataFrame"""
+
+    def __init__(self, df: pd.DataFrame):
+        self._df = df
+
+    def getHeaders(self) -> Tuple[str]:
+        return tuple(self._df.columns)
+
+    def getColumn(self, header: str) -> List:
+        return self._df[header].tolist()
+
+    def getNumRows(self) -> int:
+        return len(self._df)
+
+    def toPandas(self) -> pd.DataFrame:
+        return self._df.copy()
+
+
+class ReplayEntity:
+    """Recorded variable, parameter or constraint (with optionally recorded suffixes, e.g. 'rc' or 'dual')"""
+
+    def __init__(self, name: str, values: pd.DataFrame, suffixes: Dict[str, pd.DataFrame] = None):
+        self.name = name
+        self._values = values
+        self._suffixes = {key: df for key, df in (suffixes or dict()).items() if df is not None}
+
+    def getValues(self, suffixes: List[str] = None) -> ReplayDataFrame:
+        if suffixes is None:
+            return ReplayDataFrame(self._values)
+        assert len(suffixes) == 1 and suffixes[0] in self._suffixes, \
+            f"Error: suffix {suffixes} of {self.name} was not recorded."
+        return ReplayDataFrame(self._suffixes[suffixes[0]])
+
+    def value(self) -> float:
+        return float(self._values.iloc[0, -1])
+
+    def setValue(self, value: float) -> None:
+        self._values = pd.DataFrame({self._values.columns[-1]: [float(value)]})
+
+    def setValues(self, data: pd.DataFrame) -> None:
+        values = data.reset_index()
+        values.columns = self._values.columns
+        self._values = values
+
+
+class ReplaySetInstance:
+    """Recorded set (or instance of an indexed set)"""
+
+    def __init__(self, values: List):
+        self._values = list(values)
+
+    def toList(self) -> List:
+        return list(self._values)
+
+    def getValues(self) -> 'ReplaySetInstance':
+        return self
+
+    def size(self) -> int:
+        return len(self._values)
+
+
+class ReplaySet(ReplaySetInstance):
+    """Recorded set, indexed (values given as a dictionary of lists) or not (values given as a list)"""
+
+    def __init__(self, name: str, values):
+        self.name = name
+        self._indexed = isinstance(values, dict)
+        super().__init__([] if self._indexed else values)
+        self._instances = [(key, ReplaySetInstance(val)) for key, val in values.items()] if self._indexed \
+            else [(None, self)]
+
+    def instances(self) -> List[Tuple]:
+        return self._instances
+
+
+class ReplayAMPL:
+    """
+    Stand-in for amplpy.AMPL serving recorded results, parameters and sets
+
+    Models and data files are not read and solve does not do anything: after 'solving', the recorded entities are
+    returned by getVariables, getParameters and getSets, in the format expected by energyscope.amplpy_aux.
+
+    Parameters
+    ----------
+    results: Dict[str, pd.DataFrame]
+        Dictionary containing for each variable its values as a 'long' DataFrame
+    parameters: Dict[str, pd.DataFrame]
+        Dictionary containing for each parameter its values as a 'long' DataFrame
+    sets: Dict
+        Dictionary containing all the sets and subsets
+    duals: Dict[str, pd.DataFrame] (default: None)
+        Dictionary containing for each constraint its dual values as a 'long' DataFrame
+    reduced_costs: Dict[str, pd.DataFrame] (default: None)
+        Dictionary containing for each variable its reduced costs as a 'long' DataFrame
+    solver_log: str (default: None)
+        Path to a recorded output of the solver, passed line by line to the output handler by solve (or solveAsync,
+        the replay being stopped by interrupt)
+    """
+
+    def __init__(self, results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame], sets: Dict,
+                 duals: Dict[str, pd.DataFrame] = None, reduced_costs: Dict[str, pd.DataFrame] = None,
+                 solver_log: str = None):
+        self._results = results
+        self._parameters = parameters
+        self._sets = sets
+        self._duals = duals or dict()
+        self._reduced_costs = reduced_costs or dict()
+        self._options = dict()
+        self._output_handler = None
+        self.solver_log = solver_log
+        self.models = list()
+        self.data = list()
+        self.solved = False
+        self._interrupted = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, replay_dir: str) -> 'ReplayAMPL':
+        """
+        Load the recorded entities of a previous run
+
+        Parameters
+        ----------
+        replay_dir: str
+            Path to the output directory of a run containing either the pickles saved by run_step2_new
+            (results.pickle, parameters.pickle and sets.pickle, and optionally duals.pickle and reduced_costs.pickle)
+            or the csv files of each entity (results/<name>.csv, parameters/<name>.csv and sets/sets.json)
+        """
+        if os.path.isfile(f"{replay_dir}/results.pickle"):
+            content = []
+            for name in ['results', 'parameters', 'sets', 'duals', 'reduced_costs']:
+                if not os.path.isfile(f"{replay_dir}/{name}.pickle"):
+                    content.append(None)
+                    continue
+                with open(f"{replay_dir}/{name}.pickle", 'rb') as handle:
+                    content.append(pickle.load(handle))
+            return cls(*content)
+
+        assert os.path.isdir(f"{replay_dir}/results"), f"Error: no recorded results found in {replay_dir}."
+        results = {fn[:-4]: pd.read_csv(f"{replay_dir}/results/{fn}", index_col=0)
+                   for fn in os.listdir(f"{replay_dir}/results") if fn.endswith('.csv')}
+        parameters = {fn[:-4]: pd.read_csv(f"{replay_dir}/parameters/{fn}", index_col=0)
+                      for fn in os.listdir(f"{replay_dir}/parameters") if fn.endswith('.csv')}
+        with open(f"{replay_dir}/sets/sets.json", 'r') as handle:
+            sets = json.load(handle)
+        return cls(results, parameters, sets)
+
+    def setOption(self, name: str, value) -> None:
+        self._options[name] = value
+
+    def getOption(self, name: str):
+        return self._options.get(name)
+
+    def read(self, model_fn: str) -> None:
+        self.models.append(model_fn)
+
+    def readData(self, data_fn: str) -> None:
+        self.data.append(data_fn)
+
+    def eval(self, statements: str) -> None:
+        pass
+
+    def setOutputHandler(self, output_handler) -> None:
+        self._output_handler = output_handler
+
+    def getOutputHandler(self):
+        return self._output_handler
+
+    def solve(self) -> None:
+        logging.info('Replaying recorded results (no optimization is performed)')
+        if self.solver_log is not None and self._output_handler is not None:
+            with open(self.solver_log, 'r') as file:
+                for line in file:
+                    if self._interrupted:
+                        break
+                    self._output_handler.output(0, line)
+        self.solved = True
+
+    def solveAsync(self, callback=None) -> None:
+        # Same behaviour as amplpy: solve in a thread holding the lock of the translator, then call callback.run
+        def _solve():
+            with self._lock:
+                self.solve()
+            if callback is not None:
+                callback.run()
+
+        self._interrupted = False
+        threading.Thread(target=_solve, daemon=True).start()
+
+    def isBusy(self) -> bool:
+        return self._lock.locked()
+
+    def wait(self) -> None:
+        with self._lock:
+            pass
+
+    def interrupt(self) -> None:
+        self._interrupted = True
+
+    def getVariables(self) -> List[Tuple[str, ReplayEntity]]:
+        return [(name, self.getVariable(name)) for name in self._results]
+
+    def getVariable(self, name: str) -> ReplayEntity:
+        return ReplayEntity(name, self._results[name], {'rc': self._reduced_costs.get(name)})
+
+    def getConstraints(self) -> List[Tuple[str, ReplayEntity]]:
+        return [(name, self.getConstraint(name)) for name in self._duals]
+
+    def getConstraint(self, name: str) -> ReplayEntity:
+        return ReplayEntity(name, self._duals[name], {'dual': self._duals[name]})
+
+    def getParameters(self) -> List[Tuple[str, ReplayEntity]]:
+        return [(name, ReplayEntity(name, values)) for name, values in self._parameters.items()]
+
+    def getParameter(self, name: str) -> ReplayEntity:
+        return ReplayEntity(name, self._parameters[name])
+
+    def getValue(self, scalar_expression: str):
+        # Only the solve status can be queried, the recorded results being considered as optimal
+        assert scalar_expression == 'solve_result', "Error: the replay backend can only evaluate 'solve_result'."
+        return 'solved' if self.solved else 'unsolved'
+
+    def getSets(self) -> List[Tuple[str, ReplaySet]]:
+        return [(name, ReplaySet(name, values)) for name, values in self._sets.items()]
+
+    def getSet(self, name: str) -> ReplaySet:
+        return ReplaySet(name, self._sets[name])
+
+    def close(self) -> None:
+        pass
+
+
+def create_amplpy_translator(ampl_path: str):
+    """Create an amplpy.AMPL object using the AMPL installation in ampl_path"""
+    import amplpy
+    return amplpy.AMPL(environment=amplpy.Environment(ampl_path))
+
+
+def create_replay_translator(ampl_path: str, replay_dir: str = None, results: Dict = None,
+                             parameters: Dict = None, sets: Dict = None, duals: Dict = None,
+                             reduced_costs: Dict = None, solver_log: str = None) -> ReplayAMPL:
+    """
+    Create a ReplayAMPL object from a directory (replay_dir) or from dictionaries (ampl_path is ignored), replaying the
+    recorded output of the solver (solver_log) if given
+    """
+    if replay_dir is not None:
+        ampl_trans = ReplayAMPL.from_directory(replay_dir)
+        ampl_trans.solver_log = solver_log
+        return ampl_trans
+    assert results is not None and parameters is not None and sets is not None, \
+        "Error: either replay_dir or results, parameters and sets must be given to the replay backend."
+    return ReplayAMPL(results, parameters, sets, duals, reduced_costs, solver_log)
+
+
+# Available backends, new ones can be added with register_backend
+BACKENDS = {'amplpy': create_amplpy_translator,
+            'replay': create_replay_translator}
+
+
+def register_backend(name: str, factory: Callable) -> None:
+    """
+    Add a translator backend
+
+    Parameters
+    ----------
+    name: str
+        Name of the backend
+    factory: Callable
+        Function taking the AMPL path as first argument (and any backend option as keyword arguments) and returning
+        an object with the same interface as amplpy.AMPL
+    """
+    BACKENDS[name] = factory
+
+
+def create_translator(ampl_path: str, backend: str = 'amplpy', backend_options: Dict = None):
+    """
+    Create a translator
+
+    Parameters
+    ----------
+    ampl_path: str
+        Path to AMPL
+    backend: str (default: 'amplpy')
+        Name of the backend (see BACKENDS)
+    backend_options: Dict (default: None)
+        Keyword arguments passed to the backend factory (e.g. {'replay_dir': ...} for the 'replay' backend)
+
+    Returns
+    -------
+    Object with the same interface as amplpy.AMPL
+    """
+    assert backend in BACKENDS, f"Error: backend must be one of {list(BACKENDS.keys())}."
+    return BACKENDS[backend](ampl_path, **(backend_options or dict()))
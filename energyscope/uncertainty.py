@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to perform Monte Carlo uncertainty analyses with ESTD STEP 2
+
+Uncertain parameters are described by dictionaries (which can be loaded from the yaml configuration file), e.g.
+    uncertain_params = {
+        'c_op_gas': {'data': 'Resources', 'index': ['GAS', 'GAS_RE'], 'column': 'c_op',
+                     'distribution': 'uniform', 'low': 0.8, 'high': 1.2},
+        'c_inv_pv': {'data': 'Technologies', 'index': 'PV', 'column': 'c_inv',
+                     'distribution': 'normal', 'mean': 1., 'std': 0.1},
+        'elec_demand': {'data': 'Demand', 'index': 'ELECTRICITY', 'column': ['HOUSEHOLDS', 'SERVICES', 'INDUSTRY'],
+                        'distribution': 'triangular', 'low': 0.9, 'mode': 1., 'high': 1.2}
+    }
+where 'data' is a key of the dictionary returned by import_data and 'index' and 'column' select the values of this
+DataFrame affected by the parameter. By default ('relative': True), the sampled value multiplies the base values,
+otherwise ('relative': False) it replaces them.
+
+The base data is shared by the worker processes (see shared_data.SharedDataset). Each sample is run in a worker process
+and only its key outputs (objectives and installed capacities) are sent back
+and appended to an on-disk accumulator (one json line per sample), so that the memory use does not grow with the number
+of samples.
+"""
+import json
+import logging
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import NormalDist
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from energyscope.shared_data import SharedDataset
+from energyscope.step2_main import run_step2_new
+from energyscope.run_dirs import clean_partial_runs
+from energyscope.run_catalog import get_run_inputs
+from energyscope.step2_print_data import print_estd
+from energyscope.validation import check_data
+
+# Base data of the worker processes (set once per process by _init_worker)
+_worker_data = None
+
+
+def get_uniform_samples(nbr_samples: int, nbr_dims: int, method: str = 'lhs', seed: int = 0) -> np.ndarray:
+    """
+    Sample the unit hypercube
+
+    Parameters
+    ----------
+    nbr_samples: int
+        Number of samples
+    nbr_dims: int
+        Number of dimensions
+    method: str (default: 'lhs')
+        'random' (Monte Carlo), 'lhs' (Latin hypercube) or 'sobol' (scrambled Sobol sequence, requires scipy)
+    seed: int (default: 0)
+        Seed of the random number generator
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (nbr_samples, nbr_dims) with values in [0, 1)
+    """
+    accepted_methods = ['random', 'lhs', 'sobol']
+    assert method in accepted_methods, f'Error: method must be one of {accepted_methods}.'
+
+    rng = np.random.default_rng(seed)
+    if method == 'random':
+        return rng.random((nbr_samples, nbr_dims))
+    if method == 'lhs':
+        # One sample in each of the nbr_samples strata of each dimension, strata randomly paired across dimensions
+        strata = np.argsort(rng.random((nbr_samples, nbr_dims)), axis=0)
+        return (strata + rng.random((nbr_samples, nbr_dims))) / nbr_samples
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        raise ImportError("Sobol sampling requires scipy. Use method='lhs' or install scipy.")
+    return qmc.Sobol(d=nbr_dims, scramble=True, seed=seed).random(nbr_samples)
+
+
+def inverse_cdf(u: np.ndarray, spec: Dict) -> np.ndarray:
+    """
+    Transform uniform samples into samples of the distribution described in spec
+
+    Accepted distributions: 'uniform' (low, high), 'normal' (mean, std), 'lognormal' (mean and sigma of the
+    underlying normal distribution) and 'triangular' (low, mode, high)
+    """
+    distribution = spec.get('distribution', 'uniform')
+    u = np.clip(u, 1e-12, 1 - 1e-12)
+    if distribution == 'uniform':
+        return spec['low'] + u * (spec['high'] - spec['low'])
+    if distribution == 'normal':
+        return np.vectorize(NormalDist(spec['mean'], spec['std']).inv_cdf)(u)
+    if distribution == 'lognormal':
+        return np.exp(np.vectorize(NormalDist(spec['mean'], spec['sigma']).inv_cdf)(u))
+    if distribution == 'triangular':
+        low, mode, high = spec['low'], spec['mode'], spec['high']
+        threshold = (mode - low) / (high - low)
+        return np.where(u < threshold,
+                        low + np.sqrt(u * (high - low) * (mode - low)),
+                        high - np.sqrt((1 - u) * (high - low) * (high - mode)))
+    raise ValueError(f"Error: unknown distribution {distribution}.")
+
+
+def sample_parameters(uncertain_params: Dict[str, Dict], nbr_samples: int, method: str = 'lhs',
+                      seed: int = 0) -> pd.DataFrame:
+    """
+    Sample the uncertain parameters
+
+    Parameters
+    ----------
+    uncertain_params: Dict[str, Dict]
+        Description of the uncertain parameters (see module documentation)
+    nbr_samples: int
+        Number of samples
+    method: str (default: 'lhs')
+        Sampling method ('random', 'lhs' or 'sobol')
+    seed: int (default: 0)
+        Seed of the random number generator
+
+    Returns
+    -------
+    pd.DataFrame
+        DataFrame with one row per sample and one column per uncertain parameter
+    """
+    names = list(uncertain_params.keys())
+    u = get_uniform_samples(nbr_samples, len(names), method, seed)
+    samples = pd.DataFrame({name: inverse_cdf(u[:, i], uncertain_params[name]) for i, name in enumerate(names)})
+    samples.index.name = 'sample'
+    return samples
+
+
+def apply_sample(data: Dict[str, pd.DataFrame], uncertain_params: Dict[str, Dict],
+                 sample: pd.Series) -> Dict[str, pd.DataFrame]:
+    """
+    Return a copy of data where the values of the uncertain parameters are set to those of a sample
+
+    Only the modified DataFrames are copied, the other ones are shared with data.
+    """
+    modified_data = dict(data)
+    for key in set(spec['data'] for spec in uncertain_params.values()):
+        modified_data[key] = data[key].copy()
+    for name, spec in uncertain_params.items():
+        df = modified_data[spec['data']]
+        # Lists of labels to always get a DataFrame (values are read as strings by import_data for some tables)
+        rows = spec['index'] if isinstance(spec['index'], list) else [spec['index']]
+        cols = spec['column'] if isinstance(spec['column'], list) else [spec['column']]
+        if spec.get('relative', True):
+            df.loc[rows, cols] = df.loc[rows, cols].astype(float) * sample[name]
+        else:
+            df.loc[rows, cols] = sample[name]
+    return modified_data
+
+
+class StreamingAccumulator:
+    """
+    On-disk accumulator of the key outputs of each sample with running statistics
+
+    Each sample is appended as a json line to accumulator_fn. The running mean, standard deviation, minimum and maximum
+    of each numerical output are updated with Welford's algorithm; the values of each output are also kept in memory to
+    compute the quantiles on demand, without reading the file again.
+    The failed samples are recorded in failed (with their status) but not in done, so that they are run again when an
+    analysis is resumed.
+    """
+
+    def __init__(self, accumulator_fn: str):
+        self.accumulator_fn = accumulator_fn
+        self.count = dict()
+        self.mean = dict()
+        self.m2 = dict()
+        self.min = dict()
+        self.max = dict()
+        self.done = set()
+        self.failed = dict()
+        # Values of each output by sample and last row of each sample (flattened, see load)
+        self.values = dict()
+        self.rows = dict()
+        # Reload samples from a previous (possibly interrupted) analysis
+        if os.path.isfile(accumulator_fn):
+            with open(accumulator_fn, 'r') as handle:
+                for line in handle:
+                    self._update(json.loads(line))
+
+    def _update(self, row: Dict) -> None:
+        self.rows[row['sample']] = {'status': row['status'], **row['inputs'], **row['outputs']}
+        if row['status'] != 'ok':
+            self.failed[row['sample']] = row['status']
+            return
+        self.done.add(row['sample'])
+        self.failed.pop(row['sample'], None)
+        for key, value in row.get('outputs', dict()).items():
+            if value is None or not np.isfinite(value):
+                continue
+            n = self.count.get(key, 0) + 1
+            delta = value - self.mean.get(key, 0.)
+            self.count[key] = n
+            self.mean[key] = self.mean.get(key, 0.) + delta / n
+            self.m2[key] = self.m2.get(key, 0.) + delta * (value - self.mean[key])
+            self.min[key] = min(self.min.get(key, value), value)
+            self.max[key] = max(self.max.get(key, value), value)
+            self.values.setdefault(key, dict())[row['sample']] = value
+
+    def add(self, row: Dict) -> None:
+        """Append a sample (dictionary with keys 'sample', 'status', 'inputs' and 'outputs')"""
+        with open(self.accumulator_fn, 'a') as handle:
+            handle.write(json.dumps(row) + '\n')
+        self._update(row)
+
+    def statistics(self) -> pd.DataFrame:
+        """Running statistics of each output"""
+        stats = pd.DataFrame({'count': self.count, 'mean': self.mean, 'min': self.min, 'max': self.max})
+        stats['std'] = pd.Series({key: np.sqrt(m2 / (self.count[key] - 1)) if self.count[key] > 1 else 0.
+                                  for key, m2 in self.m2.items()})
+        return stats
+
+    def load(self) -> pd.DataFrame:
+        """
+        Load all the samples as a DataFrame with a column per input and output (last run of the samples run again)
+        """
+        df = pd.DataFrame([{'sample': sample, **row} for sample, row in self.rows.items()]).set_index('sample')
+        return df.sort_index()
+
+    def quantiles(self, q: List[float], outputs: List[str] = None) -> pd.DataFrame:
+        """Quantiles of the outputs of all the samples completed so far"""
+        outputs = list(self.count.keys()) if outputs is None else outputs
+        return pd.DataFrame({key: np.quantile(list(self.values[key].values()), q) for key in outputs}, index=q).T
+
+
+def _init_worker(dataset: SharedDataset) -> None:
+    global _worker_data
+    _worker_data, _ = dataset.attach()
+
+
+def run_sample(sample_id: int, sample: pd.Series, uncertain_params: Dict[str, Dict], system_limits: Dict,
+               td_data_fn: str, case_studies_dir: str, ampl_path: str, solver_options: Dict, model_fns: List[str],
+               temp_dir: str, keep_case_studies: bool = True, run_kwargs: Dict = None) -> Dict:
+    """
+    Run ESTD STEP 2 for one sample and return its key outputs (executed in the worker processes)
+
+    The key outputs are the summary returned by run_step2_new: with the 'minimal' output profile (default if the case
+    studies are not kept), nothing is written in the case study directory. The data of the sample is checked first (see
+    validation.check_data): an inconsistent sample fails without being solved.
+    """
+    row = {'sample': int(sample_id), 'inputs': {k: float(v) for k, v in sample.items()}, 'outputs': dict()}
+    sample_temp_dir = f"{temp_dir}/sample_{sample_id}"
+    case_study_dir = f"{case_studies_dir}/sample_{sample_id}"
+    try:
+        os.makedirs(sample_temp_dir, exist_ok=True)
+        data = apply_sample(_worker_data, uncertain_params, sample)
+        # Inconsistent samples fail before being translated and solved
+        check_data(data, system_limits)
+        estd_path = f"{sample_temp_dir}/ESTD_data.dat"
+        print_estd(estd_path, data, system_limits)
+        # A sample published but not recorded in the accumulator (interrupted run) is run again
+        run_kwargs = {'output_profile': 'full_hourly' if keep_case_studies else 'minimal', 'overwrite': True,
+                      **(run_kwargs or dict())}
+        inputs = {**get_run_inputs(system_limits), **row['inputs']}
+        row['outputs'] = run_step2_new(case_study_dir, ampl_path, solver_options, model_fns,
+                                       [estd_path, td_data_fn], sample_temp_dir, inputs=inputs, **run_kwargs)
+        row['status'] = 'ok'
+    except Exception as e:
+        logging.error(f"Sample {sample_id} failed: {e}")
+        row['status'] = f"failed: {e}"
+    finally:
+        shutil.rmtree(sample_temp_dir, ignore_errors=True)
+        if not keep_case_studies:
+            shutil.rmtree(case_study_dir, ignore_errors=True)
+    return row
+
+
+def run_monte_carlo(data: Dict[str, pd.DataFrame], uncertain_params: Dict[str, Dict], nbr_samples: int,
+                    system_limits: Dict, td_data_fn: str, case_studies_dir: str, ampl_path: str,
+                    solver_options: Dict, model_fns: List[str], temp_dir: str, method: str = 'lhs', seed: int = 0,
+                    nbr_workers: int = None, keep_case_studies: bool = False,
+                    report_every: int = 10, quantiles: List[float] = (0.05, 0.5, 0.95),
+                    run_kwargs: Dict = None, storage: str = 'memmap') -> StreamingAccumulator:
+    """
+    Run a Monte Carlo uncertainty analysis of ESTD STEP 2
+
+    The samples already completed in the accumulator ({case_studies_dir}/accumulator.jsonl) are skipped, which allows
+    to resume an interrupted analysis (the failed samples are run again).
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Base data as returned by import_data, checked before running the samples (see validation.check_data)
+    uncertain_params: Dict[str, Dict]
+        Description of the uncertain parameters (see module documentation)
+    nbr_samples: int
+        Number of samples
+    system_limits: Dict
+        System limits passed to print_estd
+    td_data_fn: str
+        Path to the ESTD_12TD.dat file (shared by all samples, see print_12td)
+    case_studies_dir: str
+        Directory where the case study of each sample and the accumulator are saved
+    ampl_path: str
+        Path to AMPL
+    solver_options: Dict
+        Solver name and solver options
+    model_fns: List[str]
+        Paths to the model files
+    temp_dir: str
+        Directory in which temporary directories are created for each sample
+    method: str (default: 'lhs')
+        Sampling method ('random', 'lhs' or 'sobol')
+    seed: int (default: 0)
+        Seed of the random number generator
+    nbr_workers: int (default: None)
+        Number of worker processes (default: number of processors)
+    keep_case_studies: bool (default: False)
+        Whether to keep the full output directory of each sample
+    report_every: int (default: 10)
+        Number of samples between two reports of the running statistics in the log
+    quantiles: List[float] (default: (0.05, 0.5, 0.95))
+        Quantiles reported in the log
+    run_kwargs: Dict (default: None)
+        Additional arguments of run_step2_new (e.g. backend and backend_options, or run_catalog to register the samples
+        with their system limits and sampled values as inputs)
+    storage: str (default: 'memmap')
+        Storage of the base data shared by the workers (see shared_data.SharedDataset.create)
+
+    Returns
+    -------
+    StreamingAccumulator
+        Accumulator containing the outputs of all samples
+    """
+    os.makedirs(case_studies_dir, exist_ok=True)
+    clean_partial_runs(case_studies_dir)
+    check_data(data, system_limits)
+    samples = sample_parameters(uncertain_params, nbr_samples, method, seed)
+    samples.to_csv(f"{case_studies_dir}/samples.csv")
+    accumulator = StreamingAccumulator(f"{case_studies_dir}/accumulator.jsonl")
+    todo = [i for i in samples.index if i not in accumulator.done]
+    logging.info(f"Running {len(todo)} samples ({nbr_samples - len(todo)} already done, "
+                 f"{len(accumulator.failed)} failed before)")
+
+    # The time series are not needed by print_estd and are not shared with the workers
+    base_data = {key: df for key, df in data.items() if key != 'Time_series'}
+    os.makedirs(temp_dir, exist_ok=True)
+    with SharedDataset.create(base_data, storage=storage, memmap_fn=f"{temp_dir}/base_data.bin") as dataset, \
+            ProcessPoolExecutor(max_workers=nbr_workers, initializer=_init_worker, initargs=(dataset,)) as executor:
+        futures = [executor.submit(run_sample, i, samples.loc[i], uncertain_params, system_limits, td_data_fn,
+                                   case_studies_dir, ampl_path, solver_options, model_fns, temp_dir,
+                                   keep_case_studies, run_kwargs)
+                   for i in todo]
+        for nb_done, future in enumerate(as_completed(futures), start=1):
+            accumulator.add(future.result())
+            if nb_done % report_every == 0 or nb_done == len(todo):
+                report_statistics(accumulator, list(quantiles))
+
+    return accumulator
+
+
+def report_statistics(accumulator: StreamingAccumulator, quantiles: List[float],
+                      outputs: List[str] = ('TotalCost', 'TotalGWP', 'TotalEinv')) -> None:
+    """Report the running statistics and quantiles of some outputs in the log"""
+    outputs = [out for out in outputs if out in accumulator.count]
+    logging.info(f"{len(accumulator.done)} samples completed, {len(accumulator.failed)} failed")
+    if len(outputs) == 0:
+        return
+    report = accumulator.statistics().loc[outputs, ['count', 'mean', 'std']]
+    report = pd.concat((report, accumulator.quantiles(quantiles, outputs)), axis=1)
+    for output, values in report.iterrows():
+        logging.info(f"{output}: " + ", ".join(f"{k}={v:.4g}" for k, v in values.items()))
@@ -8,6 +8,8 @@ import numpy as np
 import pickle
 
 from energyscope.step2_output_generator import time_to_pandas
+from energyscope.metadata import get_registry
+from energyscope.output_formats import read_table
 
 
 # TODO: remove ?
@@ -28,13 +30,8 @@ def get_colors(elements: List[str], element_type: str, user_data_path: str) -> p
     accepted_types = ['resources', 'technologies']
     assert element_type in accepted_types, f'Error: element_type must be one of {accepted_types}.'
 
-    fn = os.path.join(user_data_path, f"aux_{element_type}.csv")
-    colors = pd.read_csv(fn, index_col=0)["Color"]
-
-    for element in elements:
-        assert element in colors.index, f'Error: element {element} has no associated color.'
-
-    return colors.loc[elements]
+    # All the elements without color are reported at once
+    return get_registry(user_data_path).get_colors(elements, element_type)
 
 
 def get_names(elements: List[str], element_type: str, user_data_path: str) -> pd.Series:
@@ -48,13 +45,8 @@ def get_names(elements: List[str], element_type: str, user_data_path: str) -> pd
     accepted_types = ['resources', 'technologies']
     assert element_type in accepted_types, f'Error: element_type must be one of {accepted_types}.'
 
-    fn = os.path.join(user_data_path, f"aux_{element_type}.csv")
-    colors = pd.read_csv(fn, index_col=0)["Name"]
-
-    for element in elements:
-        assert element in colors.index, f'Error: element {element} has no associated name.'
-
-    return colors.loc[elements]
+    # All the elements without name are reported at once
+    return get_registry(user_data_path).get_names(elements, element_type)
 
 
 # TODO: would be cooler to be able to compute it from the inputs directly
@@ -129,7 +121,7 @@ def get_fec_from_sankey(case_study_dir: str, col: str):
     :param col: case study name.
     Return the FEC [TWh] by end use demand: 'Non-energy demand', 'Loss DHN', 'Heat LT DHN', 'Exp & Loss', 'Mob public', 'Heat LT Dec', 'Elec demand', 'Freight', 'Mob priv', 'Heat HT'.
     """
-    df_sankey = pd.read_csv(f"{case_study_dir}/output/sankey/input2sankey.csv", index_col=0, sep=',')
+    df_sankey = read_table(f"{case_study_dir}/output/sankey/input2sankey.csv", index_col=0)
     ef_list = ['Non-energy demand', 'Loss DHN', 'Heat LT DHN', 'Exp & Loss', 'Mob public', 'Heat LT Dec', 'Elec demand',
                'Freight', 'Mob priv', 'Heat HT']
     ef_final_val = []
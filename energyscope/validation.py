@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to check the consistency of the input data before printing ESTD_data.dat and ESTD_12TD.dat, so that
+bad inputs are reported in a few milliseconds instead of after the translation and the solve of the model
+
+Each check is evaluated with vectorized operations on the DataFrames returned by import_data and all the violations
+are gathered in one report (see validate_data), with one row per violation:
+- check: name of the check (see CHECKS);
+- severity: 'error' (the model is infeasible or its data is wrong) or 'warning';
+- table: table of the data (e.g. 'Technologies') or 'system_limits';
+- element, field: row and column of the value in the table (e.g. 'PV', 'f_min');
+- value, limit: value violating the check and the limit it violates (e.g. f_max).
+check_data raises an error listing all the violations of severity 'error'.
+"""
+import logging
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+from energyscope.step2_print_data import EUD_PARAMS, RES_PARAMS, RES_MULT_PARAMS
+
+# Severity and description of each check
+CHECKS = {'non_numeric': ('error', 'missing or non-numeric value'),
+          'negative': ('error', 'negative value'),
+          'above_one': ('error', 'value above 1'),
+          'f_min_above_f_max': ('error', 'f_min above f_max'),
+          'fmin_perc_above_fmax_perc': ('error', 'fmin_perc above fmax_perc'),
+          'demand_above_potential': ('error', 'yearly demand of the end-use category above the maximum production of '
+                                              'its end-use types (resources and technologies at f_max)'),
+          'missing_entity': ('error', 'technology missing in Layers_in_out or in the storage tables'),
+          'unknown_layer': ('error', 'layer of the storage tables missing in Layers_in_out'),
+          'storage_eff_missing': ('error', 'storage efficiency missing on a layer (input without output or output '
+                                           'without input)'),
+          'share_min_above_max': ('error', 'minimum share above maximum share'),
+          'share_ned_sum': ('error', 'shares of the non-energy demand not summing to 1'),
+          'td_number': ('error', 'number of typical days of the STEP 1 output different from nbr_td'),
+          'td_norm_zero': ('error', 'time series null over the typical days but not over the year'),
+          'td_norm': ('error', 'end-use time series not summing to 1 over the year'),
+          'c_p_t_above_one': ('warning', 'capacity factor above 1 after the norm correction of print_12td')}
+REPORT_COLUMNS = ['check', 'severity', 'table', 'element', 'field', 'value', 'limit']
+
+TECH_PARAMS = ['c_inv', 'c_maint', 'gwp_constr', 'einv_constr', 'lifetime', 'c_p', 'fmin_perc', 'fmax_perc', 'f_min',
+               'f_max']
+RES_PARAMS_NUMERIC = ['avail', 'gwp_op', 'c_op', 'einv_op']
+# Category of each end-use demand of the Demand table
+END_USES_INPUT_CATEGORIES = {'ELECTRICITY': 'ELECTRICITY', 'LIGHTING': 'ELECTRICITY', 'HEAT_HIGH_T': 'HEAT_HIGH_T',
+                             'HEAT_LOW_T_SH': 'HEAT_LOW_T', 'HEAT_LOW_T_HW': 'HEAT_LOW_T',
+                             'MOBILITY_PASSENGER': 'MOBILITY_PASSENGER', 'MOBILITY_FREIGHT': 'MOBILITY_FREIGHT',
+                             'NON_ENERGY': 'NON_ENERGY'}
+
+
+def _get_violations(check: str, table: str, values: pd.DataFrame, mask: pd.DataFrame,
+                    limits: Union[pd.DataFrame, float] = np.nan) -> pd.DataFrame:
+    """Return the violations of a check given by a mask over the values of a table (and the limits violated)"""
+    if mask.size == 0:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    stacked = mask.fillna(False).astype(bool).stack()
+    index = stacked.index[stacked.values.astype(bool)]
+    if isinstance(limits, pd.DataFrame):
+        limits = limits.stack(dropna=False).reindex(index).values
+    return pd.DataFrame({'check': check, 'severity': CHECKS[check][0], 'table': table,
+                         'element': index.get_level_values(0), 'field': index.get_level_values(1),
+                         'value': values.stack(dropna=False).reindex(index).values, 'limit': limits},
+                        columns=REPORT_COLUMNS)
+
+
+def _to_numeric(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert the values of a table into floats (NaN for the missing and non-numeric values)"""
+    return df.apply(pd.to_numeric, errors='coerce').astype(float)
+
+
+def check_values(data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Check the numeric values of the tables: missing or non-numeric values, negative values (demands, f_min, f_max,
+    avail, c_p, shares and efficiencies), values above 1 (c_p, fmin_perc, fmax_perc), f_min > f_max and
+    fmin_perc > fmax_perc
+    """
+    demand = data['Demand'].drop(columns=['Category', 'Subcategory', 'Units'])
+    tables = {'Demand': (demand, list(demand.columns), []),
+              'Resources': (data['Resources'][RES_PARAMS_NUMERIC], ['avail'], []),
+              'Technologies': (data['Technologies'][TECH_PARAMS], ['c_p', 'fmin_perc', 'fmax_perc', 'f_min', 'f_max'],
+                               ['c_p', 'fmin_perc', 'fmax_perc']),
+              'Layers_in_out': (data['Layers_in_out'], [], [])}
+    for name in ['Storage_characteristics', 'Storage_eff_in', 'Storage_eff_out']:
+        tables[name] = (data[name], list(data[name].columns), [])
+
+    violations = []
+    for table, (raw, positive, below_one) in tables.items():
+        values = _to_numeric(raw)
+        violations.append(_get_violations('non_numeric', table, raw, values.isna()))
+        violations.append(_get_violations('negative', table, values[positive], values[positive] < 0, 0.))
+        violations.append(_get_violations('above_one', table, values[below_one], values[below_one] > 1, 1.))
+
+    techs = _to_numeric(data['Technologies'][TECH_PARAMS])
+    for check, low, high in [('f_min_above_f_max', 'f_min', 'f_max'),
+                             ('fmin_perc_above_fmax_perc', 'fmin_perc', 'fmax_perc')]:
+        limits = techs[[high]].set_axis([low], axis=1)
+        violations.append(_get_violations(check, 'Technologies', techs[[low]], techs[[low]] > limits, limits))
+    return pd.concat(violations, ignore_index=True)
+
+
+def get_potentials(data: Dict[str, pd.DataFrame], total_time: float = 8760.) -> pd.Series:
+    """
+    Return the maximum yearly production of each layer: sum of the positive outputs of the resources at their
+    availability and of the technologies at f_max (with their capacity factor c_p)
+    """
+    techs = _to_numeric(data['Technologies'][['c_p', 'f_max']])
+    capacities = pd.concat([_to_numeric(data['Resources'][['avail']])['avail'],
+                            techs['f_max'] * techs['c_p'] * total_time])
+    layers_in_out = _to_numeric(data['Layers_in_out'])
+    capacities = capacities[~capacities.index.duplicated()].reindex(layers_in_out.index).fillna(0.).values
+    # Outputs only, without multiplying infinite capacities by the null outputs
+    outputs = np.where(layers_in_out.values > 0, layers_in_out.values, 0.)
+    production = np.where(outputs > 0, outputs * capacities[:, None], 0.)
+    return pd.Series(production.sum(axis=0), index=layers_in_out.columns)
+
+
+def check_potentials(data: Dict[str, pd.DataFrame], total_time: float = 8760.) -> pd.DataFrame:
+    """
+    Check that the yearly demand of each end-use category does not exceed the maximum production of its end-use types
+    (see get_potentials)
+    """
+    demand = _to_numeric(data['Demand'].drop(columns=['Category', 'Subcategory', 'Units'])).sum(axis=1)
+    demand = demand.groupby(demand.index.map(END_USES_INPUT_CATEGORIES)).sum()
+    categories = data['End_uses_categories']
+    potentials = get_potentials(data, total_time).reindex(categories['END_USES_TYPES_OF_CATEGORY']).fillna(0.)
+    potentials = pd.Series(potentials.values, index=categories['END_USES_CATEGORIES'].values).groupby(level=0).sum()
+    potentials = potentials.reindex(demand.index).fillna(0.)
+    values, limits = demand.to_frame('demand'), potentials.to_frame('demand')
+    return _get_violations('demand_above_potential', 'Demand', values, values > limits, limits)
+
+
+def check_storage(data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """
+    Check that each technology is in Layers_in_out or in all the storage tables, that the layers of the storage tables
+    are layers of Layers_in_out and that each layer with an input efficiency has an output efficiency (and vice versa)
+    """
+    storage_tables = ['Storage_eff_in', 'Storage_eff_out', 'Storage_characteristics']
+    techs = data['Technologies'].index
+    storage_tech = data['Storage_eff_in'].index.union(data['Storage_eff_out'].index)
+    is_storage = techs.isin(storage_tech)
+    presence = pd.DataFrame({table: techs.isin(data[table].index) for table in ['Layers_in_out'] + storage_tables},
+                            index=techs)
+    missing = presence.copy()
+    missing['Layers_in_out'] = ~presence['Layers_in_out'] & ~is_storage
+    for table in storage_tables:
+        missing[table] = ~presence[table] & is_storage
+    violations = [_get_violations('missing_entity', 'Technologies', presence, missing)]
+
+    layers = data['Layers_in_out'].columns
+    eff_in, eff_out = _to_numeric(data['Storage_eff_in']), _to_numeric(data['Storage_eff_out'])
+    for table, eff in [('Storage_eff_in', eff_in), ('Storage_eff_out', eff_out)]:
+        unknown = pd.DataFrame(~eff.columns.isin(layers)[None, :] & (eff.fillna(0.) != 0).values,
+                               index=eff.index, columns=eff.columns)
+        violations.append(_get_violations('unknown_layer', table, eff, unknown))
+
+    all_layers = eff_in.columns.union(eff_out.columns)
+    eff_in = eff_in.reindex(index=storage_tech, columns=all_layers)
+    eff_out = eff_out.reindex(index=storage_tech, columns=all_layers)
+    for table, eff, other in [('Storage_eff_in', eff_in, eff_out), ('Storage_eff_out', eff_out, eff_in)]:
+        violations.append(_get_violations('storage_eff_missing', table, eff, (eff > 0) & ~(other > 0), other))
+    return pd.concat(violations, ignore_index=True)
+
+
+def check_system_limits(system_limits: Dict, tol: float = 1e-6) -> pd.DataFrame:
+    """Check the technology shares (minimum below maximum, between 0 and 1) and the shares of the non-energy demand"""
+    shares = pd.Series(system_limits.get('technologie_shares', dict()), dtype=float)
+    bounds = pd.DataFrame({'min': shares[shares.index.str.endswith('_min')].rename(lambda s: s[:-len('_min')]),
+                           'max': shares[shares.index.str.endswith('_max')].rename(lambda s: s[:-len('_max')])})
+    violations = [_get_violations('negative', 'system_limits', bounds, bounds < 0, 0.),
+                  _get_violations('above_one', 'system_limits', bounds, bounds > 1, 1.),
+                  _get_violations('share_min_above_max', 'system_limits', bounds[['min']],
+                                  bounds[['min']] > bounds[['max']].values, bounds[['max']].set_axis(['min'], axis=1))]
+    if 'share_ned' in system_limits:
+        share_ned = pd.DataFrame({'share_ned': [float(np.sum(system_limits['share_ned']))]}, index=['sum'])
+        violations.append(_get_violations('share_ned_sum', 'system_limits', share_ned,
+                                          (share_ned - 1.).abs() > tol, 1.))
+    return pd.concat(violations, ignore_index=True)
+
+
+def check_time_series(time_series: pd.DataFrame, step1_output_path: str = None, nbr_td: int = 12,
+                      tol: float = 1e-2) -> pd.DataFrame:
+    """
+    Check the time series as corrected by print_12td (ts * norm / norm_td): the end-use time series must sum to 1 over
+    the year, the time series must not be null over the typical days only and the capacity factors must not exceed 1
+
+    Parameters
+    ----------
+    time_series: pd.DataFrame
+        Hourly time series of the year (8760 rows)
+    step1_output_path: str (default: None)
+        Path to the output of STEP 1 (typical day of each day of the year), only the yearly sums are checked if None
+    nbr_td: int (default: 12)
+        Number of typical days
+    tol: float (default: 1e-2)
+        Tolerance on the yearly sums of the end-use time series
+    """
+    values = _to_numeric(time_series)
+    norm = values.sum(axis=0)
+    eud = norm.reindex(list(EUD_PARAMS)).to_frame('sum')
+    violations = [_get_violations('td_norm', 'Time_series', eud, (eud - 1.).abs() > tol, 1.)]
+    if step1_output_path is None:
+        return pd.concat(violations, ignore_index=True)
+
+    td_of_days = pd.read_csv(step1_output_path, names=['TD_of_days'])['TD_of_days'].values
+    tds, nbr_days = np.unique(td_of_days, return_counts=True)
+    number = pd.DataFrame({'nbr_td': [len(tds)], 'nbr_days': [len(td_of_days)]}, index=['TD_of_days'])
+    limits = pd.DataFrame({'nbr_td': [nbr_td], 'nbr_days': [365]}, index=['TD_of_days'])
+    violations.append(_get_violations('td_number', 'Time_series', number, number != limits, limits))
+    if len(td_of_days) != 365:
+        return pd.concat(violations, ignore_index=True)
+
+    # Sum of the time series over the typical days weighted by their number of days (norm_td of print_12td)
+    daily = values.values.reshape(365, 24, -1)[tds - 1]
+    norm_td = pd.Series(np.einsum('d,dhk->k', nbr_days, daily), index=values.columns)
+    sums = pd.DataFrame({'norm_td': norm_td, 'norm': norm})
+    violations.append(_get_violations('td_norm_zero', 'Time_series', sums[['norm_td']],
+                                      (sums[['norm_td']] == 0) & (sums[['norm']].values != 0),
+                                      sums[['norm']].set_axis(['norm_td'], axis=1)))
+    cp_cols = [col for col in list(RES_PARAMS) + list(RES_MULT_PARAMS) if col in values.columns]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c_p_t = pd.DataFrame({'max': daily.max(axis=(0, 1)) * norm.values / norm_td.values},
+                             index=values.columns).loc[cp_cols]
+    violations.append(_get_violations('c_p_t_above_one', 'Time_series', c_p_t, c_p_t > 1, 1.))
+    return pd.concat(violations, ignore_index=True)
+
+
+def validate_data(data: Dict[str, pd.DataFrame], system_limits: Dict = None, step1_output_path: str = None,
+                  nbr_td: int = 12, tol: float = 1e-2) -> pd.DataFrame:
+    """
+    Check the input data and return all the violations in one report (see module description)
+
+    Parameters
+    ----------
+    data: Dict[str, pd.DataFrame]
+        Data as returned by import_data (the time series are checked if data contains 'Time_series')
+    system_limits: Dict (default: None)
+        System limits (see print_estd), not checked if None
+    step1_output_path: str (default: None)
+        Path to the output of STEP 1, to check the time series corrected by print_12td
+    nbr_td: int (default: 12)
+        Number of typical days
+    tol: float (default: 1e-2)
+        Tolerance on the yearly sums of the end-use time series
+
+    Returns
+    -------
+    pd.DataFrame
+        Report with one row per violation (empty if the data is consistent)
+    """
+    violations = [check_values(data), check_potentials(data), check_storage(data)]
+    if system_limits is not None:
+        violations.append(check_system_limits(system_limits))
+    if 'Time_series' in data:
+        violations.append(check_time_series(data['Time_series'], step1_output_path, nbr_td, tol))
+    report = pd.concat(violations, ignore_index=True)
+    logging.info(f"Data validation: {(report['severity'] == 'error').sum()} errors, "
+                 f"{(report['severity'] == 'warning').sum()} warnings")
+    return report
+
+
+def format_report(report: pd.DataFrame) -> str:
+    """Return the violations of a report grouped by check, with the description of each check"""
+    lines = []
+    for check, rows in report.groupby('check', sort=False):
+        lines.append(f"{check} ({CHECKS[check][1]}): {len(rows)} violations")
+        lines += [f"    {row.table}[{row.element}, {row.field}] = {row.value} (limit: {row.limit})"
+                  for row in rows.itertuples()]
+    return '\n'.join(lines)
+
+
+def check_data(data: Dict[str, pd.DataFrame], system_limits: Dict = None, step1_output_path: str = None,
+               nbr_td: int = 12, tol: float = 1e-2) -> pd.DataFrame:
+    """
+    Validate the input data (see validate_data), raise an error listing all the violations of severity 'error' and
+    log the warnings
+
+    Returns
+    -------
+    pd.DataFrame
+        Report of the violations (warnings only)
+    """
+    report = validate_data(data, system_limits, step1_output_path, nbr_td, tol)
+    errors = report[report['severity'] == 'error']
+    assert len(errors) == 0, f"Error: the input data is inconsistent.\n{format_report(errors)}"
+    if len(report):
+        logging.warning(f"Data validation warnings:\n{format_report(report)}")
+    return report
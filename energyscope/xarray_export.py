@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Oct 19 2026
+
+Contains functions to export the variables and parameters of an ESTD STEP 2 run as one labelled xarray Dataset, stored
+in NetCDF or Zarr, and to open the datasets of several runs along a 'case' dimension
+
+Each variable or parameter is a data variable whose dimensions are named after the sets indexing it: 'tech', 'resource',
+'entity' (resources and technologies, e.g. F_t), 'layer', 'end_use_type', 'hour', 'typical_day' and 'period'. The
+mapping T_H_TD of the periods of the year to the (hour, typical day) grid is given by the coordinates 'hour_of_period'
+and 'typical_day_of_period' (see select_periods). The values missing in the outputs (e.g. pruned technologies) are NaN.
+
+The hourly variables are chunked by technology (or layer) with all the hours of the year in each chunk, so that the
+hourly profile of one technology can be read lazily from the datasets of many runs without loading them.
+
+xarray is an optional dependency, as well as the NetCDF (netCDF4 or h5netcdf) and Zarr (zarr) backends (see
+requirements-optional.txt).
+"""
+import os
+import pickle
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xarray as xr
+except ImportError:
+    xr = None
+
+from energyscope.amplpy_aux import time_to_pandas
+
+# Dimensions of the variables and parameters extracted by run_step2_new (the others are inferred, see _get_dims)
+VARIABLE_DIMS = {'F': ['tech'], 'F_t': ['entity', 'hour', 'typical_day'], 'F_solar': ['tech'],
+                 'F_t_solar': ['tech', 'hour', 'typical_day'], 'Storage_in': ['tech', 'layer', 'hour', 'typical_day'],
+                 'Storage_out': ['tech', 'layer', 'hour', 'typical_day'], 'Storage_level': ['tech', 'period'],
+                 'End_uses': ['layer', 'hour', 'typical_day'],
+                 'Network_losses': ['end_use_type', 'hour', 'typical_day'],
+                 'C_inv': ['tech'], 'C_maint': ['tech'], 'C_op': ['resource'], 'GWP_constr': ['tech'],
+                 'GWP_op': ['resource'], 'Einv_constr': ['tech'], 'Einv_op': ['resource'],
+                 'avail': ['resource'], 'c_op': ['resource'], 'gwp_op': ['resource'], 'einv_op': ['resource'],
+                 't_op': ['hour', 'typical_day'], 'c_p_t': ['tech', 'hour', 'typical_day'],
+                 'layers_in_out': ['entity', 'layer'], 'storage_eff_in': ['tech', 'layer'],
+                 'storage_eff_out': ['tech', 'layer']}
+# Sets giving the coordinates of each dimension
+DIMENSION_SETS = {'tech': ['TECHNOLOGIES'], 'resource': ['RESOURCES'], 'entity': ['RESOURCES', 'TECHNOLOGIES'],
+                  'layer': ['LAYERS'], 'end_use_type': ['END_USES_TYPES'], 'hour': ['HOURS'],
+                  'typical_day': ['TYPICAL_DAYS'], 'period': ['PERIODS']}
+TIME_DIMS = ['hour', 'typical_day', 'period']
+
+
+def _check_xarray() -> None:
+    if xr is None:
+        raise ImportError("The datasets require xarray. Install it with 'pip install xarray netCDF4' "
+                          "(see requirements-optional.txt).")
+
+
+def _get_dims(name: str, df: pd.DataFrame, coords: Dict[str, pd.Index]) -> List[str]:
+    """
+    Return the dimensions of a 'long' DataFrame: those of VARIABLE_DIMS, or the first dimension of DIMENSION_SETS
+    containing all the values of each index (time dimensions for the trailing numeric indices)
+    """
+    index_cols = list(df.columns[:-1])
+    if name in VARIABLE_DIMS and len(VARIABLE_DIMS[name]) == len(index_cols):
+        return VARIABLE_DIMS[name]
+    numeric = [pd.api.types.is_numeric_dtype(df[col]) for col in index_cols]
+    dims = []
+    for i, col in enumerate(index_cols):
+        if numeric[i]:
+            # Trailing (hour, typical day) pair or period
+            if i == len(index_cols) - 2 and numeric[i + 1]:
+                dims.append('hour')
+            elif i == len(index_cols) - 1 and len(dims) and dims[-1] == 'hour':
+                dims.append('typical_day')
+            else:
+                dims.append('period')
+            continue
+        values = set(df[col])
+        dim = next((dim for dim in ['tech', 'resource', 'entity', 'layer', 'end_use_type']
+                    if values.issubset(coords[dim])), f"{name}_dim{i}")
+        dims.append(dim if dim not in dims else f"{dim}_{i}")
+    return dims
+
+
+def get_dataset(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame], sets: Dict,
+                names: List[str] = None, dtype: str = 'float64'):
+    """
+    Convert the variables and parameters of a run into a labelled xarray Dataset (see module description)
+
+    Parameters
+    ----------
+    results: Dict[str, pd.DataFrame]
+        Dictionary containing for each variable its values as a 'long' DataFrame
+    parameters: Dict[str, pd.DataFrame]
+        Dictionary containing for each parameter its values as a 'long' DataFrame
+    sets: Dict
+        Dictionary containing all the sets and subsets
+    names: List[str] (default: None)
+        Variables and parameters exported (all by default)
+    dtype: str (default: 'float64')
+        Type of the values
+
+    Returns
+    -------
+    xr.Dataset
+        Dataset with one data variable per variable and parameter
+    """
+    _check_xarray()
+    coords = {dim: pd.Index([v for set_name in set_names for v in sets[set_name]], name=dim)
+              for dim, set_names in DIMENSION_SETS.items()}
+    for dim in TIME_DIMS:
+        coords[dim] = coords[dim].astype(int)
+    times = time_to_pandas(sets)
+
+    entities = [(name, df, 'variable') for name, df in results.items()] + \
+               [(name, df, 'parameter') for name, df in parameters.items()]
+    data_vars = dict()
+    for name, df, kind in entities:
+        if names is not None and name not in names:
+            continue
+        assert name not in data_vars, f"Error: {name} is both a variable and a parameter."
+        if df.shape[1] == 1:
+            data_vars[name] = xr.DataArray(np.asarray(df.iloc[0, 0], dtype=dtype), attrs={'kind': kind})
+            continue
+        dims = _get_dims(name, df, coords)
+        index_cols = list(df.columns[:-1])
+        index = [df[col].astype(int) if dim in TIME_DIMS else df[col] for col, dim in zip(index_cols, dims)]
+        values = pd.Series(df[df.columns[-1]].values.astype(dtype), index=pd.MultiIndex.from_arrays(index, names=dims))
+        values = values[~values.index.duplicated()]
+        da = xr.DataArray.from_series(values)
+        # All the elements of the sets, NaN for the missing values
+        da = da.reindex({dim: coords[dim] for dim in dims if dim in coords})
+        da.attrs['kind'] = kind
+        data_vars[name] = da
+
+    ds = xr.Dataset(data_vars)
+    ds = ds.assign_coords(hour_of_period=('period', np.array([h for h, _ in times.values], dtype=int)),
+                          typical_day_of_period=('period', np.array([td for _, td in times.values], dtype=int)))
+    if 'period' not in ds.indexes:
+        ds = ds.assign_coords(period=times.index.astype(int))
+    return ds
+
+
+def select_periods(da, ds):
+    """
+    Expand a data array indexed over (hour, typical_day) to the periods of the year using the T_H_TD mapping of ds
+
+    >>> ds = open_case_studies({'cost': 'cost/output/dataset.nc', 'gwp': 'gwp/output/dataset.nc'})
+    >>> pv_profiles = select_periods(ds['F_t'].sel(entity='PV'), ds)  # dims (case, period)
+    """
+    return da.sel(hour=ds['hour_of_period'], typical_day=ds['typical_day_of_period'])
+
+
+def _get_backend(path: str, engine: str = None) -> str:
+    """Return the backend used to save a dataset, 'zarr' for the paths ending with .zarr"""
+    if path.endswith('.zarr'):
+        try:
+            __import__('zarr')
+        except ImportError:
+            raise ImportError(f"Saving {path} requires zarr. Install it with 'pip install zarr' "
+                              f"(see requirements-optional.txt) or use a .nc path.")
+        return 'zarr'
+    if engine is not None:
+        return engine
+    for engine, module in [('netcdf4', 'netCDF4'), ('h5netcdf', 'h5py')]:
+        try:
+            __import__(module)
+            return engine
+        except ImportError:
+            pass
+    # NetCDF3 without chunking or compression
+    return 'scipy'
+
+
+def get_encoding(ds, backend: str, complevel: int = 4) -> Dict[str, Dict]:
+    """
+    Return the encoding of the data variables: hourly variables chunked by element of their other dimensions, with all
+    the hours in each chunk
+    """
+    encoding = dict()
+    if backend == 'scipy':
+        return encoding
+    for name, da in ds.data_vars.items():
+        if da.ndim == 0:
+            continue
+        has_time = any(dim in TIME_DIMS for dim in da.dims)
+        chunks = tuple(size if dim in TIME_DIMS or not has_time else 1 for dim, size in zip(da.dims, da.shape))
+        if backend == 'zarr':
+            encoding[name] = {'chunks': chunks}
+        else:
+            encoding[name] = {'zlib': True, 'complevel': complevel, 'chunksizes': chunks}
+    return encoding
+
+
+def save_dataset(ds, path: str, engine: str = None) -> None:
+    """
+    Save a dataset in NetCDF, or in Zarr if path ends with '.zarr', with the chunking of get_encoding
+
+    Parameters
+    ----------
+    ds: xr.Dataset
+        Dataset (see get_dataset)
+    path: str
+        Path to the .nc file or .zarr store
+    engine: str (default: None)
+        NetCDF engine ('netcdf4', 'h5netcdf' or 'scipy', without chunking), the first installed by default
+    """
+    _check_xarray()
+    backend = _get_backend(path, engine)
+    encoding = get_encoding(ds, backend)
+    if backend == 'zarr':
+        ds.to_zarr(path, mode='w', encoding=encoding)
+    else:
+        ds.to_netcdf(path, engine=backend, encoding=encoding)
+
+
+def save_dataset_file(results: Dict[str, pd.DataFrame], parameters: Dict[str, pd.DataFrame], sets: Dict,
+                      output_dir: str, file_name: str = 'dataset.nc') -> None:
+    """Save the dataset of a run (see get_dataset) in output_dir"""
+    os.makedirs(output_dir, exist_ok=True)
+    save_dataset(get_dataset(results, parameters, sets), os.path.join(output_dir, file_name))
+
+
+def export_case_study(case_study_dir: str, path: str = None, names: List[str] = None) -> str:
+    """
+    Export the pickled outputs of a case study as a dataset
+
+    Parameters
+    ----------
+    case_study_dir: str
+        Path to the case study directory (containing output/results.pickle, parameters.pickle and sets.pickle)
+    path: str (default: None)
+        Path to the .nc file or .zarr store, <case_study_dir>/output/dataset.nc by default
+    names: List[str] (default: None)
+        Variables and parameters exported (all by default)
+
+    Returns
+    -------
+    str
+        Path to the dataset
+    """
+    entities = []
+    for entity in ['results', 'parameters', 'sets']:
+        with open(f"{case_study_dir}/output/{entity}.pickle", 'rb') as handle:
+            entities.append(pickle.load(handle))
+    path = f"{case_study_dir}/output/dataset.nc" if path is None else path
+    ds = get_dataset(*entities, names=names)
+    ds.attrs['case_study'] = os.path.basename(os.path.normpath(case_study_dir))
+    save_dataset(ds, path)
+    return path
+
+
+def open_case_studies(paths: Union[Dict[str, str], List[str]], chunks: Dict = None):
+    """
+    Open the datasets of several runs lazily and concatenate them along a 'case' dimension
+
+    Parameters
+    ----------
+    paths: Union[Dict[str, str], List[str]]
+        Path to the dataset of each case (.nc or .zarr), as a dictionary or a list (cases named by their position)
+    chunks: Dict (default: None)
+        Chunks of the dask arrays (requires dask), e.g. {} for the chunks of the files. The values are loaded lazily
+        without dask by default.
+
+    Returns
+    -------
+    xr.Dataset
+        Datasets of all the cases, with NaN for the elements missing in some cases
+    """
+    _check_xarray()
+    paths = paths if isinstance(paths, dict) else {i: path for i, path in enumerate(paths)}
+    datasets = [xr.open_zarr(path, chunks=chunks) if path.endswith('.zarr') else xr.open_dataset(path, chunks=chunks)
+                for path in paths.values()]
+    return xr.concat(datasets, dim=pd.Index(list(paths.keys()), name='case'), join='outer', combine_attrs='drop')
@@ -25,8 +25,8 @@
 #########################
 
 ## MAIN SETS: Sets whose elements are input directly in the data file
-set PERIODS := 1 .. 8760; # time periods (hours of the year)
-set HOURS := 1 .. 24; # hours of the day
+set PERIODS default 1 .. 8760; # time periods (hours of the year, or intra-day segments of the year)
+set HOURS default 1 .. 24; # hours of the day (or intra-day segments, see t_op)
 set TYPICAL_DAYS:= 1 .. 12; # typical days
 set T_H_TD within {PERIODS, HOURS, TYPICAL_DAYS}; # set linking periods, hours, days, typical days
 set SECTORS; # sectors of the energy system
@@ -27,23 +27,46 @@ if __name__ == '__main__':
     # Load configuration
     config = load_config('config.default.yaml')
 
-    # Loading data
-    all_data = es.import_data(config['user_data'], config['developer_data'])
-    # Modify the minimum capacities of some technologies
-    for tech in config['Technologies']['f_min']:
-        all_data['Technologies']['f_min'].loc[tech] = config['Technologies']['f_min'][tech]
-
-    # Saving data to .dat files
-    estd_path = f"{config['temp_dir']}/ESTD_data.dat"
-    es.print_estd(estd_path, all_data, config["system_limits"])
-    td12_path = f"{config['temp_dir']}/ESTD_12TD.dat"
-    es.print_12td(td12_path, all_data['Time_series'], config["step1_output"])
-    data_fns = [estd_path, td12_path]
-
-    # Running EnergyScope
-    cs = f"{config['case_studies_dir']}/{config['case_study_name']}"
-    mod_fns = [f"{config['ES_path']}/ESTD_model.mod"]
-    es.run_step2_new(cs, config['AMPL_path'], config["options"], mod_fns, data_fns, config['temp_dir'])
+    # Record the duration and memory usage of each stage of the run
+    with es.tracing(config.get('trace_file'), chrome_format=True):
+
+        # Loading data
+        all_data = es.import_data(config['user_data'], config['developer_data'])
+        # Modify the minimum capacities of some technologies
+        for tech in config['Technologies']['f_min']:
+            all_data['Technologies']['f_min'].loc[tech] = config['Technologies']['f_min'][tech]
+
+        # Checking the consistency of the data before printing it (raises an error listing all the violations)
+        es.check_data(all_data, config["system_limits"], config["step1_output"])
+
+        # Removing the technologies and resources that cannot be used
+        mod_fns = [f"{config['ES_path']}/ESTD_model.mod"]
+        dropped = None
+        if config.get('presolve', False):
+            all_data, dropped = es.prune_data(all_data, mod_fns, f"{config['temp_dir']}/dropped.json")
+
+        # Building the sets of the model once
+        catalog = es.ModelCatalog.from_data(all_data)
+
+        # Saving data to .dat files
+        estd_path = f"{config['temp_dir']}/ESTD_data.dat"
+        es.print_estd(estd_path, all_data, config["system_limits"], catalog=catalog)
+        td12_path = f"{config['temp_dir']}/ESTD_12TD.dat"
+        es.print_12td(td12_path, all_data['Time_series'], config["step1_output"])
+        data_fns = [estd_path, td12_path]
+
+        # Running EnergyScope
+        cs = f"{config['case_studies_dir']}/{config['case_study_name']}"
+        run_catalog = config.get('run_catalog') or None
+        if run_catalog is not None:
+            run_catalog = os.path.join(config['energyscope_dir'], run_catalog)
+        inputs = es.get_run_inputs(config["system_limits"], {'f_min': config['Technologies']['f_min']})
+        progress_options = None
+        if config.get('solver_progress', False):
+            progress_options = {'stall_time': config.get('stall_time') or None}
+        es.run_step2_new(cs, config['AMPL_path'], config["options"], mod_fns, data_fns, config['temp_dir'],
+                         dropped=dropped, catalog=catalog, run_catalog=run_catalog, inputs=inputs,
+                         progress_options=progress_options)
 
     # Example to print the sankey from this script
     # output_dir = f"{config['case_studies_dir']}/{config['case_study_name']}/output/"
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+"""
+Fixtures of the test suite (solver-free, run with: pytest tests)
+"""
+import os
+from pathlib import Path
+
+import pytest
+import yaml
+
+from energyscope.step2_print_data import import_data
+
+ROOT_DIR = Path(__file__).parents[1]
+DATA_DIR = os.path.join(ROOT_DIR, 'Data')
+
+
+@pytest.fixture(scope='session')
+def all_data():
+    return import_data(f"{DATA_DIR}/User_data", f"{DATA_DIR}/Developer_data")
+
+
+@pytest.fixture(scope='session')
+def system_limits():
+    with open(os.path.join(ROOT_DIR, 'projects', 'example', 'config.default.yaml'), 'r') as file:
+        return yaml.safe_load(file)['system_limits']
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the input-output attribution of the resources to the end uses
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from energyscope.amplpy_aux import simplify_df
+from energyscope.io_attribution import compute_io_attribution
+from energyscope.step2_output_generator import save_year_balance
+from energyscope.synthetic_data import generate_synthetic_case
+
+
+def test_conservation(tmp_path):
+    """The resources embodied in the end uses and the exports are the supply of each resource"""
+    results, parameters, sets = generate_synthetic_case(4)
+    save_year_balance(results, parameters, sets, f"{tmp_path}/")
+    year_balance = pd.read_csv(os.path.join(tmp_path, 'year_balance.csv'), index_col=0)
+    resources_data = pd.concat([simplify_df(parameters['c_op']), simplify_df(parameters['gwp_op'])], axis=1)
+    resources_data.columns = ['c_op', 'gwp_op']
+
+    attribution = compute_io_attribution(year_balance, resources_data)
+    year_balance = year_balance.rename(index=lambda x: x.strip(), columns=lambda x: x.strip())
+    resources = attribution['intensity'].columns
+    supply = year_balance.loc[resources].clip(lower=0.).sum(axis=1)
+    embodied = attribution['end_uses'].sum() + attribution['exports'].sum()
+    supplied = supply > 0
+    assert supplied.sum() > 0
+    pd.testing.assert_series_equal(embodied[supplied], supply[supplied], check_names=False, rtol=1e-9)
+
+
+def test_chain():
+    """Gas burnt in a boiler whose heat is distributed by the DHN with 10 % losses"""
+    year_balance = pd.DataFrame({'GAS': [100., -100., 0., 0.], 'HEAT_DHN': [0., 90., -90., 0.],
+                                 'HEAT_LOW_T_DHN': [0., 0., 81., 81.]},
+                                index=['GAS', 'BOILER_DHN', 'DHN', 'END_USES_DEMAND'])
+    resources_data = pd.DataFrame({'c_op': [0.05], 'gwp_op': [0.2]}, index=['GAS'])
+
+    attribution = compute_io_attribution(year_balance, resources_data)
+    assert attribution['intensity'].loc['HEAT_DHN', 'GAS'] == pytest.approx(100. / 90.)
+    assert attribution['intensity'].loc['HEAT_LOW_T_DHN', 'GAS'] == pytest.approx(100. / 81.)
+    assert list(attribution['end_uses'].index) == ['HEAT_LOW_T_DHN']
+    assert attribution['end_uses'].loc['HEAT_LOW_T_DHN', 'GAS'] == pytest.approx(100.)
+    assert len(attribution['exports']) == 0
+    summary = attribution['summary'].loc[('END_USES', 'HEAT_LOW_T_DHN')]
+    assert summary['primary'] == pytest.approx(100.) and summary['co2'] == 0.
+    assert summary['cost'] == pytest.approx(5.) and summary['gwp'] == pytest.approx(20.)
+    # All the gas reaches the end use through the DHN
+    assert attribution['producers'].loc[('HEAT_LOW_T_DHN', 'DHN'), 'GAS'] == pytest.approx(100.)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the writing and reading of the output tables in each output format
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from energyscope import output_formats
+from energyscope.output_formats import OUTPUT_FORMATS, check_output_format, read_table, write_table
+
+OPTIONAL_PACKAGES = {'csv.zst': 'zstandard', 'parquet': 'pyarrow'}
+
+
+@pytest.fixture
+def table():
+    index = pd.MultiIndex.from_product([['PV', 'WIND_ONSHORE'], range(1, 25)], names=['tech', 'hour'])
+    return pd.DataFrame({'ELECTRICITY': np.linspace(0., 1., len(index)), 'HEAT_LOW_T_DHN': -np.arange(len(index))},
+                        index=index)
+
+
+@pytest.mark.parametrize('output_format', list(OUTPUT_FORMATS))
+def test_round_trip(table, tmp_path, output_format):
+    if output_format in OPTIONAL_PACKAGES:
+        pytest.importorskip(OPTIONAL_PACKAGES[output_format])
+    path = write_table(table, f"{tmp_path}/balance.csv", output_format, chunk_size=10)
+    assert path.endswith(OUTPUT_FORMATS[output_format])
+    # Tables are found from their CSV path whatever their format
+    pd.testing.assert_frame_equal(read_table(f"{tmp_path}/balance.csv", index_col=[0, 1]), table,
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize('output_format', list(OPTIONAL_PACKAGES))
+def test_missing_package(monkeypatch, output_format):
+    monkeypatch.setattr(output_formats, OPTIONAL_PACKAGES[output_format], None)
+    with pytest.raises(ImportError, match=OPTIONAL_PACKAGES[output_format]):
+        check_output_format(output_format)
+
+
+def test_unknown_format():
+    with pytest.raises(AssertionError):
+        check_output_format('xlsx')
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the removal of the inactive entities and of their restoration in the outputs
+"""
+import copy
+
+import numpy as np
+import pytest
+
+from energyscope.model_catalog import ModelCatalog
+from energyscope.presolve import prune_data, restore_dropped
+from energyscope.synthetic_data import long_df
+
+DROPPED_TECH = 'IND_BOILER_COAL'
+
+
+@pytest.fixture(scope='module')
+def pruned(all_data):
+    data = copy.deepcopy(all_data)
+    data['Technologies'].loc[DROPPED_TECH, ['f_min', 'f_max']] = 0.
+    pruned_data, dropped = prune_data(data)
+    return data, pruned_data, dropped
+
+
+def test_prune_data(pruned):
+    data, pruned_data, dropped = pruned
+    assert DROPPED_TECH in dropped['TECHNOLOGIES']
+    assert DROPPED_TECH not in pruned_data['Technologies'].index
+    assert DROPPED_TECH not in pruned_data['Layers_in_out'].index
+    assert set(dropped['TECHNOLOGIES']).isdisjoint(dropped['STORAGE_TECH'])
+
+
+def test_restore_dropped(pruned):
+    data, pruned_data, dropped = pruned
+    sets = ModelCatalog.from_data(pruned_data).get_sets()
+    techs, layers = sets['TECHNOLOGIES'], sets['LAYERS']
+    boilers = sets['TECHNOLOGIES_OF_END_USES_TYPE']['HEAT_HIGH_T']
+    entities = sets['RESOURCES'] + [tech for tech in techs if tech not in sets['STORAGE_TECH']]
+    results = {'F': long_df('F', [techs], np.ones(len(techs))),
+               'F_hi': long_df('F_hi', [boilers], np.ones(len(boilers)))}
+    parameters = {'layers_in_out': long_df('layers_in_out', [entities, layers], np.ones((len(entities), len(layers))),
+                                           variable=False)}
+
+    results, parameters, restored_sets = restore_dropped(results, parameters, sets, dropped)
+    assert DROPPED_TECH in restored_sets['TECHNOLOGIES']
+    assert sorted(restored_sets['TECHNOLOGIES']) == sorted(ModelCatalog.from_data(data).get_sets()['TECHNOLOGIES'])
+    f = results['F'].set_index('index0')['F.val']
+    assert f[DROPPED_TECH] == 0. and len(f) == len(techs) + len(dropped['TECHNOLOGIES'])
+    # Entities are only padded with the dropped elements of the set they are indexed over
+    assert set(results['F_hi']['index0']) == set(boilers) | {DROPPED_TECH}
+    layers_in_out = parameters['layers_in_out']
+    assert (layers_in_out.loc[layers_in_out['index0'] == DROPPED_TECH, 'layers_in_out'] == 0.).all()
+    assert set(layers_in_out['index0']).isdisjoint(dropped['STORAGE_TECH'])
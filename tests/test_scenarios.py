@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the scenario data written as an overlay of the base data
+"""
+import copy
+import os
+
+import pytest
+
+from energyscope.model_catalog import ModelCatalog
+from energyscope.scenarios import get_changed_sets, get_data_params, get_overlay, write_estd_data, \
+    write_scenario_data
+
+
+@pytest.fixture(scope='module')
+def base(all_data, system_limits, tmp_path_factory):
+    base_dir = str(tmp_path_factory.mktemp('base'))
+    estd_path = write_estd_data(base_dir, all_data, system_limits)
+    return estd_path, get_data_params(all_data, system_limits), ModelCatalog.from_data(all_data).get_sets()
+
+
+def test_get_overlay(all_data, system_limits):
+    data = copy.deepcopy(all_data)
+    data['Technologies'].loc['PV', 'f_min'] = 1.5
+    changes = get_overlay(get_data_params(all_data, system_limits), get_data_params(data, system_limits))
+    assert len(changes) == 1 and changes.iloc[0] == 1.5
+    assert changes.index[0][1] == 'PV'
+
+
+def test_get_changed_sets(all_data):
+    data = copy.deepcopy(all_data)
+    assert get_changed_sets(ModelCatalog.from_data(all_data).get_sets(), ModelCatalog.from_data(data).get_sets()) == []
+    data['Resources'].loc['WOOD', 'Category'] = 'Other'
+    assert 'RE_RESOURCES' in get_changed_sets(ModelCatalog.from_data(all_data).get_sets(),
+                                              ModelCatalog.from_data(data).get_sets())
+
+
+def test_write_scenario_overlay(all_data, system_limits, base, tmp_path):
+    estd_path, base_params, base_sets = base
+    limits = copy.deepcopy(system_limits)
+    limits['GWP_limit'] = 20000
+    path, overlay_fn, changes = write_scenario_data(str(tmp_path), all_data, limits, estd_path, base_params, base_sets)
+    assert path == estd_path and len(changes) == 1
+    with open(overlay_fn, 'r') as file:
+        lines = file.read().splitlines()
+    assert len(lines) == 2 and lines[1].endswith(':= 20000.0;')
+
+
+def test_write_scenario_changed_sets(all_data, system_limits, base, tmp_path):
+    estd_path, base_params, base_sets = base
+    data = copy.deepcopy(all_data)
+    data['Resources'].loc['WOOD', 'Category'] = 'Other'
+    path, overlay_fn, changes = write_scenario_data(str(tmp_path), data, system_limits, estd_path, base_params,
+                                                    base_sets)
+    # Full data printed next to the base data
+    assert overlay_fn is None and changes is None
+    assert path != estd_path and os.path.dirname(path) == os.path.dirname(estd_path) and os.path.isfile(path)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the parsing of the solver output and of the stall detection
+"""
+import json
+import time
+
+import pytest
+
+from energyscope.solver_progress import CplexParser, ProgressMonitor, solve_with_progress
+from energyscope.translator import ReplayAMPL
+
+CPLEX_LOG = """Iteration log . . .
+Iteration:     1   Scaled infeas =        1234.5
+Iteration:   900    Objective     =      45000.0
+        Nodes                                         Cuts/
+   Node  Left     Objective  IInf  Best Integer    Best Bound    ItCnt     Gap         Variable B NodeID Parent  Depth
+      0     0    43000.0000    12                 43000.0000      950
+*     0+    0                        46000.0000    43000.0000             6.52%
+     10     8    44000.0000     4    45838.0000    43963.0000     1200    4.09%             x_3 D     12      5      3
+CPLEX 20.1.0.0: optimal integer solution within mipgap or absmipgap; objective 45838
+"""
+
+
+def _parse(log: str):
+    parser = CplexParser()
+    return [event for event in map(parser.parse, log.splitlines()) if event is not None]
+
+
+def test_cplex_parser():
+    events = _parse(CPLEX_LOG)
+    assert events[1] == {'phase': 'simplex', 'iteration': 1}
+    assert events[2] == {'phase': 'simplex', 'iteration': 900, 'primal': 45000.}
+    assert events[4] == {'phase': 'mip', 'node': 0, 'dual': 43000., 'iteration': 950}
+    assert events[5] == {'phase': 'mip', 'node': 0, 'primal': 46000., 'dual': 43000., 'gap': 0.0652}
+    # The columns after Gap are not read as the gap
+    assert events[6] == {'phase': 'mip', 'node': 10, 'primal': 45838., 'dual': 43963., 'iteration': 1200,
+                         'gap': 0.0409}
+    assert events[-1] == {'phase': 'done', 'primal': 45838.}
+
+
+def test_stall_time():
+    monitor = ProgressMonitor(stall_time=0.2, echo=False)
+    monitor.add_event({'phase': 'simplex', 'iteration': 1, 'primal': 10.})
+    time.sleep(0.3)
+    monitor.add_event({'phase': 'simplex', 'iteration': 2, 'primal': 10.})
+    assert monitor.is_stalled()
+    # Events without objective (phase I of the simplex) are not stalls
+    monitor.add_event({'phase': 'simplex', 'iteration': 3})
+    assert not monitor.is_stalled()
+
+
+def test_solve_with_progress(tmp_path):
+    solver_log = tmp_path / 'cplex.log'
+    solver_log.write_text(CPLEX_LOG)
+    ampl_trans = ReplayAMPL(dict(), dict(), dict(), solver_log=str(solver_log))
+    monitor = solve_with_progress(ampl_trans, log_file=f"{tmp_path}/progress.jsonl", poll_interval=0.01, echo=False)
+    assert ampl_trans.solved
+    with open(tmp_path / 'progress.jsonl', 'r') as file:
+        events = [json.loads(line) for line in file]
+    assert [event['phase'] for event in events] == [event['phase'] for event in monitor.events]
+    assert events[-1]['phase'] == 'done' and events[-1]['primal'] == 45838.
+
+
+class _StalledAMPL(ReplayAMPL):
+    """Translator whose solve prints the same objective until it is interrupted"""
+
+    def solve(self) -> None:
+        while not self._interrupted:
+            self._output_handler.output(0, 'Iteration:   900    Objective     =      45000.0\n')
+            time.sleep(0.01)
+
+
+def test_abort_stalled_solve():
+    ampl_trans = _StalledAMPL(dict(), dict(), dict())
+    with pytest.raises(AssertionError, match='without progress'):
+        solve_with_progress(ampl_trans, stall_time=0.2, poll_interval=0.05, echo=False)
+    assert not ampl_trans.isBusy()
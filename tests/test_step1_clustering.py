@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the k-medoids STEP 1
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from energyscope.segmentation import read_td_of_days
+from energyscope.step1_clustering import _get_medoid, get_distances, kmedoids, run_step1_kmedoids
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_get_medoid(seed):
+    features = np.random.default_rng(seed).random((40, 7)).astype(np.float32)
+    # Brute force: sum of the pairwise L1 distances
+    expected = int(np.argmin(np.abs(features[:, None, :] - features[None, :, :]).astype(np.float64).sum(axis=(1, 2))))
+    assert _get_medoid(features) == expected
+
+
+def test_kmedoids():
+    rng = np.random.default_rng(0)
+    centers = rng.random((3, 24)) * 10.
+    features = np.concatenate([center + rng.random((20, 24)) * 0.1 for center in centers]).astype(np.float32)
+    medoids, labels, objective = kmedoids(features, 3, nbr_init=3)
+    assert len(medoids) == 3 and len(np.unique(labels)) == 3
+    # Each day is assigned to the medoid of its own cluster
+    assert all(len(np.unique(labels[20 * k:20 * (k + 1)])) == 1 for k in range(3))
+    assert objective == pytest.approx(get_distances(features, features[medoids]).min(axis=1).sum(), rel=1e-5)
+
+
+def test_run_step1_kmedoids(all_data, tmp_path):
+    time_series = all_data['Time_series']
+    # Second weather year: the first one with noise
+    noise = np.random.default_rng(0).uniform(0.8, 1.2, time_series.shape)
+    two_years = pd.concat([time_series, time_series * noise], ignore_index=True)
+    nbr_td = 8
+    td_of_days, ref_ts = run_step1_kmedoids(nbr_td, two_years, ref_year=1, output_dir=str(tmp_path), nbr_init=2)
+    assert len(td_of_days) == 365 and len(np.unique(td_of_days)) == nbr_td
+    assert td_of_days.min() >= 1 and td_of_days.max() <= 365
+    # Each typical day is written on a day it represents
+    assert all(td_of_days[td - 1] == td for td in np.unique(td_of_days))
+    assert ref_ts.shape == time_series.shape
+    np.testing.assert_array_equal(read_td_of_days(str(tmp_path / f'TD_of_days_{nbr_td}.out')), td_of_days)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the quality metrics of the selections of typical days
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from energyscope.segmentation import read_td_of_days
+from energyscope.step1_clustering import run_step1_kmedoids
+from energyscope.td_metrics import evaluate_td_selections, select_nbr_td
+
+STEP1_OUTPUT = os.path.join(Path(__file__).parents[1], 'energyscope', 'step1_io', 'TD_of_days_12.out')
+
+
+@pytest.fixture(scope='module')
+def selections(all_data):
+    td_of_days_2, _ = run_step1_kmedoids(2, all_data['Time_series'], nbr_init=1)
+    return {2: td_of_days_2, 12: read_td_of_days(STEP1_OUTPUT), 365: np.arange(1, 366)}
+
+
+def test_identity_selection(all_data):
+    metrics = evaluate_td_selections(all_data['Time_series'], {365: np.arange(1, 366)})
+    np.testing.assert_allclose(metrics['rmse'], 0., atol=1e-12)
+    np.testing.assert_allclose(metrics['duration_curve_error'], 0., atol=1e-12)
+    np.testing.assert_allclose(metrics['peak_factor'], 1.)
+
+
+def test_select_nbr_td(all_data, selections, tmp_path):
+    time_series = all_data['Time_series']
+    metrics = evaluate_td_selections(time_series, selections)
+    worst_rmse = metrics['rmse'].groupby(level='Nbr_TD').max()
+    assert worst_rmse[2] > worst_rmse[12] > worst_rmse[365]
+
+    # Only the identity selection meets a null budget, a larger budget is met with fewer typical days
+    assert select_nbr_td(time_series, selections, {'rmse': 1e-9}) == 365
+    assert select_nbr_td(time_series, selections, {'rmse': worst_rmse[12]}) == 12
+    report_path = os.path.join(tmp_path, 'report.csv')
+    assert select_nbr_td(time_series, selections, {'rmse': worst_rmse[2]}, report_path=report_path) == 2
+    assert os.path.isfile(report_path)
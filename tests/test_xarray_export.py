@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the export of runs as xarray datasets (skipped if xarray is not installed)
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from energyscope.synthetic_data import generate_synthetic_case, long_df
+
+xr = pytest.importorskip('xarray')
+
+from energyscope.xarray_export import _get_dims, get_dataset, open_case_studies, save_dataset, select_periods  # noqa
+
+
+@pytest.fixture(scope='module')
+def synthetic_case():
+    return generate_synthetic_case(4)
+
+
+def test_get_dims(synthetic_case):
+    results, parameters, sets = synthetic_case
+    coords = {'tech': sets['TECHNOLOGIES'], 'resource': sets['RESOURCES'], 'entity': [], 'layer': sets['LAYERS'],
+              'end_use_type': sets['END_USES_TYPES']}
+    # Layers which are not resources (the first dimension containing all the values is used)
+    techs, layers = sets['TECHNOLOGIES'][:2], [layer for layer in sets['LAYERS'] if layer not in sets['RESOURCES']][:3]
+    df = long_df('x', [techs, layers, [1, 2], [1]], np.zeros((2, 3, 2, 1)))
+    assert _get_dims('x', df, coords) == ['tech', 'layer', 'hour', 'typical_day']
+    df = long_df('y', [['unknown'], techs], np.zeros((1, 2)))
+    assert _get_dims('y', df, coords) == ['y_dim0', 'tech']
+
+
+def test_open_case_studies(synthetic_case, tmp_path):
+    results, parameters, sets = synthetic_case
+    ds = get_dataset(results, parameters, sets)
+    assert ds['F_t'].dims == ('entity', 'hour', 'typical_day')
+    paths = dict()
+    for case in ['cost', 'gwp']:
+        paths[case] = f"{tmp_path}/{case}.nc"
+        save_dataset(ds, paths[case], engine='scipy')
+
+    cases = open_case_studies(paths)
+    assert list(cases['case'].values) == ['cost', 'gwp']
+    entity = sets['TECHNOLOGIES'][0]
+    profiles = select_periods(cases['F_t'].sel(entity=entity), cases)
+    assert profiles.dims == ('case', 'period') and profiles.shape == (2, len(sets['PERIODS']))
+    # Value of each period given by its (hour, typical day) in T_H_TD
+    f_t = results['F_t'].set_index(list(results['F_t'].columns[:-1])).iloc[:, 0]
+    period = int(cases['period'][100])
+    hour, td = int(cases['hour_of_period'][100]), int(cases['typical_day_of_period'][100])
+    assert profiles.sel(case='gwp', period=period).item() == pytest.approx(f_t[(entity, hour, td)])
+    pd.testing.assert_index_equal(cases.indexes['period'], ds.indexes['period'])